@@ -1,19 +1,25 @@
 import sys
 import asyncio
 import os
+import time
 import uuid
 # MAJOR FIX: Enforce ProactorEventLoop on Windows for Playwright compatibility
 if sys.platform.startswith("win"):
     asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import main_scraper
 import cache_manager
+import cache_warmer
 from cache_manager import query_processor as nqp
+from utils.network_manager import network_manager
+from utils import rate_limiter
+from utils.scheduler import ScrapeScheduler, QueueFullError, INTERACTIVE, REFRESH, PRIORITY_NAMES
+from utils import metrics, profiling, browser_manager, location_sessions
 
 app = FastAPI(
     title="Product Scraper API",
@@ -34,9 +40,136 @@ app = FastAPI(
 )
 
 # Concurrency Control
-# Limit concurrent scraping operations to ensure responsiveness for cached queries
-MAX_CONCURRENT_SCRAPES = 3
-scrape_semaphore = asyncio.Semaphore(MAX_CONCURRENT_SCRAPES)
+# Limit concurrent scraping operations to ensure responsiveness for cached queries.
+# Waiting scrapes are ordered by priority class, then round-robin across sessions;
+# past MAX_QUEUED_SCRAPES waiting requests, new ones get 429 + Retry-After.
+MAX_CONCURRENT_SCRAPES = int(os.environ.get("MAX_CONCURRENT_SCRAPES", "3"))
+MAX_QUEUED_SCRAPES = int(os.environ.get("MAX_QUEUED_SCRAPES", "20"))
+scheduler = ScrapeScheduler(MAX_CONCURRENT_SCRAPES, MAX_QUEUED_SCRAPES)
+
+# Background refreshes of stale queries, at most one per query
+refresh_tasks = {}
+
+async def refresh_query(q):
+    try:
+        async with scheduler.slot(REFRESH):
+            print(f"Refreshing stale cache for '{q}'...")
+            await main_scraper.search_products(q, reuse_similar=False)
+    except QueueFullError:
+        print(f"Scrape queue full, skipping refresh of '{q}'")
+    except Exception as e:
+        print(f"Background refresh failed for '{q}': {e}")
+    finally:
+        refresh_tasks.pop(q, None)
+
+def schedule_refresh(q):
+    """Queues a background re-scrape of `q` unless one is already pending."""
+    if q not in refresh_tasks:
+        refresh_tasks[q] = asyncio.create_task(refresh_query(q))
+
+# Scrape jobs
+# A cache miss is scraped as a durable job (cache_manager scrape_jobs, per-source states):
+# the request waits for it (wait=true) or gets 202 with the job id and polls /api/jobs/{id}.
+# At most one job runs per query in this process; jobs a restart left queued or running
+# are resumed on startup, and finished ones are kept JOB_KEEP_HOURS.
+JOB_KEEP_HOURS = float(os.environ.get("JOB_KEEP_HOURS", "24"))
+job_tasks = {}  # query -> (job_id, task)
+
+async def run_job(job_id, q, session_id=None):
+    try:
+        await cache_manager.create_job(q, job_id)
+        async with scheduler.slot(INTERACTIVE, session_id):
+            print(f"Scrape slot acquired for '{q}'. Starting job {job_id}...")
+            return await main_scraper.run_job(job_id, q)
+    except QueueFullError as e:
+        print(f"Scrape queue full, failing job {job_id} for '{q}'")
+        await cache_manager.update_job(job_id, "failed", error=str(e))
+        raise
+    finally:
+        job_tasks.pop(q, None)
+
+def start_job(q, session_id=None, job_id=None):
+    """(job_id, task) of the job scraping `q`: the one already running, or a new one (`job_id` resumes a stored job)."""
+    if q not in job_tasks:
+        job_id = job_id or uuid.uuid4().hex
+        task = asyncio.create_task(run_job(job_id, q, session_id))
+        # Nobody may await a polled job: retrieve its exception so it is not reported as lost
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        job_tasks[q] = (job_id, task)
+    return job_tasks[q]
+
+async def resume_jobs():
+    pruned = await cache_manager.prune_jobs(JOB_KEEP_HOURS)
+    if pruned:
+        print(f"Pruned {pruned} finished scrape jobs")
+    for job_id, q in await cache_manager.get_unfinished_jobs():
+        if q in job_tasks:
+            await cache_manager.update_job(job_id, "failed", error="superseded by a newer job")
+            continue
+        print(f"Resuming scrape job {job_id} for '{q}'")
+        start_job(q, job_id=job_id)
+
+# Popular queries are re-scraped before they go stale, using idle scrape slots only
+warmer = cache_warmer.CacheWarmer(scheduler, refresh_tasks)
+
+# Metrics
+# Histograms and counters are recorded where the work happens (utils.metrics); these gauges
+# are read from the scheduler, proxy pool and domain guards whenever /metrics is scraped.
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+def _proxy_pool_state():
+    proxies = network_manager.pool.snapshot()
+    return {
+        ("total",): len(proxies),
+        ("in_flight",): sum(p["in_flight"] for p in proxies),
+        ("quarantined",): sum(1 for p in proxies if p["quarantined_for_s"] > 0),
+    }
+
+def _proxy_pool_utilization():
+    proxies = network_manager.pool.snapshot()
+    capacity = len(proxies) * network_manager.pool.max_in_flight
+    return sum(p["in_flight"] for p in proxies) / capacity if capacity else 0
+
+metrics.Gauge("scrape_queue_depth", "Scrapes waiting for a slot, per priority class", ("priority",),
+              callback=lambda: {(name,): scheduler.queued_for(p) for p, name in PRIORITY_NAMES.items()})
+metrics.Gauge("scrape_slots_in_use", "Scrape slots currently held", callback=lambda: scheduler.running)
+metrics.Gauge("scrape_slots_max", "Scrape slot limit", callback=lambda: scheduler.max_concurrent)
+metrics.Gauge("proxy_pool_proxies", "Proxies in the pool by state", ("state",), callback=_proxy_pool_state)
+metrics.Gauge("proxy_pool_utilization", "In-flight requests / capacity of the proxy pool", callback=_proxy_pool_utilization)
+metrics.Gauge("domain_breaker_state", "Circuit breaker per domain (0 closed, 1 half open, 2 open)", ("domain",),
+              callback=lambda: {(g["domain"],): BREAKER_STATES.get(g["breaker"], 0) for g in rate_limiter.snapshot()})
+metrics.Gauge("domain_rate_per_second", "Current request rate allowed per domain", ("domain",),
+              callback=lambda: {(g["domain"],): g["rate_per_s"] for g in rate_limiter.snapshot()})
+metrics.Gauge("browser_tabs", "Shared browser tabs by state (BROWSER_MODE=tabs)", ("state",),
+              callback=lambda: {("in_use",): browser_manager.shared_browser.in_use,
+                                ("idle",): browser_manager.shared_browser.idle})
+metrics.Gauge("browser_memory_mb", "PSS of the chromedriver / Chrome processes started by the API",
+              callback=lambda: browser_manager.browser_memory_mb() or 0)
+
+# NLP engine warm-up
+# The engine loads lazily; by default we warm it in the background shortly after startup
+# so the first cache miss does not pay for model loading. Set NLP_WARMUP=0 to disable.
+NLP_WARMUP = os.environ.get("NLP_WARMUP", "1") != "0"
+NLP_WARMUP_DELAY = float(os.environ.get("NLP_WARMUP_DELAY", "1.0"))
+
+async def warm_up_nlp_engine():
+    # Give uvicorn a moment to start listening before we compete for CPU
+    await asyncio.sleep(NLP_WARMUP_DELAY)
+    loop = asyncio.get_running_loop()
+    state = await loop.run_in_executor(None, nqp.engine.warm_up)
+    query_state = await loop.run_in_executor(None, nqp.query_engine.warm_up)
+    print(f"NLP engine warm-up finished: products={state}, queries={query_state}")
+
+@app.on_event("startup")
+async def startup():
+    await cache_manager.init_table()
+    await resume_jobs()
+    # Proxies and User-Agents load in the background; requests go direct until then (non-strict)
+    network_manager.start_background_refresh()
+    if NLP_WARMUP:
+        asyncio.create_task(warm_up_nlp_engine())
+    if cache_warmer.WARM_ENABLED:
+        warmer.start()
 
 # Middleware for Session Management
 @app.middleware("http")
@@ -49,6 +182,32 @@ async def session_middleware(request: Request, call_next):
         return response
     return await call_next(request)
 
+# Request latency per route template (not per URL, to keep the label set small)
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - started,
+            route=getattr(route, "path", "unmatched"), method=request.method, status=status,
+        )
+
+# Opt-in profiling of API requests: every sampled request while the "request" target is
+# enabled, or a single request sent with the X-Profile: 1 header
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    if not profiling.is_enabled("request"):
+        return await call_next(request)
+    label = f"{request.method} {request.url.path}" + (f"?{request.url.query}" if request.url.query else "")
+    with profiling.profiled("request", label, force=request.headers.get("x-profile") == "1"):
+        return await call_next(request)
+
 # Mount static files
 # We will create a 'static' directory for frontend and admin
 os.makedirs("static", exist_ok=True)
@@ -70,7 +229,24 @@ class SearchQuery(BaseModel):
     q: str
 
 class AdminTTL(BaseModel):
-    ttl_minutes: int
+    # ttl_minutes is the hard TTL (kept for older clients); rows older than it are deleted
+    ttl_minutes: Optional[int] = None
+    soft_ttl_minutes: Optional[int] = None
+    hard_ttl_minutes: Optional[int] = None
+
+class AdminProfiling(BaseModel):
+    targets: Optional[List[str]] = None
+    mode: Optional[str] = None
+    interval_ms: Optional[float] = None
+    sample_rate: Optional[float] = None
+    threshold_s: Optional[float] = None
+    keep: Optional[int] = None
+
+@app.on_event("shutdown")
+async def shutdown():
+    network_manager.stop_background_refresh()
+    warmer.stop()
+    await asyncio.to_thread(browser_manager.shared_browser.close)
 
 @app.get("/")
 async def read_root():
@@ -80,16 +256,75 @@ async def read_root():
 async def read_admin():
     return FileResponse("static/admin.html")
 
+async def results_for(q, page):
+    """
+    Response fields with the cached products of `q`: all of them (legacy clients),
+    or one filtered / sorted page when `page` holds query_products arguments.
+    """
+    if page is None:
+        data, _ = await cache_manager.retrieve_query_entry(q)
+        return {"data": data or []}
+    result = await cache_manager.query_products(q, **page)
+    return {"data": result["items"], "next_cursor": result["next_cursor"], "total": result["total"]}
+
+def location_query(q, pincode):
+    """Cache key of `q` for a delivery location; 400 on a malformed pincode."""
+    if pincode is None:
+        return q
+    if not location_sessions.PINCODE_RE.match(pincode):
+        raise HTTPException(status_code=400, detail="pincode must be 6 digits")
+    return location_sessions.location_key(q, pincode)
+
 @app.get("/api/search")
-async def search(q: str, request: Request):
+async def search(
+    q: str,
+    request: Request,
+    sources: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+    sort: str = "relevance",
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    seed: int = Query(0, ge=0, lt=2**31),
+    cache_only: bool = False,
+    pincode: Optional[str] = None,
+    wait: bool = True,
+):
     """
     Search for products.
     1. Check cache (handled by main_scraper logic or direct cache access).
     2. If not in cache or expired, scrape.
     3. Return results.
+    With `limit` (or `cursor`) the results are filtered by `sources` (comma separated),
+    `min_price` / `max_price`, `min_rating`, sorted by `sort` (relevance, price-low, price-high,
+    rating-high, discount-high, random + `seed`)
+    and paginated: pass the returned `next_cursor` (with the same sort, seed and filters) to get the next page.
+    Requests with a cursor or `cache_only` (e.g. the frontend re-applying filters) are served
+    from the cache only and do not count as a new search.
+    With `pincode` (6 digits) the search runs for that delivery location and is cached
+    separately from the same query elsewhere.
+    A cache miss starts a scrape job; with `wait=false` the response is 202 with its `job_id`
+    right away, and the results are polled from /api/jobs/{job_id}.
     """
     if not q:
         raise HTTPException(status_code=400, detail="Query parameter 'q' is required")
+    q = location_query(q, pincode)
+    if sort not in cache_manager.SORT_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort '{sort}'")
+
+    page = None
+    if limit is not None or cursor is not None or cache_only:
+        page = {
+            "sources": [s.strip() for s in sources.split(",") if s.strip()] if sources else None,
+            "min_price": min_price,
+            "max_price": max_price,
+            "min_rating": min_rating,
+            "sort": sort,
+            "limit": limit or 24,
+            "cursor": cursor,
+            "seed": seed,
+        }
 
     session_id = request.cookies.get("session_id")
     print(f"Search request from session: {session_id} for query: {q}")
@@ -97,26 +332,131 @@ async def search(q: str, request: Request):
     # Initialize DB if needed (main_scraper does this, but good to ensure)
     await cache_manager.init_table()
 
+    # Next pages / re-filtering of a listing: never scrape, never count as a new search
+    if cursor is not None or cache_only:
+        try:
+            metrics.CACHE_REQUESTS.inc(result="page")
+            return {"status": "cached", **await results_for(q, page)}
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    await cache_manager.record_query_hit(q)
+
     # Check cache first - HIGH PRIORITY
-    # Cached requests bypass the semaphore
-    cached_data = await cache_manager.retrieve_query_data(q)
-    if cached_data:
-        print(f"Cache HIT for '{q}'. Serving immediately.")
-        return {"status": "cached", "data": cached_data}
+    # Cached requests bypass the semaphore. Stale, missing or failed sources are
+    # re-scraped in the background and merged with the cached ones.
+    freshness, live_sources = await cache_manager.query_freshness(q)
+    if live_sources:
+        due = await main_scraper.sources_to_scrape(q)
+        if not due:
+            print(f"Cache HIT for '{q}'. Serving immediately.")
+            metrics.CACHE_REQUESTS.inc(result="hit")
+            return {"status": "cached", **await results_for(q, page)}
+        print(f"Partial/stale cache HIT for '{q}'. Serving immediately and refreshing {due}.")
+        schedule_refresh(q)
+        status = "stale" if freshness == "stale" else "partial"
+        metrics.CACHE_REQUESTS.inc(result=status)
+        return {
+            "status": status,
+            "refreshing": due,
+            **await results_for(q, page),
+        }
+
+    # Near-duplicate of a fresh cached query - also served without a scrape slot
+    matched_query, similar_data = await main_scraper.find_similar_cached(q)
+    if similar_data:
+        print(f"Cache HIT for '{q}' via similar query '{matched_query}'.")
+        metrics.CACHE_REQUESTS.inc(result="similar")
+        body = {"data": similar_data} if page is None else await results_for(matched_query, page)
+        return {"status": "cached", "matched_query": matched_query, **body}
 
     # If not in cache, scrape - LOWER PRIORITY (Throttled)
     print(f"Cache MISS for '{q}'. Waiting for scrape slot...")
-    
+    metrics.CACHE_REQUESTS.inc(result="miss")
+
     try:
-        async with scrape_semaphore:
-            print(f"Scrape slot acquired for '{q}'. Starting scrape...")
-            results = await main_scraper.search_products(q)
-            cached_data = await cache_manager.retrieve_query_data(q)
-            return {"status": "scraped", "data": cached_data if cached_data else results}
+        if q not in job_tasks and scheduler.is_full(INTERACTIVE):
+            raise QueueFullError(f"Scrape queue full ({scheduler.queued} waiting)", scheduler.retry_after())
+        job_id, task = start_job(q, session_id)
+        if not wait:
+            return JSONResponse(status_code=202, content={
+                "status": "queued", "job_id": job_id, "poll": f"/api/jobs/{job_id}",
+            })
+        # The job outlives this request: a client that disconnects can still poll for it
+        results = await asyncio.shield(task)
+        if page is not None:
+            return {"status": "scraped", "job_id": job_id, **await results_for(q, page)}
+        cached_data = await cache_manager.retrieve_query_data(q)
+        return {"status": "scraped", "job_id": job_id, "data": cached_data if cached_data else results}
+    except QueueFullError as e:
+        print(f"Scrape queue full, rejecting '{q}'")
+        metrics.CACHE_REQUESTS.inc(result="rejected")
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         print(f"Scraping error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    State of a scrape job: "queued", "running", "done" or "failed", with the state of each
+    source ("running", "ok", "empty", "failed", or "cached" / "skipped" when it was not scraped).
+    A done job includes the cached results of its query as `data`.
+    """
+    job = await cache_manager.get_job(job_id)
+    if job is None:
+        # Started a moment ago and not stored yet
+        query = next((q for q, (jid, _) in job_tasks.items() if jid == job_id), None)
+        if query is None:
+            raise HTTPException(status_code=404, detail="Unknown job")
+        job = {"id": job_id, "query": query, "state": "queued", "sources": {}}
+    if job["state"] == "done":
+        job.update(await results_for(job["query"], None))
+    return job
+
+@app.get("/api/groups")
+async def grouped_search(
+    q: str,
+    sources: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    pincode: Optional[str] = None,
+):
+    """
+    Cached results of a query with the same product from several marketplaces merged into one
+    entity: {"name", "best_price", "best_source", "sources", "offers"}. Served from the cache only.
+    """
+    q = location_query(q, pincode)
+    source_list = [s.strip() for s in sources.split(",") if s.strip()] if sources else None
+    # Embeddings only re-check borderline pairs, and only if the model is already loaded
+    model = nqp.engine.model if nqp.engine.is_ready else None
+    groups = await cache_manager.get_grouped_products(q, source_list, min_price, max_price, model=model)
+    return {
+        "query": q,
+        "total_listings": sum(len(g["offers"]) for g in groups),
+        "groups": groups,
+    }
+
+@app.get("/api/ready")
+async def ready():
+    """
+    Readiness probe.
+    Cached queries are served as soon as the server listens; this reports whether
+    the NLP engine (needed for cache misses) has finished loading.
+    """
+    nlp_state = nqp.engine.state
+    query_state = nqp.query_engine.state
+    body = {"ready": nlp_state == query_state == "ready", "nlp": nlp_state, "query_index": query_state}
+    error = nqp.engine.error or nqp.query_engine.error
+    if error:
+        body["error"] = error
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics (text exposition format)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/api/admin/stats")
 async def get_stats():
     stats = await cache_manager.get_all_products_stats()
@@ -127,11 +467,50 @@ async def get_products(limit: int = 100):
     products = await cache_manager.get_all_products(limit)
     return products
 
+@app.get("/api/admin/proxies")
+async def get_proxies():
+    return network_manager.pool.snapshot()
+
+@app.get("/api/admin/domains")
+async def get_domains():
+    return rate_limiter.snapshot()
+
+@app.get("/api/admin/scheduler")
+async def get_scheduler():
+    return {
+        **scheduler.snapshot(),
+        "browser": browser_manager.shared_browser.stats(),
+        "jobs": {q: job_id for q, (job_id, _) in job_tasks.items()},
+    }
+
+@app.get("/api/admin/sources")
+async def get_query_sources(q: str):
+    """Per-source scrape status and cache age of a query."""
+    return {"query": q, "sources": await cache_manager.get_source_states(q), "due": await main_scraper.sources_to_scrape(q)}
+
+@app.get("/api/admin/locations")
+async def get_location_sessions():
+    """Stored location sessions (per domain and pincode) reused by location-aware scrapes."""
+    return {"ttl_s": location_sessions.LOCATION_SESSION_TTL_S, "sessions": location_sessions.store.snapshot()}
+
+@app.get("/api/admin/warming")
+async def get_warming():
+    top = await cache_manager.get_top_queries(warmer.top_n)
+    return {
+        **warmer.snapshot(),
+        "due": await warmer.candidates(),
+        "top_queries": [
+            {"query": q, "score": round(score, 2), "age_minutes": None if age is None else round(age, 1)}
+            for q, score, age in top
+        ],
+    }
+
 @app.post("/api/admin/clear")
 async def clear_cache():
     await cache_manager.clear_cache()
-    # Clear NLP Index
+    # Clear NLP Indexes
     nqp.engine.rebuild_index([])
+    nqp.query_engine.rebuild_index([])
     return {"status": "success", "message": "Cache cleared"}
 
 @app.delete("/api/admin/query")
@@ -144,10 +523,12 @@ async def delete_query(q: str):
     # Rebuild NLP Index to ensure sync
     # We fetch all remaining products and rebuild
     all_names = await cache_manager.get_all_product_names()
+    all_queries = await cache_manager.get_all_queries()
     
     # Run in executor to avoid blocking
     loop = asyncio.get_running_loop()
     await loop.run_in_executor(None, nqp.engine.rebuild_index, all_names)
+    await loop.run_in_executor(None, nqp.query_engine.rebuild_index, all_queries)
     
     return {"status": "success", "message": f"History for '{q}' deleted and NLP index updated"}
 
@@ -164,10 +545,65 @@ async def delete_item(id: int):
     
     return {"status": "success", "message": f"Item {id} deleted"}
 
+@app.get("/api/admin/ttl")
+async def get_ttl():
+    return {**cache_manager.get_ttls(), "refreshing": list(refresh_tasks)}
+
 @app.post("/api/admin/ttl")
 async def set_ttl(ttl: AdminTTL, background_tasks: BackgroundTasks):
-    background_tasks.add_task(cache_manager.clean_expired_entries, ttl.ttl_minutes)
-    return {"status": "success", "message": f"TTL cleanup started for {ttl.ttl_minutes} minutes"}
+    hard = ttl.hard_ttl_minutes if ttl.hard_ttl_minutes is not None else ttl.ttl_minutes
+    if hard is None and ttl.soft_ttl_minutes is None:
+        raise HTTPException(status_code=400, detail="Provide soft_ttl_minutes and/or hard_ttl_minutes")
+    try:
+        ttls = cache_manager.set_ttls(ttl.soft_ttl_minutes, hard)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Rows past the hard TTL would never be served again
+    background_tasks.add_task(cache_manager.clean_expired_entries, ttls["hard_ttl_minutes"])
+    return {
+        "status": "success",
+        "message": f"TTLs set to soft={ttls['soft_ttl_minutes']} / hard={ttls['hard_ttl_minutes']} minutes, cleanup started",
+        **ttls,
+    }
+
+@app.get("/api/admin/profiling")
+async def get_profiling():
+    """Profiler settings and the kept profiles (newest first)."""
+    return profiling.snapshot()
+
+@app.post("/api/admin/profiling")
+async def set_profiling(settings: AdminProfiling):
+    try:
+        return profiling.configure(
+            targets=settings.targets, mode=settings.mode, interval_ms=settings.interval_ms,
+            sample_rate=settings.sample_rate, threshold_s=settings.threshold_s, keep=settings.keep,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/admin/profiling/{profile_id}")
+async def download_profile(profile_id: str, format: str = "text"):
+    """
+    One profile as `text` (hot functions / pstats), `collapsed` (flame graph input for
+    flamegraph.pl or speedscope) or `json` (summary + collapsed stacks).
+    """
+    profile = profiling.get_profile(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return {**profile.summary(), "stacks": dict(profile.stacks), "text": profile.text()}
+    if format not in ("text", "collapsed"):
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'")
+    if format == "collapsed" and profile.mode != "sample":
+        raise HTTPException(status_code=400, detail="Flame graph data needs a profile taken in 'sample' mode")
+    body = profile.collapsed() if format == "collapsed" else profile.text()
+    filename = f"profile-{profile.target.replace(':', '-')}-{profile.id}.{'folded' if format == 'collapsed' else 'txt'}"
+    return PlainTextResponse(body, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@app.delete("/api/admin/profiling")
+async def clear_profiles():
+    profiling.clear_profiles()
+    return {"status": "success"}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,144 @@
+"""
+Resource-blocking benchmark: page load time and bytes per site, blocking off vs on.
+
+For every site a search page is loaded `--runs` times with each browser profile:
+  * off     : everything loaded, "normal" page-load strategy (the old behaviour)
+  * blocked : the site's profile from utils.browser_manager.SITE_PROFILES
+Reported per run: driver.get() time, DOMContentLoaded / load event from the Navigation
+Timing API, resource count, bytes transferred (transferSize of the navigation and all
+resource entries; blocked requests never appear; cross-origin resources without
+Timing-Allow-Origin count as 0, so live numbers are a lower bound) and the product cards found with the
+scraper's selector, to catch a profile that breaks a site.
+
+Against the live sites by default; --fixtures uses the offline fixture server instead
+(there only images can be saved, the fixtures reference no trackers, fonts or video).
+
+Usage:
+    python -m benchmarks.bench_blocking [--sites amazon flipkart] [--runs 3] [--query shoes]
+                                        [--fixtures] [--out bench_blocking.json]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from utils import browser_manager
+
+SITES = {
+    # site: (domain of its blocking profile, search URL path, product card CSS selector)
+    "amazon": ("amazon.in", "/s?k={query}", "div[role='listitem']"),
+    "flipkart": ("flipkart.com", "/search?q={query}", "div.slAVV4, div._1sdMkc"),
+    "myntra": ("myntra.com", "/{query}?rawQuery={query}", "li.product-base"),
+    "meesho": ("meesho.com", "/search?q={query}", "div[class*='ProductCard']"),
+}
+LIVE_BASE_URLS = {
+    "amazon": "https://www.amazon.in",
+    "flipkart": "https://www.flipkart.com",
+    "myntra": "https://www.myntra.com",
+    "meesho": "https://www.meesho.com",
+}
+PAGE_STATS_JS = """
+const nav = performance.getEntriesByType('navigation')[0] || {};
+const resources = performance.getEntriesByType('resource');
+return {
+    dom_content_loaded_ms: nav.domContentLoadedEventEnd || null,
+    load_event_ms: nav.loadEventEnd || null,
+    resources: resources.length,
+    bytes: (nav.transferSize || 0) + resources.reduce((n, r) => n + (r.transferSize || 0), 0),
+};
+"""
+
+
+def measure(url, selector, profile, headless):
+    driver = browser_manager.get_driver(headless=headless, profile=profile)
+    try:
+        # Navigation starts a new document with the default 250-entry buffer, so the larger one has
+        # to be set in every new document rather than on the current (blank) page
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument",
+                               {"source": "performance.setResourceTimingBufferSize(5000)"})
+        started = time.perf_counter()
+        driver.get(url)
+        get_s = time.perf_counter() - started
+        # An eager load returns before late resources; give them a moment to show up in the totals
+        time.sleep(1)
+        stats = driver.execute_script(PAGE_STATS_JS)
+        stats["products"] = len(driver.find_elements("css selector", selector))
+        stats["get_s"] = get_s
+        return stats
+    finally:
+        driver.quit()
+
+
+def summarize(runs):
+    keys = ("get_s", "dom_content_loaded_ms", "load_event_ms", "resources", "bytes", "products")
+    return {key: statistics.median(r[key] for r in runs if r[key] is not None)
+            if any(r[key] is not None for r in runs) else None for key in keys}
+
+
+def bench_site(site, base_url, query, runs, headless):
+    domain, path, selector = SITES[site]
+    url = base_url + path.format(query=query.replace(" ", "+"))
+    profiles = {"off": browser_manager.OFF_PROFILE, "blocked": browser_manager.SITE_PROFILES[domain]}
+    result = {"url": url, "profile": {k: list(v) if isinstance(v, tuple) else v
+                                      for k, v in profiles["blocked"].items()}}
+    for name, profile in profiles.items():
+        samples = []
+        for _ in range(runs):
+            try:
+                samples.append(measure(url, selector, profile, headless))
+            except Exception as e:
+                print(f"  {site}/{name}: run failed: {e}")
+        result[name] = summarize(samples) if samples else None
+
+    off, blocked = result["off"], result["blocked"]
+    if off and blocked:
+        result["get_saved_s"] = off["get_s"] - blocked["get_s"]
+        result["bytes_saved"] = off["bytes"] - blocked["bytes"]
+        result["bytes_saved_pct"] = result["bytes_saved"] / off["bytes"] if off["bytes"] else None
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", nargs="+", choices=list(SITES), default=list(SITES))
+    parser.add_argument("--runs", type=int, default=3, help="Page loads per site and profile")
+    parser.add_argument("--query", default="running shoes")
+    parser.add_argument("--fixtures", action="store_true", help="Load the offline fixture pages instead")
+    parser.add_argument("--show-browser", action="store_true", help="Run Chrome with a window")
+    parser.add_argument("--out", default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    base_urls = LIVE_BASE_URLS
+    if args.fixtures:
+        from benchmarks.fixture_server import FixtureServer
+        from benchmarks.run import free_port
+        server = FixtureServer(port=free_port()).start_in_thread()
+        base_urls = {site: server.base_url(site) for site in SITES}
+
+    results = {}
+    try:
+        for site in args.sites:
+            print(f"{site}...")
+            results[site] = bench_site(site, base_urls[site], args.query, args.runs, not args.show_browser)
+    finally:
+        if server is not None:
+            server.stop_thread()
+
+    print(f"\n{'site':<10}{'get off':>10}{'get on':>10}{'KB off':>10}{'KB on':>10}{'saved':>8}{'products':>12}")
+    for site, r in results.items():
+        off, on = r["off"], r["blocked"]
+        if not (off and on):
+            print(f"{site:<10}{'failed':>10}")
+            continue
+        print(f"{site:<10}{off['get_s']:>9.2f}s{on['get_s']:>9.2f}s{off['bytes'] / 1024:>10.0f}{on['bytes'] / 1024:>10.0f}"
+              f"{r['bytes_saved_pct'] or 0:>8.0%}{off['products']:>6.0f} /{on['products']:>4.0f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
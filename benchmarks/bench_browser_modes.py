@@ -0,0 +1,97 @@
+"""
+Browser memory and start-up cost per concurrent search: one Chrome per page vs shared tabs.
+
+A search opens one page per marketplace. For each --concurrency level the benchmark opens
+concurrency x 4 fixture pages at once, the way parallel cache misses do, with
+  * process : BROWSER_MODE=process, a new Chrome per page (get_driver)
+  * tabs    : BROWSER_MODE=tabs, tabs of the shared browser (shared_browser.open_tab)
+While all pages are open it records the PSS of the chromedriver / Chrome processes
+(utils.browser_manager.browser_memory_mb, Linux only), and reports it per search next
+to the time until every page had loaded. The shared browser is closed between levels,
+so every tabs measurement includes starting it.
+
+Usage:
+    python -m benchmarks.bench_browser_modes [--concurrency 1 2 4] [--modes process tabs]
+                                             [--max-tabs 16] [--out bench_browser_modes.json]
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixture_server import FixtureServer, SITES
+from benchmarks.run import free_port
+from utils import browser_manager
+
+PATHS = {"amazon": "/s?k=shoes", "flipkart": "/search?q=shoes", "myntra": "/shoes", "meesho": "/search?q=shoes"}
+
+
+def open_one(mode, url, headless):
+    started = time.perf_counter()
+    if mode == "tabs":
+        driver = browser_manager.shared_browser.open_tab(headless=headless, site=url.split("/")[3])
+    else:
+        driver = browser_manager.get_driver(headless=headless)
+    driver.get(url)
+    return driver, time.perf_counter() - started
+
+
+def run_level(mode, urls, searches, headless):
+    pages = urls * searches
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(pages)) as pool:
+        opened = list(pool.map(lambda url: open_one(mode, url, headless), pages))
+    ready_s = time.perf_counter() - started
+    memory = browser_manager.browser_memory_mb()
+    with ThreadPoolExecutor(max_workers=len(opened)) as pool:
+        list(pool.map(lambda pair: pair[0].quit(), opened))
+    browser_manager.shared_browser.close()
+    page_times = sorted(seconds for _, seconds in opened)
+    return {
+        "searches": searches,
+        "pages": len(pages),
+        "all_ready_s": ready_s,
+        "page_ready_median_s": page_times[len(page_times) // 2],
+        "memory_mb": memory,
+        "memory_per_search_mb": memory / searches if memory is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4], help="Concurrent searches per level")
+    parser.add_argument("--modes", nargs="+", choices=("process", "tabs"), default=["process", "tabs"])
+    parser.add_argument("--max-tabs", type=int, default=16, help="Tab limit of the shared browser")
+    parser.add_argument("--show-browser", action="store_true", help="Run Chrome with a window")
+    parser.add_argument("--out", default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    browser_manager.shared_browser = browser_manager.SharedBrowser(max_tabs=max(args.max_tabs, 4 * max(args.concurrency)))
+    server = FixtureServer(port=free_port()).start_in_thread()
+    urls = [server.base_url(site) + PATHS[site] for site in SITES]
+    results = {mode: [] for mode in args.modes}
+    try:
+        for searches in args.concurrency:
+            for mode in args.modes:
+                print(f"{mode}: {searches} concurrent search(es)...")
+                results[mode].append(run_level(mode, urls, searches, not args.show_browser))
+    finally:
+        browser_manager.shared_browser.close()
+        server.stop_thread()
+
+    print(f"\n{'mode':<9}{'searches':>9}{'pages':>7}{'ready':>9}{'page p50':>10}{'memory':>10}{'per search':>12}")
+    for mode, levels in results.items():
+        for r in levels:
+            memory = f"{r['memory_mb']:.0f}MB" if r["memory_mb"] is not None else "n/a"
+            per_search = f"{r['memory_per_search_mb']:.0f}MB" if r["memory_per_search_mb"] is not None else "n/a"
+            print(f"{mode:<9}{r['searches']:>9}{r['pages']:>7}{r['all_ready_s']:>8.2f}s"
+                  f"{r['page_ready_median_s']:>9.2f}s{memory:>10}{per_search:>12}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
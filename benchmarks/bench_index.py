@@ -0,0 +1,159 @@
+"""
+Memory / recall benchmark for the query matcher's vector index modes.
+
+For each mode ('hnsw', 'sq8', 'pq') a fresh process builds an index over
+synthetic clustered unit vectors (MiniLM-sized, 384-dim) plus product metadata,
+and reports:
+  * RSS growth of the index and of the metadata store
+  * recall@k against exact brute-force search
+  * mean search latency
+
+The legacy metadata layout (three UUID-keyed dicts) is measured as a baseline.
+
+Usage:
+    python -m benchmarks.bench_index [--sizes 100000 1000000] [--out bench_index.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DIM = 384
+CHUNK = 100000
+N_CLUSTERS = 2000
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def make_chunk(chunk_id, size, centers):
+    rng = np.random.default_rng(1000 + chunk_id)
+    labels = rng.integers(0, len(centers), size)
+    vecs = centers[labels] + 0.35 * rng.standard_normal((size, DIM)).astype("float32") / np.sqrt(DIM)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    return vecs.astype("float32")
+
+
+def make_names(n):
+    return (f"Brand{i % 997} Cotton Kurti Style {i} Size {i % 7}" for i in range(n))
+
+
+def run_mode(mode, n, k, n_queries, ef_search):
+    sys.path.insert(0, os.path.dirname(ROOT))
+    import faiss
+    from cache_manager.query_processor import build_index, StringArray
+
+    centers = np.random.default_rng(0).standard_normal((N_CLUSTERS, DIM)).astype("float32")
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+
+    queries = make_chunk(-1, n_queries, centers)
+    # Exact ground truth, streamed chunk by chunk (inner product == cosine on unit vectors)
+    gt_scores = np.full((n_queries, k), -np.inf, dtype="float32")
+    gt_ids = np.zeros((n_queries, k), dtype="int64")
+
+    base = rss_bytes()
+    index = None
+    t0 = time.perf_counter()
+    for chunk_id, start in enumerate(range(0, n, CHUNK)):
+        vecs = make_chunk(chunk_id, min(CHUNK, n - start), centers)
+
+        sims = queries @ vecs.T
+        all_scores = np.hstack([gt_scores, sims])
+        all_ids = np.hstack([gt_ids, np.arange(start, start + len(vecs))[None, :].repeat(n_queries, 0)])
+        top = np.argsort(-all_scores, axis=1)[:, :k]
+        gt_scores = np.take_along_axis(all_scores, top, 1)
+        gt_ids = np.take_along_axis(all_ids, top, 1)
+
+        if index is None:
+            index = build_index(vecs, mode, DIM)
+        else:
+            index.add(vecs)
+        del vecs, sims, all_scores, all_ids
+    build_s = time.perf_counter() - t0
+    index_rss = rss_bytes() - base
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    t0 = time.perf_counter()
+    _, ids = index.search(queries, k)
+    search_ms = (time.perf_counter() - t0) * 1000 / n_queries
+    index_bytes = faiss.serialize_index(index).nbytes
+    recall = float(np.mean([len(set(ids[i]) & set(gt_ids[i])) / k for i in range(n_queries)]))
+
+    base = rss_bytes()
+    if mode == "hnsw":
+        names = list(make_names(n))
+        normalized = [s.lower() for s in names]
+    else:
+        names = StringArray(make_names(n))
+        normalized = StringArray(s.lower() for s in make_names(n))
+    metadata_rss = rss_bytes() - base
+
+    return {
+        "mode": mode, "products": n, "index_rss_mb": index_rss / 2**20,
+        "index_serialized_mb": index_bytes / 2**20,
+        "metadata_rss_mb": metadata_rss / 2**20, f"recall@{k}": recall,
+        "search_ms": search_ms, "build_s": build_s,
+    }
+
+
+def run_legacy_metadata(n):
+    base = rss_bytes()
+    products_map, normalized_map, index_to_uuid = {}, {}, []
+    for name in make_names(n):
+        uid = str(uuid.uuid4())
+        products_map[uid] = name
+        normalized_map[uid] = name.lower()
+        index_to_uuid.append(uid)
+    return {"mode": "legacy-uuid-metadata", "products": n, "metadata_rss_mb": (rss_bytes() - base) / 2**20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--modes", nargs="+", default=["hnsw", "sq8", "pq"])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--out", default=None, help="Write results as JSON to this file")
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "N"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        mode, n = args.worker[0], int(args.worker[1])
+        result = run_legacy_metadata(n) if mode == "legacy" else run_mode(mode, n, args.k, args.queries, args.ef_search)
+        print("RESULT " + json.dumps(result))
+        return
+
+    results = []
+    for n in args.sizes:
+        for mode in ["legacy"] + args.modes:
+            # One process per run so RSS numbers do not leak between modes
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_index", "--worker", mode, str(n),
+                 "--k", str(args.k), "--queries", str(args.queries), "--ef-search", str(args.ef_search)],
+                cwd=os.path.dirname(ROOT), capture_output=True, text=True
+            )
+            line = next((l for l in proc.stdout.splitlines() if l.startswith("RESULT ")), None)
+            if line is None:
+                print(f"{mode} @ {n}: failed\n{proc.stderr}")
+                continue
+            r = json.loads(line[len("RESULT "):])
+            results.append(r)
+            print(json.dumps(r))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
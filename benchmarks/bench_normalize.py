@@ -0,0 +1,92 @@
+"""
+Text normalization benchmark for IntelligentSearchEngine.
+
+Compares the original character-by-character normalizer / negative filter
+with TextNormalizer (precompiled regex, memoized stemmer, batch API) on a
+synthetic product-name corpus, and checks that both produce identical output.
+
+Usage:
+    python -m benchmarks.bench_normalize [--names 100000] [--out bench_normalize.json]
+"""
+import argparse
+import json
+import random
+import time
+
+from nltk.stem import PorterStemmer
+
+from cache_manager.query_processor import TextNormalizer, negative_filter_batch
+
+WORDS = ["Women's", "Men's", "Cotton", "Kurti", "Kurta", "Running", "Shoes", "Printed", "Straight",
+         "Slim-Fit", "Jeans", "Girls", "Boys", "Solid", "Casual", "Shirts", "Anarkali", "Dresses",
+         "Sneakers", "Watches", "Leather", "Wallet", "Samsung", "Galaxy", "S23", "(Pack", "of", "2)",
+         "Stainless", "Steel", "Bottles", "1L", "Unisex", "Hoodies", "Rayon", "Embroidered"]
+
+
+def legacy_normalize(stemmer, text):
+    text = str(text).lower().strip()
+    text = "".join([c if c.isalnum() or c.isspace() else " " for c in text])
+    return " ".join([stemmer.stem(word) for word in text.split()])
+
+
+def legacy_negative_filter(query_text, result_text):
+    q = "".join([c if c.isalnum() or c.isspace() else " " for c in query_text.lower()])
+    r = "".join([c if c.isalnum() or c.isspace() else " " for c in result_text.lower()])
+    q_words, r_words = set(q.split()), set(r.split())
+    men_terms = {'men', "man", "male", "boy", "gentleman", "mens"}
+    women_terms = {'women', "woman", "female", "girl", "lady", "womens"}
+    has_men_q, has_women_q = bool(q_words & men_terms), bool(q_words & women_terms)
+    has_men_r, has_women_r = bool(r_words & men_terms), bool(r_words & women_terms)
+    if has_men_q and not has_women_q and has_women_r and not has_men_r:
+        return True
+    if has_women_q and not has_men_q and has_men_r and not has_women_r:
+        return True
+    return False
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--names", type=int, default=100000)
+    parser.add_argument("--out", default=None, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    names = [" ".join(rng.choices(WORDS, k=rng.randint(3, 10))) + f" {i}" for i in range(args.names)]
+
+    stemmer = PorterStemmer()
+    legacy, legacy_s = timed(lambda: [legacy_normalize(stemmer, n) for n in names])
+    normalizer = TextNormalizer()
+    single, single_s = timed(lambda: [normalizer.normalize(n) for n in names])
+    normalizer = TextNormalizer()
+    batch, batch_s = timed(lambda: normalizer.normalize_batch(names))
+    assert legacy == single == batch, "normalizers disagree"
+
+    query = "Womens Kurti"
+    legacy_f, legacy_f_s = timed(lambda: [legacy_negative_filter(query, n) for n in names])
+    batch_f, batch_f_s = timed(lambda: negative_filter_batch(query, names))
+    assert legacy_f == batch_f, "negative filters disagree"
+
+    results = {
+        "names": args.names,
+        "normalize_legacy_s": legacy_s,
+        "normalize_cached_s": single_s,
+        "normalize_batch_s": batch_s,
+        "normalize_speedup": legacy_s / batch_s,
+        "negative_filter_legacy_s": legacy_f_s,
+        "negative_filter_batch_s": batch_f_s,
+        "negative_filter_speedup": legacy_f_s / batch_f_s,
+    }
+    print(json.dumps(results, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
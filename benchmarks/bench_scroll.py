@@ -0,0 +1,144 @@
+"""
+Scroll engine check and benchmark against lazily loading fixture pages.
+
+The fixture server's Myntra and Meesho pages append cards when scrolled to the bottom and
+load images when scrolled into view (fixtures/lazy_loader.js). For every scenario the
+old scroll loops and utils.scroll.scroll_for_cards run on the same page; reported are the
+time spent, product cards found, cards whose image got a src, and why scrolling stopped.
+  * finite : the grid ends after --total cards
+  * endless: the grid never ends (the old Myntra loop would scroll forever; it is cut
+             off after --legacy-cap seconds here)
+  * slow   : like finite, but every batch takes --slow-delay ms to arrive
+The engine must stop within its time budget everywhere and reach min(target, total) cards
+on the finite pages; the script exits with status 1 when it does not.
+
+Usage:
+    python -m benchmarks.bench_scroll [--sites myntra meesho] [--target 60] [--total 96]
+                                      [--budget 12] [--out bench_scroll.json]
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.run import free_port
+from utils import browser_manager, scroll
+
+CARDS = {"myntra": "li.product-base", "meesho": "div[class*='ProductCard']"}
+PATHS = {"myntra": "/shoes?rawQuery=shoes", "meesho": "/search?q=shoes"}
+IMAGES_JS = "return Array.from(document.querySelectorAll(arguments[0])).filter(c => c.querySelector('img[src]')).length;"
+
+
+def legacy_myntra(driver, cap_s):
+    """The previous Myntra loop: one viewport per 0.5s until the height stops growing."""
+    started = time.monotonic()
+    viewport_height = driver.execute_script("return window.innerHeight;")
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    current_scroll = 0
+    while time.monotonic() - started < cap_s:
+        driver.execute_script(f"window.scrollBy(0, {viewport_height});")
+        time.sleep(0.5)
+        current_scroll += viewport_height
+        new_height = driver.execute_script("return document.body.scrollHeight")
+        if current_scroll >= new_height:
+            if new_height == last_height:
+                time.sleep(1)
+                return "bottom"
+            last_height = new_height
+    return "cut off"
+
+
+def legacy_meesho(driver, cap_s):
+    """The previous Meesho loop: 2s wait, then up to 8 full-height scrolls 1.5s apart."""
+    time.sleep(2)
+    last_height = driver.execute_script("return document.body.scrollHeight")
+    for _ in range(8):
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(1.5)
+        new_height = driver.execute_script("return document.body.scrollHeight")
+        if new_height == last_height:
+            return "bottom"
+        last_height = new_height
+    return "steps"
+
+
+def run_one(url, site, method, args, headless):
+    driver = browser_manager.get_driver(headless=headless)
+    try:
+        driver.get(url)
+        started = time.monotonic()
+        if method == "engine":
+            reason = scroll.scroll_for_cards(driver, CARDS[site], target=args.target, budget_s=args.budget,
+                                             sweep_ms=60).reason
+        elif site == "myntra":
+            reason = legacy_myntra(driver, args.legacy_cap)
+        else:
+            reason = legacy_meesho(driver, args.legacy_cap)
+        elapsed = time.monotonic() - started
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "cards": len(driver.find_elements("css selector", CARDS[site])),
+            "cards_with_image": driver.execute_script(IMAGES_JS, CARDS[site]),
+            "reason": reason,
+        }
+    finally:
+        driver.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sites", nargs="+", choices=list(CARDS), default=list(CARDS))
+    parser.add_argument("--target", type=int, default=scroll.SCROLL_TARGET, help="Cards the engine scrolls for")
+    parser.add_argument("--total", type=int, default=96, help="Cards of the finite grids")
+    parser.add_argument("--batch", type=int, default=12, help="Cards per lazy load")
+    parser.add_argument("--delay", type=int, default=400, help="Milliseconds per lazy load")
+    parser.add_argument("--slow-delay", type=int, default=1800, help="Milliseconds per lazy load, slow scenario")
+    parser.add_argument("--budget", type=float, default=scroll.SCROLL_BUDGET_S, help="Engine time budget, seconds")
+    parser.add_argument("--legacy-cap", type=float, default=60, help="Seconds before the old loops are cut off")
+    parser.add_argument("--show-browser", action="store_true", help="Run Chrome with a window")
+    parser.add_argument("--out", default=None, help="Write the results as JSON")
+    args = parser.parse_args()
+
+    scenarios = {
+        "finite": {"total": args.total, "batch": args.batch, "delay": args.delay},
+        "endless": {"total": 0, "batch": args.batch, "delay": args.delay},
+        "slow": {"total": args.total, "batch": args.batch, "delay": args.slow_delay},
+    }
+    results, failures = {}, []
+    for name, lazy in scenarios.items():
+        server = FixtureServer(port=free_port(), lazy=lazy).start_in_thread()
+        try:
+            for site in args.sites:
+                url = server.base_url(site) + PATHS[site]
+                for method in ("legacy", "engine"):
+                    print(f"{name}/{site}/{method}...")
+                    r = run_one(url, site, method, args, not args.show_browser)
+                    results.setdefault(name, {}).setdefault(site, {})[method] = r
+                    if method != "engine":
+                        continue
+                    # The sweep after scrolling and the last step's wait may run past the budget
+                    if r["elapsed_s"] > args.budget + 5:
+                        failures.append(f"{name}/{site}: took {r['elapsed_s']}s")
+                    if lazy["total"] and r["cards"] < min(args.target, lazy["total"]):
+                        failures.append(f"{name}/{site}: {r['cards']} cards, expected {min(args.target, lazy['total'])}")
+        finally:
+            server.stop_thread()
+
+    print(f"\n{'scenario':<10}{'site':<8}{'method':<8}{'time':>8}{'cards':>7}{'images':>8}  reason")
+    for name, sites in results.items():
+        for site, methods in sites.items():
+            for method, r in methods.items():
+                print(f"{name:<10}{site:<8}{method:<8}{r['elapsed_s']:>7.1f}s{r['cards']:>7}{r['cards_with_image']:>8}  {r['reason']}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Startup benchmark for the NLP layer.
+
+Measures, in fresh interpreter processes:
+  * import time of `cache_manager.query_processor` and `api`
+  * time of the first engine use (model + index load) for three cases:
+      - no-index : empty data directory
+      - cold     : first process after an index was written to disk
+      - warm     : repeated process start (model and index files in OS cache)
+
+Usage:
+    python -m benchmarks.bench_startup [--products 2000] [--out bench_startup.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+from cache_manager import query_processor as nqp
+t1 = time.perf_counter()
+import api
+t2 = time.perf_counter()
+result = {"import_query_processor_s": t1 - t0, "import_api_s": t2 - t1}
+if {populate}:
+    nqp.engine.add_products(["Synthetic product %d" % i for i in range({populate})])
+else:
+    t3 = time.perf_counter()
+    nqp.engine.warm_up()
+    result["first_use_s"] = time.perf_counter() - t3
+    result["products"] = nqp.engine.index.ntotal if nqp.engine.index is not None else 0
+print("RESULT " + json.dumps(result))
+"""
+
+
+def run_probe(data_dir, populate=0):
+    env = dict(os.environ, SEARCH_ENGINE_DATA=data_dir, NLP_WARMUP="0")
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE.replace("{populate}", str(populate))],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(f"Probe failed:\n{proc.stderr}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000, help="Products in the on-disk index")
+    parser.add_argument("--out", default=None, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as empty_dir:
+        results["no-index"] = run_probe(empty_dir)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        run_probe(data_dir, populate=args.products)
+        results["cold"] = run_probe(data_dir)
+        results["warm"] = run_probe(data_dir)
+
+    for case, r in results.items():
+        print(f"{case:>9}: import qp {r['import_query_processor_s']:.3f}s | "
+              f"import api {r['import_api_s']:.3f}s | first use {r['first_use_s']:.3f}s "
+              f"({r['products']} products)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Local stand-in for the marketplaces, serving the recorded pages in benchmarks/fixtures.
+
+Every site lives under its own path prefix, so the scrapers only need their base URL
+overridden (AMAZON_BASE_URL, FLIPKART_BASE_URL, MYNTRA_BASE_URL, MEESHO_BASE_URL); rate limits
+and blocking profiles stay keyed by the real site domains (AMAZON_DOMAIN, ...):
+  /amazon/s?k=...          -> fixtures/amazon.html
+  /flipkart/search?q=...   -> fixtures/flipkart.html
+  /myntra/<query>          -> fixtures/myntra.html
+  /meesho/search?q=...     -> fixtures/meesho.html
+  /img/<name>.jpg          -> a small placeholder image
+Every search query gets the same page. `{{base}}` in a fixture is replaced by the server URL.
+Page and image latency are configurable (fixed + uniform jitter) to mimic real sites.
+With `lazy` (--lazy-total) the Myntra and Meesho pages load like the real ones: more cards
+are appended when scrolled to the bottom and images load when scrolled into view
+(fixtures/lazy_loader.js).
+
+Usage:
+    python -m benchmarks.fixture_server [--port 8765] [--latency 0.3] [--jitter 0.1]
+                                        [--lazy-total 60 --lazy-batch 12 --lazy-delay 400]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SITES = {
+    # site: (env var of the scraper's base URL, route under the prefix)
+    "amazon": ("AMAZON_BASE_URL", "/s"),
+    "flipkart": ("FLIPKART_BASE_URL", "/search"),
+    "myntra": ("MYNTRA_BASE_URL", "/{query}"),
+    "meesho": ("MEESHO_BASE_URL", "/search"),
+}
+# Smallest valid GIF; served for every product image (content type does not matter to the scrapers)
+# Repeated unit of the lazily loaded grids: the element cloned for new cards
+LAZY_UNITS = {"myntra": "li.product-base", "meesho": "div[class*='ProductList__GridCol']"}
+PLACEHOLDER_IMAGE = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b")
+
+
+class FixtureServer:
+    """
+    aiohttp server for the fixture pages. Use `await start()` / `await stop()` inside an
+    event loop, or `start_in_thread()` to run it next to blocking code.
+    """
+    def __init__(self, host="127.0.0.1", port=8765, latency=0.0, jitter=0.0, image_latency=0.0, lazy=None):
+        """`lazy`: {"total": cards in the end (0: endless), "batch": cards per load, "delay": ms per load}"""
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.image_latency = image_latency
+        self.lazy = lazy
+        self.requests = {site: 0 for site in SITES}
+        self.requests["img"] = 0
+        self._pages = {}
+        self._runner = None
+        self._thread = None
+        self._loop = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def base_url(self, site):
+        return f"{self.url}/{site}"
+
+    def env(self):
+        """Environment variables that point every scraper at this server."""
+        return {var: self.base_url(site) for site, (var, _) in SITES.items()}
+
+    def _page(self, site):
+        if site not in self._pages:
+            with open(os.path.join(FIXTURES_DIR, f"{site}.html"), encoding="utf-8") as f:
+                page = f.read().replace("{{base}}", self.url)
+            if self.lazy and site in LAZY_UNITS:
+                config = {"unit": LAZY_UNITS[site], "total": 0, "batch": 12, "delay": 400, "height": 420,
+                          "threshold": 200, **self.lazy}
+                with open(os.path.join(FIXTURES_DIR, "lazy_loader.js"), encoding="utf-8") as f:
+                    script = f.read()
+                page = page.replace("</body>", f"<script>window.LAZY_CONFIG = {json.dumps(config)};\n{script}</script>\n</body>")
+            self._pages[site] = page
+        return self._pages[site]
+
+    async def _delay(self, seconds):
+        if seconds or self.jitter:
+            await asyncio.sleep(seconds + random.uniform(0, self.jitter))
+
+    def _page_handler(self, site):
+        async def handler(request):
+            self.requests[site] += 1
+            await self._delay(self.latency)
+            return web.Response(text=self._page(site), content_type="text/html")
+        return handler
+
+    async def _image_handler(self, request):
+        self.requests["img"] += 1
+        await self._delay(self.image_latency)
+        return web.Response(body=PLACEHOLDER_IMAGE, content_type="image/gif")
+
+    def make_app(self):
+        app = web.Application()
+        for site, (_, route) in SITES.items():
+            app.router.add_get(f"/{site}{route}", self._page_handler(site))
+        app.router.add_get("/img/{name}", self._image_handler)
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self):
+        """Runs the server on its own event loop in a daemon thread; returns once it is listening."""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.stop())
+
+        self._thread = threading.Thread(target=run, name="fixture-server", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every page response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra uniform random delay, seconds")
+    parser.add_argument("--image-latency", type=float, default=0.0, help="Seconds added to every image response")
+    parser.add_argument("--lazy-total", type=int, default=None, help="Lazy-load Myntra / Meesho up to this many cards (0: endless)")
+    parser.add_argument("--lazy-batch", type=int, default=12, help="Cards appended per lazy load")
+    parser.add_argument("--lazy-delay", type=int, default=400, help="Milliseconds per lazy load")
+    args = parser.parse_args()
+
+    lazy = None
+    if args.lazy_total is not None:
+        lazy = {"total": args.lazy_total, "batch": args.lazy_batch, "delay": args.lazy_delay}
+    server = await FixtureServer(args.host, args.port, args.latency, args.jitter, args.image_latency, lazy).start()
+    print(f"Serving fixtures on {server.url}; point the scrapers at it with:")
+    for var, url in server.env().items():
+        print(f"  export {var}={url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,55 @@
+// Lazy-loading simulation for the offline fixtures (injected by fixture_server with --lazy-*).
+// The recorded cards are the first batch; scrolling near the bottom appends `batch` more
+// (copies with unique links) after `delay` ms, until `total` cards exist (0: never stops).
+// Images only get their src once scrolled into view, like the real sites' lazy loaders.
+(function () {
+    const cfg = window.LAZY_CONFIG;
+    const templates = Array.from(document.querySelectorAll(cfg.unit));
+    if (!templates.length) return;
+    const container = templates[0].parentNode;
+    let made = templates.length;
+    let loading = false;
+
+    const images = new IntersectionObserver(entries => entries.forEach(entry => {
+        if (!entry.isIntersecting) return;
+        const img = entry.target;
+        img.src = img.dataset.src;
+        const source = img.parentNode.querySelector("source[data-srcset]");
+        if (source) source.srcset = source.dataset.srcset;
+        images.unobserve(img);
+    }));
+
+    function lazify(card) {
+        card.style.display = "block";
+        card.style.minHeight = cfg.height + "px";
+        card.querySelectorAll("source[srcset]").forEach(s => { s.dataset.srcset = s.getAttribute("srcset"); s.removeAttribute("srcset"); });
+        card.querySelectorAll("img").forEach(img => {
+            if (img.hasAttribute("src")) { img.dataset.src = img.getAttribute("src"); img.removeAttribute("src"); }
+            images.observe(img);
+        });
+    }
+
+    function more() {
+        if (loading || (cfg.total && made >= cfg.total)) return;
+        loading = true;
+        setTimeout(() => {
+            for (let i = 0; i < cfg.batch && !(cfg.total && made >= cfg.total); i++, made++) {
+                const card = templates[made % templates.length].cloneNode(true);
+                card.querySelectorAll("a[href]").forEach(a => a.setAttribute("href", a.getAttribute("href") + "-" + made));
+                card.querySelectorAll("img").forEach(img => img.removeAttribute("src"));
+                container.appendChild(card);
+                lazify(card);
+            }
+            loading = false;
+            check();
+        }, cfg.delay);
+    }
+
+    function check() {
+        const root = document.scrollingElement || document.documentElement;
+        if (window.innerHeight + window.scrollY >= root.scrollHeight - cfg.threshold) more();
+    }
+
+    templates.forEach(lazify);
+    window.addEventListener("scroll", check, {passive: true});
+})();
@@ -0,0 +1,309 @@
+"""
+Load generator for the FastAPI service.
+
+Concurrent sessions (each with its own session cookie) send a weighted mix of:
+  * cached  : queries scraped during the priming phase
+  * similar : near-duplicates of those (case, word order, singular/plural)
+  * novel   : queries never seen before, i.e. cache misses that need a scrape slot
+  * admin   : /api/admin/stats, /api/admin/scheduler and /metrics
+By default the app is started in a scratch directory with every scraper pointed at the
+fixture server (benchmarks/fixture_server.py); pass --url to load an already running server.
+
+Each --sessions step runs for --duration seconds and reports p50 / p95 / p99 latency,
+throughput, error rate and 429 (queue full) rate per request kind, plus the scrape queue
+depth sampled from /api/admin/scheduler and the mean DB latency per operation from /metrics.
+Stepping up the session count shows where MAX_CONCURRENT_SCRAPES and the DB layer saturate.
+
+Usage:
+    python -m benchmarks.load_test [--sessions 1 4 16] [--duration 30]
+                                   [--mix cached=0.6,similar=0.2,novel=0.15,admin=0.05]
+                                   [--max-concurrent-scrapes 3] [--url http://host:8000] [--out FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_QUERIES = ["running shoes", "iphone 15", "cotton kurti", "bluetooth earbuds", "smart watch",
+                "backpack", "wireless mouse", "yoga mat"]
+ADMIN_PATHS = ["/api/admin/stats", "/api/admin/scheduler", "/metrics"]
+DEFAULT_MIX = "cached=0.6,similar=0.2,novel=0.15,admin=0.05"
+_DB_SAMPLE = re.compile(r'^db_query_seconds_(sum|count)\{op="([^"]+)"\} (\S+)$', re.M)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in ("cached", "similar", "novel", "admin"):
+            raise argparse.ArgumentTypeError(f"Unknown request kind '{kind}'")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def near_duplicate(query, rng):
+    """A differently written version of `query` that the NLP matcher should map back to it."""
+    words = query.split()
+    variants = [query.title(), query.upper(), f" {query} "]
+    if len(words) > 1:
+        variants.append(" ".join(reversed(words)))
+    if words[-1].endswith("s"):
+        variants.append(" ".join(words[:-1] + [words[-1][:-1]]))
+    else:
+        variants.append(query + "s")
+    return rng.choice(variants)
+
+
+def percentile(ordered, p):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = {}  # kind -> [(latency, status)]
+
+    def add(self, kind, latency, status):
+        self.samples.setdefault(kind, []).append((latency, status))
+
+    def report(self, elapsed):
+        out = {}
+        everything = []
+        for kind, samples in sorted(self.samples.items()):
+            everything.extend(samples)
+            out[kind] = self._summary(samples, elapsed)
+        out["all"] = self._summary(everything, elapsed)
+        return out
+
+    @staticmethod
+    def _summary(samples, elapsed):
+        ordered = sorted(latency for latency, _ in samples)
+        errors = sum(1 for _, status in samples if status is None or status >= 500)
+        rejected = sum(1 for _, status in samples if status == 429)
+        return {
+            "requests": len(samples),
+            "throughput_rps": len(samples) / elapsed if elapsed else None,
+            "p50_s": percentile(ordered, 50),
+            "p95_s": percentile(ordered, 95),
+            "p99_s": percentile(ordered, 99),
+            "error_rate": errors / len(samples) if samples else 0.0,
+            "rejected_rate": rejected / len(samples) if samples else 0.0,
+        }
+
+
+async def request(http, base_url, path, params=None):
+    started = time.perf_counter()
+    try:
+        async with http.get(base_url + path, params=params) as response:
+            await response.read()
+            return time.perf_counter() - started, response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return time.perf_counter() - started, None
+
+
+async def session_loop(base_url, mix, deadline, recorder, rng, timeout):
+    kinds, weights = zip(*mix.items())
+    jar = aiohttp.CookieJar(unsafe=True)
+    jar.update_cookies({"session_id": str(uuid.uuid4())})
+    async with aiohttp.ClientSession(cookie_jar=jar, timeout=aiohttp.ClientTimeout(total=timeout)) as http:
+        while time.monotonic() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            if kind == "admin":
+                latency, status = await request(http, base_url, rng.choice(ADMIN_PATHS))
+            else:
+                query = rng.choice(BASE_QUERIES)
+                if kind == "similar":
+                    query = near_duplicate(query, rng)
+                elif kind == "novel":
+                    query = f"{query} {rng.getrandbits(32):08x}"
+                latency, status = await request(http, base_url, "/api/search", {"q": query})
+            recorder.add(kind, latency, status)
+
+
+async def sample_scheduler(http, base_url, stop, samples):
+    while not stop.is_set():
+        try:
+            async with http.get(base_url + "/api/admin/scheduler") as response:
+                samples.append(await response.json())
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def db_totals(http, base_url):
+    """{op: (count, sum)} of db_query_seconds from /metrics."""
+    try:
+        async with http.get(base_url + "/metrics") as response:
+            text = await response.text()
+    except aiohttp.ClientError:
+        return {}
+    totals = {}
+    for field, op, value in _DB_SAMPLE.findall(text):
+        count, total = totals.get(op, (0.0, 0.0))
+        totals[op] = (float(value), total) if field == "count" else (count, float(value))
+    return totals
+
+
+async def run_step(base_url, sessions, duration, mix, seed, timeout):
+    recorder = Recorder()
+    scheduler_samples = []
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as http:
+        db_before = await db_totals(http, base_url)
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_scheduler(http, base_url, stop, scheduler_samples))
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(
+            session_loop(base_url, mix, deadline, recorder, random.Random(seed * 1000 + i), timeout)
+            for i in range(sessions)
+        ))
+        elapsed = time.monotonic() - started
+        stop.set()
+        await sampler
+        db_after = await db_totals(http, base_url)
+
+    db = {}
+    for op, (count, total) in db_after.items():
+        count -= db_before.get(op, (0.0, 0.0))[0]
+        total -= db_before.get(op, (0.0, 0.0))[1]
+        if count:
+            db[op] = {"count": int(count), "mean_ms": total / count * 1000}
+    return {
+        "sessions": sessions,
+        "elapsed_s": elapsed,
+        "requests": recorder.report(elapsed),
+        "scheduler": {
+            "max_running": max((s["running"] for s in scheduler_samples), default=None),
+            "max_queued": max((s["queued"] for s in scheduler_samples), default=None),
+            "mean_queued": (sum(s["queued"] for s in scheduler_samples) / len(scheduler_samples)
+                            if scheduler_samples else None),
+            "max_concurrent": scheduler_samples[-1]["max_concurrent"] if scheduler_samples else None,
+        },
+        "db": db,
+    }
+
+
+async def prime(base_url, timeout):
+    """Scrapes every base query once so the 'cached' and 'similar' kinds have something to hit."""
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as http:
+        for query in BASE_QUERIES:
+            latency, status = await request(http, base_url, "/api/search", {"q": query})
+            print(f"primed '{query}': {status} in {latency:.2f}s")
+
+
+async def wait_until_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as http:
+        while time.monotonic() < deadline:
+            try:
+                async with http.get(base_url + "/api/ready") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{base_url} did not become ready within {timeout:.0f}s")
+
+
+def start_app(port, workdir, server_env, max_concurrent):
+    """Starts the API with uvicorn in `workdir` (scratch DB / images), scrapers pointed at the fixtures."""
+    env = dict(os.environ, **server_env, PYTHONPATH=ROOT, CACHE_WARM="0",
+               SEARCH_ENGINE_DATA=os.path.join(workdir, "search_engine_data"))
+    if max_concurrent is not None:
+        env["MAX_CONCURRENT_SCRAPES"] = str(max_concurrent)
+    # Output goes to a file: a full pipe would stall the server mid-run
+    with open(os.path.join(workdir, "app.log"), "w") as log:
+        return subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1", "--port", str(port),
+             "--loop", "asyncio", "--log-level", "warning"],
+            cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+
+
+async def run(args):
+    mix = parse_mix(args.mix)
+    results = {"mix": mix, "duration_s": args.duration, "steps": []}
+    for sessions in args.sessions:
+        step = await run_step(args.url, sessions, args.duration, mix, args.seed, args.timeout)
+        results["steps"].append(step)
+        total = step["requests"]["all"]
+        print(f"sessions={sessions:>3}: {total['throughput_rps']:.1f} req/s  p50={total['p50_s'] or 0:.3f}s "
+              f"p95={total['p95_s'] or 0:.3f}s p99={total['p99_s'] or 0:.3f}s errors={total['error_rate']:.1%} "
+              f"429={total['rejected_rate']:.1%} max_queued={step['scheduler']['max_queued']}")
+        for kind, summary in step["requests"].items():
+            if kind != "all":
+                print(f"    {kind:<8}{summary['requests']:>6} req  p50={summary['p50_s'] or 0:.3f}s "
+                      f"p95={summary['p95_s'] or 0:.3f}s p99={summary['p99_s'] or 0:.3f}s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16], help="Concurrent sessions per step")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per step")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weights of cached / similar / novel / admin requests")
+    parser.add_argument("--url", default=None, help="Load an already running server instead of starting one")
+    parser.add_argument("--max-concurrent-scrapes", type=int, default=None, help="MAX_CONCURRENT_SCRAPES of the started app")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixture page latency, seconds")
+    parser.add_argument("--timeout", type=float, default=300, help="Per-request timeout, seconds")
+    parser.add_argument("--ready-timeout", type=float, default=300, help="Seconds to wait for /api/ready")
+    parser.add_argument("--no-prime", action="store_true", help="Skip scraping the base queries first")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    server = app = None
+    workdir = None
+    if args.url is None:
+        from benchmarks.fixture_server import FixtureServer
+        from benchmarks.run import free_port
+
+        server = FixtureServer(port=free_port(), latency=args.latency).start_in_thread()
+        workdir = tempfile.TemporaryDirectory(prefix="load-test-")
+        port = free_port()
+        app = start_app(port, workdir.name, server.env(), args.max_concurrent_scrapes)
+        args.url = f"http://127.0.0.1:{port}"
+    args.url = args.url.rstrip("/")
+
+    try:
+        asyncio.run(wait_until_ready(args.url, args.ready_timeout))
+        if not args.no_prime:
+            asyncio.run(prime(args.url, args.timeout))
+        results = asyncio.run(run(args))
+    except RuntimeError as e:
+        if app is not None and app.poll() is not None:
+            with open(os.path.join(workdir.name, "app.log")) as log:
+                print(log.read()[-4000:])
+        sys.exit(str(e))
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait()
+        if server is not None:
+            server.stop_thread()
+        if workdir is not None:
+            workdir.cleanup()
+
+    if server is not None:
+        results["fixture_requests"] = server.requests
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+End-to-end benchmark of `main_scraper.search_products` against the offline fixture server.
+
+Scenarios, each measured in fresh interpreter processes with an empty cache directory:
+  * cold   : first search of a process (imports done; model, DB and browser start included)
+  * warm   : repeated scrapes once everything is loaded (the query's cache is dropped before each run)
+  * cached : searches answered from the cache without scraping
+For every scenario the runner reports latency (mean / p50 / p95), throughput with
+--concurrency parallel searches, per-source / per-stage timings (utils.metrics), DB and
+NLP latency and the process RSS. Chrome runs in child processes and is not part of the RSS.
+
+Results are written as JSON (default benchmarks/results/<timestamp>.json); pass an
+earlier file with --compare to print the differences and flag regressions.
+
+Usage:
+    python -m benchmarks.run [--query "running shoes"] [--iterations 5] [--concurrency 4]
+                             [--latency 0.3] [--cold-runs 2] [--out FILE] [--compare OLD.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+# (scenario, metric, True if higher is better) checked by --compare
+COMPARED = [
+    (scenario, metric, higher_better)
+    for scenario in ("cold", "warm", "cached")
+    for metric, higher_better in (("latency_p50_s", False), ("latency_p95_s", False),
+                                  ("throughput_qps", True), ("peak_rss_mb", False))
+]
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(latencies):
+    if not latencies:
+        return {"runs": 0}
+    ordered = sorted(latencies)
+    return {
+        "runs": len(ordered),
+        "latency_mean_s": statistics.fmean(ordered),
+        "latency_p50_s": statistics.median(ordered),
+        "latency_p95_s": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "latency_min_s": ordered[0],
+        "latency_max_s": ordered[-1],
+    }
+
+
+# --- Worker (runs inside a fresh process) ---
+
+def histogram_totals():
+    from utils import metrics
+    return {
+        "stages": metrics.SCRAPE_STAGE_SECONDS.totals(),
+        "db": metrics.DB_SECONDS.totals(),
+        "nlp": metrics.NLP_SECONDS.totals(),
+    }
+
+
+def histogram_delta(before, after):
+    """{"stages": {"Amazon/page_load": {"count", "mean_s", "total_s"}}, "db": {...}, "nlp": {...}}"""
+    out = {}
+    for group, totals in after.items():
+        out[group] = {}
+        for key, (count, total) in sorted(totals.items()):
+            count -= before[group].get(key, (0, 0.0))[0]
+            total -= before[group].get(key, (0, 0.0))[1]
+            if count:
+                out[group]["/".join(key)] = {"count": count, "mean_s": total / count, "total_s": total}
+    return out
+
+
+async def timed_search(query, **kwargs):
+    import main_scraper
+    started = time.perf_counter()
+    products = await main_scraper.search_products(query, **kwargs)
+    return time.perf_counter() - started, len(products)
+
+
+async def run_concurrent(queries, **kwargs):
+    started = time.perf_counter()
+    await asyncio.gather(*(timed_search(q, **kwargs) for q in queries))
+    elapsed = time.perf_counter() - started
+    return len(queries) / elapsed if elapsed else None
+
+
+async def worker_cold(args):
+    import cache_manager as cache
+
+    before = histogram_totals()
+    latency, products = await timed_search(args.query)
+    return {
+        "cold": {
+            "latencies": [latency], "products": products, "rss_mb": rss_mb(), "peak_rss_mb": peak_rss_mb(),
+            **histogram_delta(before, histogram_totals()),
+        },
+        "db_rows": (await cache.get_all_products_stats())["total_items"],
+    }
+
+
+async def worker_warm(args):
+    import cache_manager as cache
+
+    # Untimed priming run: model, tables and the first browser start are the cold scenario's cost
+    await timed_search(args.query)
+    results = {}
+
+    before = histogram_totals()
+    latencies, products = [], 0
+    for _ in range(args.iterations):
+        await cache.delete_history(args.query)
+        latency, products = await timed_search(args.query, reuse_similar=False)
+        latencies.append(latency)
+    # Throughput: distinct uncached queries in parallel
+    batch = [f"{args.query} bench {i}" for i in range(args.concurrency)]
+    throughput = await run_concurrent(batch, reuse_similar=False)
+    results["warm"] = {
+        "latencies": latencies, "products": products, "throughput_qps": throughput,
+        "rss_mb": rss_mb(), "peak_rss_mb": peak_rss_mb(), **histogram_delta(before, histogram_totals()),
+    }
+
+    # The query was scraped by the last warm iteration, so these never hit a browser
+    before = histogram_totals()
+    latencies = []
+    for _ in range(args.iterations):
+        latency, products = await timed_search(args.query)
+        latencies.append(latency)
+    throughput = await run_concurrent([args.query] * (args.iterations * args.concurrency))
+    results["cached"] = {
+        "latencies": latencies, "products": products, "throughput_qps": throughput,
+        "rss_mb": rss_mb(), "peak_rss_mb": peak_rss_mb(), **histogram_delta(before, histogram_totals()),
+    }
+    return results
+
+
+def run_worker(args):
+    started = time.perf_counter()
+    import main_scraper  # noqa: F401  (import cost is reported separately from the cold search)
+    import_s = time.perf_counter() - started
+    result = asyncio.run(worker_cold(args) if args.worker == "cold" else worker_warm(args))
+    result["import_s"] = import_s
+    print("RESULT " + json.dumps(result))
+
+
+# --- Driver ---
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def spawn(phase, args, server_env):
+    with tempfile.TemporaryDirectory(prefix=f"bench-{phase}-") as workdir:
+        # A scratch working directory keeps the cache DB, NLP index and images out of the repo
+        env = dict(os.environ, **server_env, PYTHONPATH=ROOT, NLP_WARMUP="0", CACHE_WARM="0",
+                   SEARCH_ENGINE_DATA=os.path.join(workdir, "search_engine_data"))
+        cmd = [sys.executable, "-m", "benchmarks.run", "--worker", phase, "--query", args.query,
+               "--iterations", str(args.iterations), "--concurrency", str(args.concurrency)]
+        proc = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True, timeout=args.timeout)
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("RESULT ")), None)
+    if line is None:
+        raise RuntimeError(f"{phase} worker failed:\n{proc.stderr[-4000:]}")
+    return json.loads(line[len("RESULT "):])
+
+
+def finish(scenario):
+    latencies = scenario.pop("latencies")
+    return {**summarize(latencies), **scenario}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(args):
+    from benchmarks.fixture_server import FixtureServer
+
+    server = FixtureServer(port=args.port or free_port(), latency=args.latency, jitter=args.jitter,
+                           image_latency=args.image_latency).start_in_thread()
+    try:
+        cold_runs = [spawn("cold", args, server.env()) for _ in range(args.cold_runs)]
+        warm = spawn("warm", args, server.env())
+    finally:
+        server.stop_thread()
+
+    # Cold runs are one search per process: merge them into one scenario
+    cold = {"latencies": [r["cold"]["latencies"][0] for r in cold_runs],
+            "products": cold_runs[-1]["cold"]["products"],
+            "rss_mb": max(r["cold"]["rss_mb"] for r in cold_runs),
+            "peak_rss_mb": max(r["cold"]["peak_rss_mb"] for r in cold_runs),
+            "throughput_qps": None,
+            "stages": cold_runs[-1]["cold"]["stages"], "db": cold_runs[-1]["cold"]["db"],
+            "nlp": cold_runs[-1]["cold"]["nlp"]}
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "params": {k: getattr(args, k) for k in ("query", "iterations", "concurrency", "cold_runs",
+                                                 "latency", "jitter", "image_latency")},
+        "import_s": statistics.fmean(r["import_s"] for r in cold_runs),
+        "scenarios": {"cold": finish(cold), "warm": finish(warm["warm"]), "cached": finish(warm["cached"])},
+        "fixture_requests": server.requests,
+    }
+
+
+def compare(old, new, threshold):
+    """Prints old vs new for the key metrics; returns the regressions beyond `threshold` (relative)."""
+    regressions = []
+    print(f"\n{'metric':<30}{'old':>12}{'new':>12}{'change':>10}")
+    for scenario, metric, higher_better in COMPARED:
+        a = old.get("scenarios", {}).get(scenario, {}).get(metric)
+        b = new["scenarios"].get(scenario, {}).get(metric)
+        if not a or b is None:
+            continue
+        change = (b - a) / a
+        worse = -change if higher_better else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        if flag:
+            regressions.append(f"{scenario}.{metric}")
+        print(f"{scenario + '.' + metric:<30}{a:>12.4f}{b:>12.4f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", default="running shoes")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed searches per warm / cached scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel searches for the throughput runs")
+    parser.add_argument("--cold-runs", type=int, default=2, help="Fresh processes for the cold scenario")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixture page latency, seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra uniform page / image delay, seconds")
+    parser.add_argument("--image-latency", type=float, default=0.02, help="Fixture image latency, seconds")
+    parser.add_argument("--port", type=int, default=0, help="Fixture server port (default: a free one)")
+    parser.add_argument("--timeout", type=float, default=900, help="Seconds allowed per worker process")
+    parser.add_argument("--out", default=None, help="Result file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change reported as a regression")
+    parser.add_argument("--worker", choices=("cold", "warm"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = run_benchmark(args)
+    for name, scenario in results["scenarios"].items():
+        print(f"{name:>7}: p50={scenario.get('latency_p50_s', 0):.3f}s p95={scenario.get('latency_p95_s', 0):.3f}s "
+              f"qps={scenario.get('throughput_qps') or 0:.2f} peak_rss={scenario['peak_rss_mb']:.0f}MB "
+              f"products={scenario['products']}")
+
+    out = args.out or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
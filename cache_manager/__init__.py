@@ -1,12 +1,97 @@
 import aiosqlite
 import aiofiles
+import asyncio
 import os
-from datetime import datetime
+import json
+import uuid
+import base64
+from datetime import datetime, timedelta
+from utils.product_fields import TYPED_FIELDS, normalize_item
+from cache_manager.dedup import signature, signature_batch, group_products
+from utils.metrics import timed_db
 
 DB_NAME = "product_cache.db"
 
+# Cache freshness, in minutes (age of a query's most recent scrape):
+# - younger than SOFT_TTL_MINUTES: fresh, served as is
+# - between the two: stale, served instantly while a background refresh re-scrapes it
+# - older than HARD_TTL_MINUTES: expired, the request waits for a scrape
+SOFT_TTL_MINUTES = int(os.environ.get("CACHE_SOFT_TTL", "720"))
+HARD_TTL_MINUTES = int(os.environ.get("CACHE_HARD_TTL", "2880"))
+
+
+def set_ttls(soft_minutes=None, hard_minutes=None):
+    """Updates the soft / hard TTLs (None keeps the current value)."""
+    global SOFT_TTL_MINUTES, HARD_TTL_MINUTES
+    soft = SOFT_TTL_MINUTES if soft_minutes is None else soft_minutes
+    hard = HARD_TTL_MINUTES if hard_minutes is None else hard_minutes
+    if soft < 0 or hard <= 0:
+        raise ValueError("TTLs must be positive")
+    # Lowering only the hard TTL below the soft one shrinks the stale window to nothing
+    SOFT_TTL_MINUTES, HARD_TTL_MINUTES = min(soft, hard), hard
+    return get_ttls()
+
+
+def get_ttls():
+    return {"soft_ttl_minutes": SOFT_TTL_MINUTES, "hard_ttl_minutes": HARD_TTL_MINUTES}
+
+
+def freshness(age_minutes):
+    if age_minutes <= SOFT_TTL_MINUTES:
+        return "fresh"
+    if age_minutes <= HARD_TTL_MINUTES:
+        return "stale"
+    return "expired"
+
+
+# Typed columns added after the first release: name -> SQL type
+MIGRATED_COLUMNS = {
+    "price_value": "REAL",
+    "mrp_value": "REAL",
+    "discount_pct": "REAL",
+    "rating_value": "REAL",
+    "review_count": "INT",
+    "signature": "TEXT",  # cross-source dedup key (cache_manager.dedup)
+}
+
+# Columns returned for a product row: display strings first, then the typed values
+PRODUCT_COLUMNS = "id, name, link, price, delivery, rating, image, timestamp, p_index, " + ", ".join(TYPED_FIELDS)
+
+# Databases whose schema was already checked by this process
+_initialized = set()
+
+
+async def _migrate_columns(db):
+    """Adds missing typed columns to product_cache and backfills them from the display strings."""
+    async with db.execute("PRAGMA table_info(product_cache)") as cursor:
+        existing = {row[1] async for row in cursor}
+    added = [col for col in MIGRATED_COLUMNS if col not in existing]
+    for col in added:
+        await db.execute(f"ALTER TABLE product_cache ADD COLUMN {col} {MIGRATED_COLUMNS[col]}")
+
+    if added:
+        # The "rating" column holds the scraped review string ("Rating: 4.2, Count: 1,234")
+        async with db.execute("SELECT id, price, rating FROM product_cache") as cursor:
+            rows = [row async for row in cursor]
+        assignments = ", ".join(f"{field} = ?" for field in TYPED_FIELDS)
+        await db.executemany(
+            f"UPDATE product_cache SET {assignments} WHERE id = ?",
+            [(*normalize_item({"price": price, "review": review}).values(), row_id) for row_id, price, review in rows],
+        )
+    if "signature" in added:
+        async with db.execute("SELECT id, name FROM product_cache") as cursor:
+            rows = [row async for row in cursor]
+        signatures = signature_batch([name for _, name in rows])
+        await db.executemany(
+            "UPDATE product_cache SET signature = ? WHERE id = ?",
+            [(sig, row_id) for sig, (row_id, _) in zip(signatures, rows)],
+        )
+
 
 async def init_table():
+    # Called on every search: only the first call per process touches the schema
+    if DB_NAME in _initialized and os.path.exists(DB_NAME):
+        return
     async with aiosqlite.connect(DB_NAME) as db:
         await db.execute('''
             CREATE TABLE IF NOT EXISTS product_cache (
@@ -23,16 +108,90 @@ async def init_table():
                 p_index INT
             )
         ''')
+        await _migrate_columns(db)
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_product_cache_query_price ON product_cache (query, price_value)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_product_cache_query_rating ON product_cache (query, rating_value)")
+        # One row per (query, source, p_index): scrapes upsert, so a re-run or resumed job never duplicates
+        async with db.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_product_cache_item'") as cursor:
+            has_item_index = await cursor.fetchone() is not None
+        if not has_item_index:
+            await db.execute('''
+                DELETE FROM product_cache WHERE id NOT IN (
+                    SELECT MAX(id) FROM product_cache GROUP BY query, source, p_index
+                )
+            ''')
+            await db.execute("CREATE UNIQUE INDEX idx_product_cache_item ON product_cache (query, source, p_index)")
+        # Outcome of the last scrape of each (query, source): ok / empty / failed
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS query_sources (
+                query TEXT,
+                source TEXT,
+                status TEXT,
+                items INT,
+                scraped_at TEXT,
+                error TEXT,
+                PRIMARY KEY (query, source)
+            )
+        ''')
+        await db.execute('''
+            INSERT OR IGNORE INTO query_sources (query, source, status, items, scraped_at)
+            SELECT query, source, 'ok', COUNT(*), MAX(timestamp) FROM product_cache GROUP BY query, source
+        ''')
+        # Decayed per-query request counts, used for cache warming
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS query_stats (
+                query TEXT PRIMARY KEY,
+                score REAL,
+                hits INT,
+                last_seen TEXT
+            )
+        ''')
+        # Seed from queries scraped before the table existed
+        await db.execute('''
+            INSERT OR IGNORE INTO query_stats (query, score, hits, last_seen)
+            SELECT query, 1.0, 1, MAX(timestamp) FROM product_cache GROUP BY query
+        ''')
+        # Durable scrape jobs (queued / running / done / failed) and the state of each source in them
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_jobs (
+                id TEXT PRIMARY KEY,
+                query TEXT,
+                state TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                items INT,
+                error TEXT
+            )
+        ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_job_sources (
+                job_id TEXT,
+                source TEXT,
+                state TEXT,
+                items INT,
+                error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (job_id, source)
+            )
+        ''')
         await db.commit()
+    _initialized.add(DB_NAME)
 
 
+@timed_db("store")
 async def store_query_data(query, source, item):
     timestamp = datetime.utcnow().isoformat()
+    # Typed fields come from the scraper pipeline; parse them here for items that skipped it
+    typed = item if all(field in item for field in TYPED_FIELDS) else normalize_item(item)
 
     async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute('''
-            INSERT INTO product_cache (query, source, name, link, price, delivery, rating, image, timestamp, p_index)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        await db.execute(f'''
+            INSERT INTO product_cache (query, source, name, link, price, delivery, rating, image, timestamp, p_index, {", ".join(TYPED_FIELDS)}, signature)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (query, source, p_index) DO UPDATE SET
+                name = excluded.name, link = excluded.link, price = excluded.price, delivery = excluded.delivery,
+                rating = excluded.rating, image = NULL, timestamp = excluded.timestamp,
+                {", ".join(f"{field} = excluded.{field}" for field in TYPED_FIELDS)}, signature = excluded.signature
         ''', (
             query,
             source,
@@ -43,7 +202,9 @@ async def store_query_data(query, source, item):
             item.get("review", "N/A"),
             None,
             timestamp,
-            item.get("index", -1)
+            item.get("index", -1),
+            *(typed[field] for field in TYPED_FIELDS),
+            item.get("signature") or signature(item.get("Name"))
         ))
         await db.commit()
 
@@ -73,58 +234,158 @@ async def cache_images(query):
         await db.commit()
 
 
-async def retrieve_query_data(query):
+def _rows_to_products(query, src, rows):
+    products = []
+    for row in rows:
+        row_id, name, link, price, delivery, rating, img_blob, timestamp, index = row[:9]
+        product = {
+            "id": row_id,
+            "source": src,
+            "name": name,
+            "product_link": link,
+            "price": price,
+            "delivery": delivery,
+            "rating": rating,
+            "image_url": f"/images/{src}/{query}/product_{index}.jpg", # Constructing a path for the API to serve
+            "timestamp": timestamp
+        }
+        # Typed values (price_value, rating_value, ...) when the row carries them
+        product.update(zip(TYPED_FIELDS, row[9:]))
+        products.append(product)
+    return products
+
+
+@timed_db("freshness")
+async def query_freshness(query):
     """
-    Retrieves cached data for a query.
-    Returns a list of dictionaries if found, else None.
+    Per-source freshness of a cached query.
+    Returns (state, sources): sources are the ones still servable (not past the hard TTL);
+    state is "fresh" / "stale" (stale as soon as one servable source is), "expired" when
+    every source has expired, or None when nothing is cached.
     """
+    now = datetime.utcnow()
     async with aiosqlite.connect(DB_NAME) as db:
-        # Check if we have any data for this query
-        async with db.execute("SELECT DISTINCT source FROM product_cache WHERE query = ?", (query,)) as cursor:
-            sources = [row[0] async for row in cursor]
+        # The age of a source is the age of its most recent scrape
+        async with db.execute(
+            "SELECT source, MAX(timestamp) FROM product_cache WHERE query = ? GROUP BY source", (query,)
+        ) as cursor:
+            rows = [row async for row in cursor]
 
-        if not sources:
-            return None
+    if not rows:
+        return None, []
 
-        all_products = []
-        
-        # Check age of the first entry found to determine if we should invalidate
-        # (Assuming all entries for a query are inserted roughly at the same time)
-        async with db.execute("SELECT timestamp FROM product_cache WHERE query = ? LIMIT 1", (query,)) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                timestamp = row[0]
-                age = (datetime.utcnow() - datetime.fromisoformat(timestamp)).total_seconds() / 60
-                # Default TTL check here, though we will also have a background cleaner
-                # Let's say default 48 hours (2880 mins) as per original code
-                if age > 2880:
-                    await db.execute("DELETE FROM product_cache WHERE query = ?", (query,))
-                    await db.commit()
-                    return None
+    state = "fresh"
+    sources = []
+    for src, timestamp in rows:
+        age = (now - datetime.fromisoformat(timestamp)).total_seconds() / 60 if timestamp else 0
+        src_state = freshness(age)
+        if src_state == "expired":
+            continue
+        if src_state == "stale":
+            state = "stale"
+        sources.append(src)
+    return (state if sources else "expired"), sources
 
+@timed_db("retrieve")
+async def retrieve_query_entry(query):
+    """
+    Retrieves cached data for a query together with its freshness (see query_freshness).
+    Sources past the hard TTL are left out.
+    Returns (products, state), (None, "expired") when every source has expired,
+    or (None, None) when nothing is cached.
+    Expired rows are kept (as stale fallback for sources that cannot be scraped)
+    until a re-scrape replaces them or clean_expired_entries removes them.
+    """
+    state, sources = await query_freshness(query)
+    if not sources:
+        return None, state
+
+    all_products = []
+    async with aiosqlite.connect(DB_NAME) as db:
         for src in sources:
-            async with db.execute('''
-                SELECT id, name, link, price, delivery, rating, image, timestamp, p_index
+            async with db.execute(f'''
+                SELECT {PRODUCT_COLUMNS}
                 FROM product_cache
                 WHERE query = ? AND source = ?
             ''', (query, src)) as cursor:
                 rows = [row async for row in cursor]
 
-            for row_id, name, link, price, delivery, rating, img_blob, timestamp, index in rows:
-                product = {
-                    "id": row_id,
-                    "source": src,
-                    "name": name,
-                    "product_link": link,
-                    "price": price,
-                    "delivery": delivery,
-                    "rating": rating,
-                    "image_url": f"/images/{src}/{query}/product_{index}.jpg", # Constructing a path for the API to serve
-                    "timestamp": timestamp
-                }
-                all_products.append(product)
-
-    return all_products
+            all_products.extend(_rows_to_products(query, src, rows))
+
+    return all_products, state
+
+async def retrieve_query_data(query):
+    """
+    Retrieves cached data for a query.
+    Returns a list of dictionaries if found and younger than the hard TTL, else None.
+    """
+    products, state = await retrieve_query_entry(query)
+    if state == "expired":
+        return None
+    return products
+
+@timed_db("retrieve_source")
+async def retrieve_source_rows(query, source):
+    """
+    Returns cached rows of one source for a query regardless of age.
+    Used to serve stale data while a source's circuit breaker is open.
+    """
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute(f'''
+            SELECT {PRODUCT_COLUMNS}
+            FROM product_cache
+            WHERE query = ? AND source = ?
+        ''', (query, source)) as cursor:
+            rows = [row async for row in cursor]
+    return _rows_to_products(query, source, rows)
+
+@timed_db("record_source_status")
+async def record_source_status(query, source, status, items=0, error=None):
+    """Stores the outcome of scraping one source for a query (ok / empty / failed)."""
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute('''
+            INSERT OR REPLACE INTO query_sources (query, source, status, items, scraped_at, error)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (query, source, status, items, datetime.utcnow().isoformat(), error))
+        await db.commit()
+
+@timed_db("source_states")
+async def get_source_states(query):
+    """
+    Returns {source: {"status", "items", "error", "attempt_age", "data_age"}} for a query.
+    attempt_age is minutes since the last scrape attempt, data_age minutes since the
+    cached rows were stored (None without rows).
+    """
+    now = datetime.utcnow()
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute('''
+            SELECT s.source, s.status, s.items, s.error, s.scraped_at, MAX(p.timestamp)
+            FROM query_sources s LEFT JOIN product_cache p ON p.query = s.query AND p.source = s.source
+            WHERE s.query = ?
+            GROUP BY s.source
+        ''', (query,)) as cursor:
+            rows = [row async for row in cursor]
+
+    def minutes_since(ts):
+        return (now - datetime.fromisoformat(ts)).total_seconds() / 60 if ts else None
+
+    return {
+        source: {
+            "status": status,
+            "items": items,
+            "error": error,
+            "attempt_age": minutes_since(scraped_at),
+            "data_age": minutes_since(data_ts),
+        }
+        for source, status, items, error, scraped_at, data_ts in rows
+    }
+
+@timed_db("delete_source")
+async def delete_source_rows(query, source):
+    """Removes the rows of one source for a query, before a re-scrape stores fresh ones."""
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute("DELETE FROM product_cache WHERE query = ? AND source = ?", (query, source))
+        await db.commit()
 
 async def clean_expired_entries(ttl_minutes: int):
     """
@@ -193,13 +454,98 @@ async def delete_product(product_id: int):
         await db.commit()
 import aiosqlite
 import aiofiles
+import asyncio
 import os
-from datetime import datetime
+import json
+import uuid
+import base64
+from datetime import datetime, timedelta
+from utils.product_fields import TYPED_FIELDS, normalize_item
+from cache_manager.dedup import signature, signature_batch, group_products
+from utils.metrics import timed_db, DB_SECONDS, NLP_SECONDS
 
 DB_NAME = "product_cache.db"
 
+# Cache freshness, in minutes (age of a query's most recent scrape):
+# - younger than SOFT_TTL_MINUTES: fresh, served as is
+# - between the two: stale, served instantly while a background refresh re-scrapes it
+# - older than HARD_TTL_MINUTES: expired, the request waits for a scrape
+SOFT_TTL_MINUTES = int(os.environ.get("CACHE_SOFT_TTL", "720"))
+HARD_TTL_MINUTES = int(os.environ.get("CACHE_HARD_TTL", "2880"))
+
+
+def set_ttls(soft_minutes=None, hard_minutes=None):
+    """Updates the soft / hard TTLs (None keeps the current value)."""
+    global SOFT_TTL_MINUTES, HARD_TTL_MINUTES
+    soft = SOFT_TTL_MINUTES if soft_minutes is None else soft_minutes
+    hard = HARD_TTL_MINUTES if hard_minutes is None else hard_minutes
+    if soft < 0 or hard <= 0:
+        raise ValueError("TTLs must be positive")
+    # Lowering only the hard TTL below the soft one shrinks the stale window to nothing
+    SOFT_TTL_MINUTES, HARD_TTL_MINUTES = min(soft, hard), hard
+    return get_ttls()
+
+
+def get_ttls():
+    return {"soft_ttl_minutes": SOFT_TTL_MINUTES, "hard_ttl_minutes": HARD_TTL_MINUTES}
+
+
+def freshness(age_minutes):
+    if age_minutes <= SOFT_TTL_MINUTES:
+        return "fresh"
+    if age_minutes <= HARD_TTL_MINUTES:
+        return "stale"
+    return "expired"
+
+
+# Typed columns added after the first release: name -> SQL type
+MIGRATED_COLUMNS = {
+    "price_value": "REAL",
+    "mrp_value": "REAL",
+    "discount_pct": "REAL",
+    "rating_value": "REAL",
+    "review_count": "INT",
+    "signature": "TEXT",  # cross-source dedup key (cache_manager.dedup)
+}
+
+# Columns returned for a product row: display strings first, then the typed values
+PRODUCT_COLUMNS = "id, name, link, price, delivery, rating, image, timestamp, p_index, " + ", ".join(TYPED_FIELDS)
+
+# Databases whose schema was already checked by this process
+_initialized = set()
+
+
+async def _migrate_columns(db):
+    """Adds missing typed columns to product_cache and backfills them from the display strings."""
+    async with db.execute("PRAGMA table_info(product_cache)") as cursor:
+        existing = {row[1] async for row in cursor}
+    added = [col for col in MIGRATED_COLUMNS if col not in existing]
+    for col in added:
+        await db.execute(f"ALTER TABLE product_cache ADD COLUMN {col} {MIGRATED_COLUMNS[col]}")
+
+    if added:
+        # The "rating" column holds the scraped review string ("Rating: 4.2, Count: 1,234")
+        async with db.execute("SELECT id, price, rating FROM product_cache") as cursor:
+            rows = [row async for row in cursor]
+        assignments = ", ".join(f"{field} = ?" for field in TYPED_FIELDS)
+        await db.executemany(
+            f"UPDATE product_cache SET {assignments} WHERE id = ?",
+            [(*normalize_item({"price": price, "review": review}).values(), row_id) for row_id, price, review in rows],
+        )
+    if "signature" in added:
+        async with db.execute("SELECT id, name FROM product_cache") as cursor:
+            rows = [row async for row in cursor]
+        signatures = signature_batch([name for _, name in rows])
+        await db.executemany(
+            "UPDATE product_cache SET signature = ? WHERE id = ?",
+            [(sig, row_id) for sig, (row_id, _) in zip(signatures, rows)],
+        )
+
 
 async def init_table():
+    # Called on every search: only the first call per process touches the schema
+    if DB_NAME in _initialized and os.path.exists(DB_NAME):
+        return
     async with aiosqlite.connect(DB_NAME) as db:
         await db.execute('''
             CREATE TABLE IF NOT EXISTS product_cache (
@@ -216,16 +562,90 @@ async def init_table():
                 p_index INT
             )
         ''')
+        await _migrate_columns(db)
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_product_cache_query_price ON product_cache (query, price_value)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_product_cache_query_rating ON product_cache (query, rating_value)")
+        # One row per (query, source, p_index): scrapes upsert, so a re-run or resumed job never duplicates
+        async with db.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_product_cache_item'") as cursor:
+            has_item_index = await cursor.fetchone() is not None
+        if not has_item_index:
+            await db.execute('''
+                DELETE FROM product_cache WHERE id NOT IN (
+                    SELECT MAX(id) FROM product_cache GROUP BY query, source, p_index
+                )
+            ''')
+            await db.execute("CREATE UNIQUE INDEX idx_product_cache_item ON product_cache (query, source, p_index)")
+        # Outcome of the last scrape of each (query, source): ok / empty / failed
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS query_sources (
+                query TEXT,
+                source TEXT,
+                status TEXT,
+                items INT,
+                scraped_at TEXT,
+                error TEXT,
+                PRIMARY KEY (query, source)
+            )
+        ''')
+        await db.execute('''
+            INSERT OR IGNORE INTO query_sources (query, source, status, items, scraped_at)
+            SELECT query, source, 'ok', COUNT(*), MAX(timestamp) FROM product_cache GROUP BY query, source
+        ''')
+        # Decayed per-query request counts, used for cache warming
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS query_stats (
+                query TEXT PRIMARY KEY,
+                score REAL,
+                hits INT,
+                last_seen TEXT
+            )
+        ''')
+        # Seed from queries scraped before the table existed
+        await db.execute('''
+            INSERT OR IGNORE INTO query_stats (query, score, hits, last_seen)
+            SELECT query, 1.0, 1, MAX(timestamp) FROM product_cache GROUP BY query
+        ''')
+        # Durable scrape jobs (queued / running / done / failed) and the state of each source in them
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_jobs (
+                id TEXT PRIMARY KEY,
+                query TEXT,
+                state TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                items INT,
+                error TEXT
+            )
+        ''')
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS scrape_job_sources (
+                job_id TEXT,
+                source TEXT,
+                state TEXT,
+                items INT,
+                error TEXT,
+                updated_at TEXT,
+                PRIMARY KEY (job_id, source)
+            )
+        ''')
         await db.commit()
+    _initialized.add(DB_NAME)
 
 
+@timed_db("store")
 async def store_query_data(query, source, item):
     timestamp = datetime.utcnow().isoformat()
+    # Typed fields come from the scraper pipeline; parse them here for items that skipped it
+    typed = item if all(field in item for field in TYPED_FIELDS) else normalize_item(item)
 
     async with aiosqlite.connect(DB_NAME) as db:
-        await db.execute('''
-            INSERT INTO product_cache (query, source, name, link, price, delivery, rating, image, timestamp, p_index)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        await db.execute(f'''
+            INSERT INTO product_cache (query, source, name, link, price, delivery, rating, image, timestamp, p_index, {", ".join(TYPED_FIELDS)}, signature)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (query, source, p_index) DO UPDATE SET
+                name = excluded.name, link = excluded.link, price = excluded.price, delivery = excluded.delivery,
+                rating = excluded.rating, image = NULL, timestamp = excluded.timestamp,
+                {", ".join(f"{field} = excluded.{field}" for field in TYPED_FIELDS)}, signature = excluded.signature
         ''', (
             query,
             source,
@@ -236,7 +656,9 @@ async def store_query_data(query, source, item):
             item.get("review", "N/A"),
             None,
             timestamp,
-            item.get("index", -1)
+            item.get("index", -1),
+            *(typed[field] for field in TYPED_FIELDS),
+            item.get("signature") or signature(item.get("Name"))
         ))
         await db.commit()
 
@@ -266,58 +688,158 @@ async def cache_images(query):
         await db.commit()
 
 
-async def retrieve_query_data(query):
+def _rows_to_products(query, src, rows):
+    products = []
+    for row in rows:
+        row_id, name, link, price, delivery, rating, img_blob, timestamp, index = row[:9]
+        product = {
+            "id": row_id,
+            "source": src,
+            "name": name,
+            "product_link": link,
+            "price": price,
+            "delivery": delivery,
+            "rating": rating,
+            "image_url": f"/images/{src}/{query}/product_{index}.jpg", # Constructing a path for the API to serve
+            "timestamp": timestamp
+        }
+        # Typed values (price_value, rating_value, ...) when the row carries them
+        product.update(zip(TYPED_FIELDS, row[9:]))
+        products.append(product)
+    return products
+
+
+@timed_db("freshness")
+async def query_freshness(query):
     """
-    Retrieves cached data for a query.
-    Returns a list of dictionaries if found, else None.
+    Per-source freshness of a cached query.
+    Returns (state, sources): sources are the ones still servable (not past the hard TTL);
+    state is "fresh" / "stale" (stale as soon as one servable source is), "expired" when
+    every source has expired, or None when nothing is cached.
     """
+    now = datetime.utcnow()
     async with aiosqlite.connect(DB_NAME) as db:
-        # Check if we have any data for this query
-        async with db.execute("SELECT DISTINCT source FROM product_cache WHERE query = ?", (query,)) as cursor:
-            sources = [row[0] async for row in cursor]
+        # The age of a source is the age of its most recent scrape
+        async with db.execute(
+            "SELECT source, MAX(timestamp) FROM product_cache WHERE query = ? GROUP BY source", (query,)
+        ) as cursor:
+            rows = [row async for row in cursor]
 
-        if not sources:
-            return None
+    if not rows:
+        return None, []
 
-        all_products = []
-        
-        # Check age of the first entry found to determine if we should invalidate
-        # (Assuming all entries for a query are inserted roughly at the same time)
-        async with db.execute("SELECT timestamp FROM product_cache WHERE query = ? LIMIT 1", (query,)) as cursor:
-            row = await cursor.fetchone()
-            if row:
-                timestamp = row[0]
-                age = (datetime.utcnow() - datetime.fromisoformat(timestamp)).total_seconds() / 60
-                # Default TTL check here, though we will also have a background cleaner
-                # Let's say default 48 hours (2880 mins) as per original code
-                if age > 2880:
-                    await db.execute("DELETE FROM product_cache WHERE query = ?", (query,))
-                    await db.commit()
-                    return None
+    state = "fresh"
+    sources = []
+    for src, timestamp in rows:
+        age = (now - datetime.fromisoformat(timestamp)).total_seconds() / 60 if timestamp else 0
+        src_state = freshness(age)
+        if src_state == "expired":
+            continue
+        if src_state == "stale":
+            state = "stale"
+        sources.append(src)
+    return (state if sources else "expired"), sources
 
+@timed_db("retrieve")
+async def retrieve_query_entry(query):
+    """
+    Retrieves cached data for a query together with its freshness (see query_freshness).
+    Sources past the hard TTL are left out.
+    Returns (products, state), (None, "expired") when every source has expired,
+    or (None, None) when nothing is cached.
+    Expired rows are kept (as stale fallback for sources that cannot be scraped)
+    until a re-scrape replaces them or clean_expired_entries removes them.
+    """
+    state, sources = await query_freshness(query)
+    if not sources:
+        return None, state
+
+    all_products = []
+    async with aiosqlite.connect(DB_NAME) as db:
         for src in sources:
-            async with db.execute('''
-                SELECT id, name, link, price, delivery, rating, image, timestamp, p_index
+            async with db.execute(f'''
+                SELECT {PRODUCT_COLUMNS}
                 FROM product_cache
                 WHERE query = ? AND source = ?
             ''', (query, src)) as cursor:
                 rows = [row async for row in cursor]
 
-            for row_id, name, link, price, delivery, rating, img_blob, timestamp, index in rows:
-                product = {
-                    "id": row_id,
-                    "source": src,
-                    "name": name,
-                    "product_link": link,
-                    "price": price,
-                    "delivery": delivery,
-                    "rating": rating,
-                    "image_url": f"/images/{src}/{query}/product_{index}.jpg", # Constructing a path for the API to serve
-                    "timestamp": timestamp
-                }
-                all_products.append(product)
-
-    return all_products
+            all_products.extend(_rows_to_products(query, src, rows))
+
+    return all_products, state
+
+async def retrieve_query_data(query):
+    """
+    Retrieves cached data for a query.
+    Returns a list of dictionaries if found and younger than the hard TTL, else None.
+    """
+    products, state = await retrieve_query_entry(query)
+    if state == "expired":
+        return None
+    return products
+
+@timed_db("retrieve_source")
+async def retrieve_source_rows(query, source):
+    """
+    Returns cached rows of one source for a query regardless of age.
+    Used to serve stale data while a source's circuit breaker is open.
+    """
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute(f'''
+            SELECT {PRODUCT_COLUMNS}
+            FROM product_cache
+            WHERE query = ? AND source = ?
+        ''', (query, source)) as cursor:
+            rows = [row async for row in cursor]
+    return _rows_to_products(query, source, rows)
+
+@timed_db("record_source_status")
+async def record_source_status(query, source, status, items=0, error=None):
+    """Stores the outcome of scraping one source for a query (ok / empty / failed)."""
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute('''
+            INSERT OR REPLACE INTO query_sources (query, source, status, items, scraped_at, error)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (query, source, status, items, datetime.utcnow().isoformat(), error))
+        await db.commit()
+
+@timed_db("source_states")
+async def get_source_states(query):
+    """
+    Returns {source: {"status", "items", "error", "attempt_age", "data_age"}} for a query.
+    attempt_age is minutes since the last scrape attempt, data_age minutes since the
+    cached rows were stored (None without rows).
+    """
+    now = datetime.utcnow()
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute('''
+            SELECT s.source, s.status, s.items, s.error, s.scraped_at, MAX(p.timestamp)
+            FROM query_sources s LEFT JOIN product_cache p ON p.query = s.query AND p.source = s.source
+            WHERE s.query = ?
+            GROUP BY s.source
+        ''', (query,)) as cursor:
+            rows = [row async for row in cursor]
+
+    def minutes_since(ts):
+        return (now - datetime.fromisoformat(ts)).total_seconds() / 60 if ts else None
+
+    return {
+        source: {
+            "status": status,
+            "items": items,
+            "error": error,
+            "attempt_age": minutes_since(scraped_at),
+            "data_age": minutes_since(data_ts),
+        }
+        for source, status, items, error, scraped_at, data_ts in rows
+    }
+
+@timed_db("delete_source")
+async def delete_source_rows(query, source):
+    """Removes the rows of one source for a query, before a re-scrape stores fresh ones."""
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute("DELETE FROM product_cache WHERE query = ? AND source = ?", (query, source))
+        await db.commit()
 
 async def clean_expired_entries(ttl_minutes: int):
     """
@@ -388,11 +910,17 @@ async def delete_product(product_id: int):
 async def clear_cache():
     async with aiosqlite.connect(DB_NAME) as db:
         await db.execute("DELETE FROM product_cache")
+        await db.execute("DELETE FROM query_stats")
+        await db.execute("DELETE FROM query_sources")
+        await db.execute("DELETE FROM scrape_job_sources")
+        await db.execute("DELETE FROM scrape_jobs")
         await db.commit()
 
 async def delete_history(query) :
     async with aiosqlite.connect(DB_NAME) as db:
         cursor = await db.execute("DELETE FROM product_cache WHERE query = ?", (query,))
+        await db.execute("DELETE FROM query_stats WHERE query = ?", (query,))
+        await db.execute("DELETE FROM query_sources WHERE query = ?", (query,))
         await db.commit()
 
 async def get_all_product_names():
@@ -403,4 +931,295 @@ async def get_all_product_names():
     async with aiosqlite.connect(DB_NAME) as db:
         async with db.execute("SELECT name FROM product_cache") as cursor:
             rows = [row[0] async for row in cursor]
-    return rows
\ No newline at end of file
+    return rows
+
+async def get_all_queries():
+    """
+    Retrieves all distinct cached queries.
+    Used for rebuilding the query-level NLP index.
+    """
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute("SELECT DISTINCT query FROM product_cache") as cursor:
+            rows = [row[0] async for row in cursor]
+    return rows
+
+# Half-life of a query's popularity score
+QUERY_SCORE_HALF_LIFE_HOURS = float(os.environ.get("QUERY_SCORE_HALF_LIFE_HOURS", "24"))
+
+def _decay(score, last_seen, now):
+    hours = (now - datetime.fromisoformat(last_seen)).total_seconds() / 3600
+    return score * 0.5 ** (max(hours, 0.0) / QUERY_SCORE_HALF_LIFE_HOURS)
+
+@timed_db("record_hit")
+async def record_query_hit(query):
+    """Counts one search for `query` (exponentially decayed, so trending queries rank high)."""
+    now = datetime.utcnow()
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute("SELECT score, last_seen FROM query_stats WHERE query = ?", (query,)) as cursor:
+            row = await cursor.fetchone()
+        score = 1.0 + (_decay(row[0], row[1], now) if row else 0.0)
+        await db.execute('''
+            INSERT INTO query_stats (query, score, hits, last_seen) VALUES (?, ?, 1, ?)
+            ON CONFLICT(query) DO UPDATE SET score = excluded.score, hits = hits + 1, last_seen = excluded.last_seen
+        ''', (query, score, now.isoformat()))
+        await db.commit()
+
+@timed_db("top_queries")
+async def get_top_queries(limit=20):
+    """
+    Returns the most requested queries as (query, score, age_minutes), highest score first.
+    age_minutes is the age of the query's oldest cached source, None if nothing is cached.
+    """
+    now = datetime.utcnow()
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute('''
+            SELECT s.query, s.score, s.last_seen, MIN(p.scraped_at)
+            FROM query_stats s LEFT JOIN (
+                SELECT query, source, MAX(timestamp) AS scraped_at FROM product_cache GROUP BY query, source
+            ) p ON p.query = s.query
+            GROUP BY s.query
+        ''') as cursor:
+            rows = [row async for row in cursor]
+
+    ranked = []
+    for query, score, last_seen, scraped_at in rows:
+        age = (now - datetime.fromisoformat(scraped_at)).total_seconds() / 60 if scraped_at else None
+        ranked.append((query, _decay(score, last_seen, now), age))
+    ranked.sort(key=lambda r: r[1], reverse=True)
+    return ranked[:limit]
+
+# Sort orders of query_products: (SQL key expression, direction).
+# Products without a price sort last in both price orders; "random" is a seeded shuffle
+# so that pages of one listing stay consistent.
+SORT_ORDERS = {
+    "relevance": ("id", "ASC"),
+    "price-low": ("COALESCE(price_value, 1e18)", "ASC"),
+    "price-high": ("COALESCE(price_value, -1)", "DESC"),
+    "rating-high": ("COALESCE(rating_value, -1)", "DESC"),
+    "discount-high": ("COALESCE(discount_pct, -1)", "DESC"),
+    "random": ("((id + :seed) * 2654435761) % 4294967291", "ASC"),
+}
+
+def _listing(sort, seed, sources, min_price, max_price, min_rating):
+    """The sort order and filters a cursor belongs to."""
+    return [sort, seed, sorted(sources) if sources else None, min_price, max_price, min_rating]
+
+def encode_cursor(sort_key, row_id, listing):
+    return base64.urlsafe_b64encode(json.dumps([sort_key, row_id, listing]).encode()).decode()
+
+def decode_cursor(cursor, listing):
+    """(sort key, id) of a cursor; ValueError if it is malformed or from a listing with other sort / filters."""
+    try:
+        sort_key, row_id, cursor_listing = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        row_id = int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    # Keyset positions are only meaningful in the order they were taken from
+    if cursor_listing != listing:
+        raise ValueError("Cursor does not match the sort and filters of the request")
+    return sort_key, row_id
+
+@timed_db("query_products")
+async def query_products(query, sources=None, min_price=None, max_price=None, min_rating=None,
+                         sort="relevance", limit=24, cursor=None, seed=0):
+    """
+    One page of cached products for a query, filtered and sorted in SQL.
+    sources restricts to these source names (expired sources are always left out),
+    min_price / max_price bound the numeric price (a missing price counts as 0, like the frontend did),
+    min_rating drops products rated lower (or not rated),
+    cursor is the next_cursor of the previous page (with the same sort, seed and filters).
+    Returns {"items", "next_cursor", "total"}; next_cursor is None on the last page.
+    """
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"Unknown sort '{sort}', expected one of {', '.join(SORT_ORDERS)}")
+    key, direction = SORT_ORDERS[sort]
+    listing = _listing(sort, seed, sources, min_price, max_price, min_rating)
+    if cursor:
+        cursor_key, cursor_id = decode_cursor(cursor, listing)
+
+    _, live_sources = await query_freshness(query)
+    if sources:
+        live_sources = [s for s in live_sources if s in sources]
+    if not live_sources:
+        return {"items": [], "next_cursor": None, "total": 0}
+
+    params = {"query": query, "seed": seed, "limit": limit + 1}
+    params.update({f"s{i}": src for i, src in enumerate(live_sources)})
+    where = [
+        "query = :query",
+        f"source IN ({', '.join(f':s{i}' for i in range(len(live_sources)))})",
+    ]
+    if min_price is not None:
+        where.append("COALESCE(price_value, 0) >= :min_price")
+        params["min_price"] = min_price
+    if max_price is not None:
+        where.append("COALESCE(price_value, 0) <= :max_price")
+        params["max_price"] = max_price
+    if min_rating is not None:
+        where.append("rating_value >= :min_rating")
+        params["min_rating"] = min_rating
+
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute(f"SELECT COUNT(*) FROM product_cache WHERE {' AND '.join(where)}", params) as c:
+            total = (await c.fetchone())[0]
+
+        # Keyset pagination: continue strictly after the last (sort key, id) of the previous page
+        if cursor:
+            params["cursor_key"], params["cursor_id"] = cursor_key, cursor_id
+            op = ">" if direction == "ASC" else "<"
+            where.append(f"({key} {op} :cursor_key OR ({key} = :cursor_key AND id {op} :cursor_id))")
+
+        async with db.execute(f'''
+            SELECT {PRODUCT_COLUMNS.replace("image", "NULL")}, source, {key}
+            FROM product_cache
+            WHERE {' AND '.join(where)}
+            ORDER BY {key} {direction}, id {direction}
+            LIMIT :limit
+        ''', params) as c:
+            rows = [row async for row in c]
+
+    page = rows[:limit]
+    items = [_rows_to_products(query, row[-2], [row[:-2]])[0] for row in page]
+    next_cursor = encode_cursor(page[-1][-1], page[-1][0], listing) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor, "total": total}
+
+async def get_grouped_products(query, sources=None, min_price=None, max_price=None, model=None):
+    """
+    Cached products of a query grouped across sources (see cache_manager.dedup.group_products),
+    using the signatures stored at scrape time. Entities keep the order of their first listing.
+    The SELECT is timed in db_query_seconds, the grouping in nlp_seconds.
+    """
+    _, live_sources = await query_freshness(query)
+    if sources:
+        live_sources = [s for s in live_sources if s in sources]
+    if not live_sources:
+        return []
+
+    placeholders = ", ".join("?" * len(live_sources))
+    where = f"query = ? AND source IN ({placeholders})"
+    params = [query, *live_sources]
+    if min_price is not None:
+        where += " AND COALESCE(price_value, 0) >= ?"
+        params.append(min_price)
+    if max_price is not None:
+        where += " AND COALESCE(price_value, 0) <= ?"
+        params.append(max_price)
+
+    with DB_SECONDS.time(op="grouped_products"):
+        async with aiosqlite.connect(DB_NAME) as db:
+            async with db.execute(
+                f"SELECT {PRODUCT_COLUMNS.replace('image', 'NULL')}, source, signature FROM product_cache WHERE {where} ORDER BY id",
+                params,
+            ) as cursor:
+                rows = [row async for row in cursor]
+
+    products = []
+    for row in rows:
+        product = _rows_to_products(query, row[-2], [row[:-2]])[0]
+        product["signature"] = row[-1]
+        products.append(product)
+
+    # Grouping is CPU work (~10 ms for a few hundred listings); keep it off the event loop
+    loop = asyncio.get_running_loop()
+    with NLP_SECONDS.time(op="group_products"):
+        entities = await loop.run_in_executor(None, lambda: group_products(products, model=model))
+    for entity in entities:
+        for offer in entity["offers"]:
+            offer.pop("signature", None)
+    return entities
+
+
+@timed_db("prune_source")
+async def prune_source_rows(query, source, before):
+    """
+    Removes a source's rows for a query stored before `before` (ISO timestamp), i.e. the
+    listings a completed re-scrape no longer returned. Rows it did return were upserted.
+    """
+    async with aiosqlite.connect(DB_NAME) as db:
+        cursor = await db.execute(
+            "DELETE FROM product_cache WHERE query = ? AND source = ? AND timestamp < ?", (query, source, before)
+        )
+        await db.commit()
+        return cursor.rowcount
+
+
+# Scrape jobs
+# A cache miss is scraped as a job: a scrape_jobs row (queued -> running -> done / failed)
+# plus one scrape_job_sources row per marketplace (running -> ok / empty / failed, or
+# cached / skipped when the source was not scraped). Jobs still queued or running when
+# the process stopped are resumed on the next start.
+
+async def create_job(query, job_id=None):
+    """Stores a queued job for `query` and returns its id (a new one unless `job_id` is given)."""
+    job_id = job_id or uuid.uuid4().hex
+    now = datetime.utcnow().isoformat()
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute('''
+            INSERT OR IGNORE INTO scrape_jobs (id, query, state, created_at, updated_at, items)
+            VALUES (?, ?, 'queued', ?, ?, 0)
+        ''', (job_id, query, now, now))
+        await db.commit()
+    return job_id
+
+
+async def update_job(job_id, state, items=None, error=None):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute('''
+            UPDATE scrape_jobs SET state = ?, items = COALESCE(?, items), error = ?, updated_at = ? WHERE id = ?
+        ''', (state, items, error, datetime.utcnow().isoformat(), job_id))
+        await db.commit()
+
+
+async def update_job_source(job_id, source, state, items=0, error=None):
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute('''
+            INSERT OR REPLACE INTO scrape_job_sources (job_id, source, state, items, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (job_id, source, state, items, error, datetime.utcnow().isoformat()))
+        await db.commit()
+
+
+async def get_job(job_id):
+    """{"id", "query", "state", "created_at", "updated_at", "items", "error", "sources"} of a job, or None."""
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute(
+            "SELECT id, query, state, created_at, updated_at, items, error FROM scrape_jobs WHERE id = ?", (job_id,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        async with db.execute(
+            "SELECT source, state, items, error, updated_at FROM scrape_job_sources WHERE job_id = ?", (job_id,)
+        ) as cursor:
+            sources = [r async for r in cursor]
+    job = dict(zip(("id", "query", "state", "created_at", "updated_at", "items", "error"), row))
+    job["sources"] = {
+        source: {"state": state, "items": items, "error": error, "updated_at": updated_at}
+        for source, state, items, error, updated_at in sources
+    }
+    return job
+
+
+async def get_unfinished_jobs():
+    """(id, query) of the jobs left queued or running, oldest first."""
+    async with aiosqlite.connect(DB_NAME) as db:
+        async with db.execute(
+            "SELECT id, query FROM scrape_jobs WHERE state IN ('queued', 'running') ORDER BY created_at"
+        ) as cursor:
+            return [row async for row in cursor]
+
+
+async def prune_jobs(max_age_hours):
+    """Deletes finished jobs last updated more than max_age_hours ago; returns how many."""
+    cutoff = (datetime.utcnow() - timedelta(hours=max_age_hours)).isoformat()
+    async with aiosqlite.connect(DB_NAME) as db:
+        await db.execute('''
+            DELETE FROM scrape_job_sources WHERE job_id IN (
+                SELECT id FROM scrape_jobs WHERE state IN ('done', 'failed') AND updated_at < ?
+            )
+        ''', (cutoff,))
+        cursor = await db.execute(
+            "DELETE FROM scrape_jobs WHERE state IN ('done', 'failed') AND updated_at < ?", (cutoff,)
+        )
+        await db.commit()
+        return cursor.rowcount
@@ -0,0 +1,169 @@
+import re
+import threading
+import numpy as np
+from rapidfuzz import fuzz, process
+from cache_manager.query_processor import TextNormalizer
+
+# Cross-source dedup
+# Listings of the same product from different marketplaces are grouped into one entity:
+# 1. signature   : normalized (lowercased, stemmed) name, computed once at store time
+# 2. blocking    : only pairs from different sources that share the first token (usually the brand)
+#                  or have identical model numbers / sizes are compared
+# 3. scoring     : RapidFuzz ratio over the token-sorted signatures (= token_sort_ratio, but one
+#                  vectorized cdist pass); borderline pairs are re-checked with MiniLM embeddings
+#                  when a model is given
+# 4. grouping    : greedy union of the best pairs first, at most one offer per source in a group
+MATCH_THRESHOLD = 85        # fuzzy score (0-100) accepted on its own
+BORDERLINE_THRESHOLD = 70   # fuzzy score from which an embedding check can still accept the pair
+EMBEDDING_THRESHOLD = 0.85  # cosine similarity needed for borderline pairs
+MAX_PRICE_RATIO = 3.0       # the same product is not listed at 3x the price elsewhere
+
+# Myntra names are scraped as "title : Brand Name"
+_TITLE_PREFIX = re.compile(r"^\s*title\s*:\s*", re.I)
+_MISSING_NAMES = {"", "N/A", "Unknown Product"}
+
+_normalizer = None
+_normalizer_lock = threading.Lock()
+
+
+def _get_normalizer():
+    global _normalizer
+    with _normalizer_lock:
+        if _normalizer is None:
+            _normalizer = TextNormalizer()
+        return _normalizer
+
+
+def signature(name):
+    """Precomputed matching key of a product name ("" when the name is unknown)."""
+    if not name or name.strip() in _MISSING_NAMES:
+        return ""
+    return _get_normalizer().normalize(_TITLE_PREFIX.sub("", name))
+
+
+def signature_batch(names):
+    clean = ["" if not n or n.strip() in _MISSING_NAMES else _TITLE_PREFIX.sub("", n) for n in names]
+    return _get_normalizer().normalize_batch(clean)
+
+
+def _numbers(sig):
+    return frozenset(w for w in sig.split() if any(c.isdigit() for c in w))
+
+
+def _blocked_together(words_a, words_b, nums_a, nums_b):
+    if nums_a != nums_b:
+        # Model numbers / sizes must agree ("iphone 14" is not "iphone 15")
+        return False
+    return bool(nums_a) or (words_a[:1] == words_b[:1])
+
+
+def find_duplicate_pairs(products, model=None):
+    """
+    Scored (score, i, j) pairs of listings that look like the same product, best first.
+    `products` need "source", "price_value" and "signature" (computed from "name" when missing).
+    `model` is an optional SentenceTransformer used for borderline pairs.
+    """
+    sigs = [p.get("signature") or signature(p.get("name") or p.get("Name")) for p in products]
+    valid = [i for i, s in enumerate(sigs) if s]
+    if len(valid) < 2:
+        return []
+
+    words = [sigs[i].split() for i in valid]
+    nums = [_numbers(sigs[i]) for i in valid]
+    # Sorting tokens once turns the plain ratio into token_sort_ratio at a fraction of the cost.
+    # One vectorized pass over all pairs; blocking then keeps the few that matter.
+    texts = [" ".join(sorted(w)) for w in words]
+    scores = process.cdist(texts, texts, scorer=fuzz.ratio, dtype=np.uint8)
+
+    # Cheap vectorized filters first: different source, plausible price
+    source_ids = {}
+    src = np.array([source_ids.setdefault(products[i].get("source"), len(source_ids)) for i in valid])
+    price = np.array([products[i].get("price_value") or np.nan for i in valid], dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.maximum(price[:, None], price[None, :]) / np.minimum(price[:, None], price[None, :])
+    mask = (scores >= BORDERLINE_THRESHOLD) & (src[:, None] != src[None, :]) & ~(ratio > MAX_PRICE_RATIO)
+    rows, cols = np.nonzero(np.triu(mask, k=1))
+
+    pairs, borderline = [], []
+    for a, b in zip(rows.tolist(), cols.tolist()):
+        if not _blocked_together(words[a], words[b], nums[a], nums[b]):
+            continue
+        i, j = valid[a], valid[b]
+        score = float(scores[a, b])
+        if score >= MATCH_THRESHOLD:
+            pairs.append((score, i, j))
+        else:
+            borderline.append((score, i, j))
+
+    if borderline and model is not None:
+        needed = sorted({i for _, i, _ in borderline} | {j for _, _, j in borderline})
+        position = {i: n for n, i in enumerate(needed)}
+        vectors = np.asarray(model.encode([sigs[i] for i in needed], normalize_embeddings=True))
+        for score, i, j in borderline:
+            if float(vectors[position[i]] @ vectors[position[j]]) >= EMBEDDING_THRESHOLD:
+                pairs.append((score, i, j))
+
+    pairs.sort(reverse=True)
+    return pairs
+
+
+def group_products(products, model=None):
+    """
+    Groups listings of the same product across sources.
+    Returns a list of entities:
+      {"name", "best_price", "best_source", "sources", "offers": [product, ...] (cheapest first)}
+    Every product is in exactly one entity; unmatched ones form single-offer entities.
+    Entities keep the order of their first listing.
+    """
+    parent = list(range(len(products)))
+    members = {i: [i] for i in range(len(products))}
+    group_sources = {i: {products[i].get("source")} for i in range(len(products))}
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for _, i, j in find_duplicate_pairs(products, model=model):
+        ri, rj = find(i), find(j)
+        if ri == rj or group_sources[ri] & group_sources[rj]:
+            continue
+        if rj < ri:
+            ri, rj = rj, ri
+        parent[rj] = ri
+        members[ri].extend(members.pop(rj))
+        group_sources[ri] |= group_sources.pop(rj)
+
+    entities = []
+    for root in sorted(members):
+        offers = sorted((products[i] for i in members[root]),
+                        key=lambda p: (p.get("price_value") is None, p.get("price_value") or 0))
+        best = offers[0]
+        entities.append({
+            "name": _TITLE_PREFIX.sub("", products[root].get("name") or products[root].get("Name") or ""),
+            "best_price": best.get("price_value"),
+            "best_source": best.get("source") if best.get("price_value") is not None else None,
+            "sources": sorted(group_sources[root]),
+            "offers": offers,
+        })
+    return entities
+
+
+if __name__ == "__main__":
+    import time
+    listings = [
+        {"source": "Amazon", "name": "Apple iPhone 15 (128 GB) - Black", "price_value": 69900},
+        {"source": "Flipkart", "name": "Apple iPhone 15 (Black, 128 GB)", "price_value": 65999},
+        {"source": "Myntra", "name": "title : Puma Men Running Shoes", "price_value": 2499},
+        {"source": "Amazon", "name": "Apple iPhone 14 (128 GB) - Black", "price_value": 58999},
+        {"source": "Meesho", "name": "Puma Men's Running Shoe", "price_value": 2299},
+    ]
+    for entity in group_products(listings):
+        print(entity["best_price"], entity["best_source"], entity["sources"], entity["name"])
+
+    many = [dict(listings[i % len(listings)], name=f"{listings[i % len(listings)]['name']} v{i // 10}",
+                 source=["Amazon", "Flipkart", "Myntra", "Meesho"][i % 4]) for i in range(300)]
+    t0 = time.perf_counter()
+    group_products(many)
+    print(f"300 listings grouped in {(time.perf_counter() - t0) * 1000:.1f} ms")
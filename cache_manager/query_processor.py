@@ -1,227 +1,484 @@
 import os
+import re
 import json
 import pickle
+import threading
+import functools
+from array import array
 import numpy as np
-import faiss
-import nltk
-import uuid
-from nltk.stem import PorterStemmer
-from sentence_transformers import SentenceTransformer
-from rapidfuzz import fuzz
-
-# Download NLTK data (only runs once)
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+import logging
+from rapidfuzz import fuzz, process
+from utils import profiling
+
+# Heavy dependencies (faiss, nltk, sentence_transformers) are imported lazily,
+# so importing this module stays cheap for cached-only traffic.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DATA_DIR = os.environ.get("SEARCH_ENGINE_DATA", "search_engine_data")
+
+# Candidates fetched per query, and HNSW search breadth (raised to at least k)
+DEFAULT_TOP_K = int(os.environ.get("NLP_TOP_K", "10"))
+DEFAULT_EF_SEARCH = int(os.environ.get("NLP_EF_SEARCH", "64"))
+
+# Vector index layout:
+#   'hnsw' : IndexHNSWFlat, full float32 vectors (1536 bytes/product)
+#   'sq8'  : IndexHNSWSQ, 8-bit scalar quantization (384 bytes/product)
+#   'pq'   : IndexHNSWPQ, product quantization (PQ_M bytes/product)
+# 'sq8' and 'pq' also keep product strings in packed StringArrays instead of Python lists.
+DEFAULT_INDEX_MODE = os.environ.get("NLP_INDEX_MODE", "hnsw")
+INDEX_MODES = ("hnsw", "sq8", "pq")
+HNSW_M = 32
+PQ_M = 48  # sub-quantizers; must divide the embedding dimension (384)
+# Quantizers need training data. Until this many vectors exist, compact modes keep
+# them in an exact flat index (small anyway) and train once the threshold is crossed.
+TRAIN_SIZE = {"sq8": 1000, "pq": 10000}
+MAX_TRAIN_SAMPLES = 100000
+
+
+def _ensure_nltk_data():
+    """Download NLTK data (only runs once)"""
+    import nltk
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt')
+
+
+# Anything that is not a letter/digit becomes a separator (same as the old isalnum() check).
+# ASCII text goes through a translation table; other text through the equivalent regex.
+# The batch variants keep the \x00 document separator intact.
+_ASCII_SEPARATORS = str.maketrans({c: " " for c in map(chr, range(128)) if not c.isalnum()})
+_ASCII_SEPARATORS_BATCH = str.maketrans({c: " " for c in map(chr, range(1, 128)) if not c.isalnum()})
+_NON_ALNUM = re.compile(r"[\W_]+")
+_NON_ALNUM_BATCH = re.compile(r"[^\w\x00]+|_+")
+STEM_CACHE_SIZE = int(os.environ.get("STEM_CACHE_SIZE", "50000"))
+
+# Gender Terms for the negative filter
+MEN_TERMS = frozenset({'men', "man", "male", "boy", "gentleman", "mens"})
+WOMEN_TERMS = frozenset({'women', "woman", "female", "girl", "lady", "womens"})
+
+
+def tokenize(text):
+    """Lowercased alphanumeric tokens of `text`."""
+    text = str(text).lower()
+    if text.isascii():
+        return text.translate(_ASCII_SEPARATORS).split()
+    return _NON_ALNUM.sub(" ", text).split()
+
+
+def tokenize_batch(texts):
+    """tokenize() for many texts with one regex pass over the joined corpus."""
+    if not texts:
+        # "".split("\x00") would still give one (empty) document
+        return []
+    blob = "\x00".join(str(t).replace("\x00", " ") for t in texts).lower()
+    if blob.isascii():
+        blob = blob.translate(_ASCII_SEPARATORS_BATCH)
+    else:
+        blob = _NON_ALNUM_BATCH.sub(" ", blob)
+    return [doc.split() for doc in blob.split("\x00")]
+
+
+class TextNormalizer:
+    """
+    Lowercase + punctuation removal + Porter stemming, with a bounded stem cache.
+    Product names repeat the same vocabulary, so most stems are cache hits.
+    """
+    def __init__(self, cache_size=STEM_CACHE_SIZE):
+        from nltk.stem import PorterStemmer
+        self.stemmer = PorterStemmer()
+        self._stem_cached = functools.lru_cache(maxsize=cache_size)(self.stemmer.stem)
+
+    def stem(self, word):
+        # Numbers (sizes, model numbers) are unchanged by stemming; keep them out of the cache
+        return word if word.isdigit() else self._stem_cached(word)
+
+    def normalize(self, text):
+        return " ".join(map(self.stem, tokenize(text)))
+
+    def normalize_batch(self, texts):
+        stem = self.stem
+        return [" ".join(map(stem, words)) for words in tokenize_batch(texts)]
+
+
+def _gender_flags(words):
+    return bool(words & MEN_TERMS), bool(words & WOMEN_TERMS)
+
+
+def _rejects(query_flags, result_flags):
+    has_men_q, has_women_q = query_flags
+    has_men_r, has_women_r = result_flags
+
+    # Rule 1: Query is for MEN, Result is for WOMEN (and not Men)
+    if has_men_q and not has_women_q:
+        if has_women_r and not has_men_r:
+            return True # REJECT
+
+    # Rule 2: Query is for WOMEN, Result is for MEN (and not Women)
+    if has_women_q and not has_men_q:
+        if has_men_r and not has_women_r:
+            return True # REJECT
+
+    return False # ACCEPT
+
+
+def negative_filter(query_text, result_text):
+    """
+    Hard Filter: Returns True if the result should be REJECTED.
+    Logic: If 'men' in query and 'women' in result (and vice versa).
+    """
+    return _rejects(_gender_flags(set(tokenize(query_text))), _gender_flags(set(tokenize(result_text))))
+
+
+def negative_filter_batch(query_text, result_texts):
+    """negative_filter() of one query against many results. Returns a list of bools."""
+    query_flags = _gender_flags(set(tokenize(query_text)))
+    # Gender-neutral (or mixed) queries never reject anything
+    if query_flags[0] == query_flags[1]:
+        return [False] * len(result_texts)
+    return [_rejects(query_flags, _gender_flags(set(words))) for words in tokenize_batch(result_texts)]
+
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def load_model(model_name):
+    """Loads a SentenceTransformer once per process; engines share the instance."""
+    with _models_lock:
+        if model_name not in _models:
+            from sentence_transformers import SentenceTransformer
+            print("Loading AI Model...")
+            _models[model_name] = SentenceTransformer(model_name)
+        return _models[model_name]
+
+
+def build_index(vectors, mode="hnsw", dimension=384):
+    """
+    Builds a FAISS index of the given mode holding `vectors` (float32, L2-normalized).
+    Compact modes fall back to an exact IndexFlatL2 while there is too little data to train.
+    """
+    import faiss
+
+    if mode not in INDEX_MODES:
+        raise ValueError(f"Unknown index mode '{mode}'. Expected one of {INDEX_MODES}")
+
+    vectors = np.ascontiguousarray(vectors, dtype='float32').reshape(-1, dimension)
+
+    if mode == "hnsw":
+        # HNSW is fast and accurate
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M)
+    elif len(vectors) < TRAIN_SIZE[mode]:
+        index = faiss.IndexFlatL2(dimension)
+    else:
+        if mode == "sq8":
+            index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_8bit, HNSW_M)
+        else:
+            index = faiss.IndexHNSWPQ(dimension, PQ_M, HNSW_M)
+
+        sample = vectors
+        if len(sample) > MAX_TRAIN_SAMPLES:
+            rng = np.random.default_rng(0)
+            sample = sample[rng.choice(len(sample), MAX_TRAIN_SAMPLES, replace=False)]
+        index.train(sample)
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = 40
+
+    if len(vectors):
+        index.add(vectors)
+    return index
+
+
+def is_staging_index(index, mode):
+    """True if a compact-mode index is still the untrained flat fallback."""
+    import faiss
+    return mode != "hnsw" and isinstance(index, faiss.IndexFlat)
+
+
+class StringArray:
+    """
+    Append-only list of strings packed into one UTF-8 buffer plus an offsets array.
+    Uses a fraction of the memory of a Python list of str for large corpora.
+    """
+    def __init__(self, items=()):
+        self._buffer = bytearray()
+        self._offsets = array('q', [0])
+        self.extend(items)
+
+    def append(self, text):
+        self._buffer += str(text).encode('utf-8')
+        self._offsets.append(len(self._buffer))
+
+    def extend(self, items):
+        for text in items:
+            self.append(text)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("StringArray index out of range")
+        return self._buffer[self._offsets[i]:self._offsets[i + 1]].decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self):
+        return len(self._buffer) + self._offsets.itemsize * len(self._offsets)
+
 
 class IntelligentSearchEngine:
-    def __init__(self, model_name='all-MiniLM-L6-v2', folder_path='search_engine_data'):
+    def __init__(self, model_name='all-MiniLM-L6-v2', folder_path=DEFAULT_DATA_DIR, index_mode=DEFAULT_INDEX_MODE,
+                 top_k=DEFAULT_TOP_K, ef_search=DEFAULT_EF_SEARCH):
+        _ensure_nltk_data()
+
+        self.top_k = top_k
+        self.ef_search = ef_search
+
         self.folder_path = folder_path
         self.index_file = os.path.join(folder_path, "faiss_index.bin")
-        self.metadata_file = os.path.join(folder_path, "metadata_v2.pkl") # Changed to v2 for new schema
+        self.metadata_file = os.path.join(folder_path, "metadata_v3.pkl") # v3: integer ids instead of UUIDs
+        self.legacy_metadata_file = os.path.join(folder_path, "metadata_v2.pkl")
         
         # 1. Load AI Model
-        print("Loading AI Model...")
-        self.model = SentenceTransformer(model_name)
+        self.model = load_model(model_name)
         self.dimension = 384 # Dimension for MiniLM-L6-v2
-        self.stemmer = PorterStemmer()
+        self.normalizer = TextNormalizer()
 
         # 2. Initialize FAISS and Metadata
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
 
+        if index_mode not in INDEX_MODES:
+            raise ValueError(f"Unknown index mode '{index_mode}'. Expected one of {INDEX_MODES}")
+        self.index_mode = index_mode
         self.index = None
         
-        # New Data Structures for UUID Management
-        # UUID -> Product Data (Original Text, etc.)
-        self.products_map = {} 
-        # UUID -> Normalized Text (for fuzzy check)
-        self.normalized_map = {} 
-        # List to map FAISS Integer Index -> UUID
-        self.index_to_uuid = [] 
+        # Metadata is addressed by the FAISS integer id (position in insertion order)
+        # id -> Original product text
+        self.products = self._new_string_store()
+        # id -> Normalized text (for fuzzy check)
+        self.normalized = self._new_string_store()
         
         self.load_data()
 
+    def _new_string_store(self, items=()):
+        if self.index_mode == "hnsw":
+            return list(items)
+        return StringArray(items)
+
     def normalize(self, text):
         """
         Crucial Step: Lowercase + Stemming
         'Womens Kurties' -> 'women kurti'
         """
-        text = str(text).lower().strip()
-        # Remove punctuation for better matching
-        text = "".join([c if c.isalnum() or c.isspace() else " " for c in text])
-        words = text.split()
-        stemmed = [self.stemmer.stem(word) for word in words]
-        return " ".join(stemmed)
-
-    def add_products(self, new_products):
+        return self.normalizer.normalize(text)
+
+    def normalize_batch(self, texts):
+        """normalize() for a list of texts in one pass."""
+        return self.normalizer.normalize_batch(texts)
+
+    def add_products(self, new_products, skip_existing=False):
         """
         Adds a list of product strings to the engine.
-        Assigns a unique UUID to each product.
+        Each product gets the next integer id, shared by FAISS and the metadata arrays.
+        With skip_existing=True, strings already in the index are not added again.
         """
+        if skip_existing:
+            known = set(self.products)
+            new_products = [p for p in dict.fromkeys(new_products) if p not in known]
+
         if not new_products:
             return
 
         print(f"Processing {len(new_products)} new products...")
         
-        # 1. Normalize Text & Generate UUIDs
-        new_entries = []
-        norm_texts = []
-        
-        for p in new_products:
-            norm = self.normalize(p)
-            uid = str(uuid.uuid4())
-            new_entries.append((uid, p, norm))
-            norm_texts.append(norm)
+        # 1. Normalize Text
+        norm_texts = self.normalize_batch(new_products)
+
+        import faiss
 
         # 2. Create Embeddings
-        embeddings = self.model.encode(norm_texts)
+        embeddings = np.array(self.model.encode(norm_texts)).astype('float32')
         faiss.normalize_L2(embeddings) # Essential for Cosine Similarity in FAISS
 
         # 3. Add to FAISS
-        if self.index is None:
-            # HNSW is fast and accurate
-            self.index = faiss.IndexHNSWFlat(self.dimension, 32) 
-            self.index.hnsw.efConstruction = 40
-        
-        self.index.add(np.array(embeddings).astype('float32'))
+        self._add_vectors(embeddings)
 
-        # 4. Update Metadata Maps
-        for uid, original, norm in new_entries:
-            self.products_map[uid] = original
-            self.normalized_map[uid] = norm
-            self.index_to_uuid.append(uid)
+        # 4. Update Metadata Arrays
+        self.products.extend(str(p) for p in new_products)
+        self.normalized.extend(norm_texts)
         
         # 5. Auto-Save
         self.save_data()
-        print(f"Index updated. Total products: {len(self.products_map)}")
+        print(f"Index updated. Total products: {len(self.products)}")
+
+    def _add_vectors(self, vectors):
+        if self.index is None:
+            self.index = build_index(vectors, self.index_mode, self.dimension)
+            return
+
+        if is_staging_index(self.index, self.index_mode) and \
+                self.index.ntotal + len(vectors) >= TRAIN_SIZE[self.index_mode]:
+            # Enough data to train the quantizer: move everything into the compact index
+            existing = self.index.reconstruct_n(0, self.index.ntotal)
+            print(f"Training '{self.index_mode}' index on {len(existing) + len(vectors)} vectors...")
+            self.index = build_index(np.vstack([existing, vectors]), self.index_mode, self.dimension)
+            return
+
+        self.index.add(vectors)
 
     def check_negative_filter(self, query_text, result_text):
         """
         Hard Filter: Returns True if the result should be REJECTED.
         Logic: If 'men' in query and 'women' in result (and vice versa).
         """
-        q = query_text.lower()
-        r = result_text.lower()
-        
-        # Clean punctuation
-        q = "".join([c if c.isalnum() or c.isspace() else " " for c in q])
-        r = "".join([c if c.isalnum() or c.isspace() else " " for c in r])
-
-        q_words = set(q.split())
-        r_words = set(r.split())
+        return negative_filter(query_text, result_text)
 
-        # Define Gender Terms
-        men_terms = {'men', "man", "male", "boy", "gentleman", "mens"}
-        women_terms = {'women', "woman", "female", "girl", "lady", "womens"}
+    def check_negative_filter_batch(self, query_text, result_texts):
+        """check_negative_filter() against many results at once."""
+        return negative_filter_batch(query_text, result_texts)
 
-        has_men_q = bool(q_words & men_terms)
-        has_women_q = bool(q_words & women_terms)
-        
-        has_men_r = bool(r_words & men_terms)
-        has_women_r = bool(r_words & women_terms)
-
-        # Rule 1: Query is for MEN, Result is for WOMEN (and not Men)
-        if has_men_q and not has_women_q:
-            if has_women_r and not has_men_r:
-                return True # REJECT
-
-        # Rule 2: Query is for WOMEN, Result is for MEN (and not Women)
-        if has_women_q and not has_men_q:
-            if has_men_r and not has_women_r:
-                return True # REJECT
-                
-        return False # ACCEPT
-
-    def search(self, user_query, threshold=0.65):
+    @profiling.profile_calls("nlp")
+    def search(self, user_query, threshold=0.65, fuzzy_threshold=0.85, k=None, ef_search=None, ranked=False):
         """
         Smart Search:
-        1. Try Vector Search (FAISS)
+        1. Try Vector Search (FAISS) for the top `k` candidates
         2. Apply Negative Filtering
-        3. Double check with Fuzzy Match (RapidFuzz)
+        3. Double check with Fuzzy Match (RapidFuzz), scored over all candidates at once
+
+        `user_query` may be a string or a list of strings.
+        Returns (match, found) per query, or with ranked=True the list of accepted
+        candidates per query: [{"product", "score", "fuzzy_score"}, ...] in vector order.
         """
-        # 1. Normalize Query
-        norm_query = self.normalize(user_query)
-        
-        # 2. Vector Search
-        query_vec = self.model.encode([norm_query])
-        faiss.normalize_L2(query_vec)
-        
-        # Search Top K candidates (Fetch more to allow for filtering)
-        k = 5 
-        if self.index is None or self.index.ntotal == 0:
-            return user_query, False
+        single = isinstance(user_query, str)
+        queries = [user_query] if single else list(user_query)
+        matches = self._search_batch(queries, threshold, fuzzy_threshold, k, ef_search)
+
+        if ranked:
+            return matches[0] if single else matches
+
+        decisions = [(m[0]["product"], True) if m else (q, False) for q, m in zip(queries, matches)]
+        return decisions[0] if single else decisions
+
+    def _search_batch(self, queries, threshold, fuzzy_threshold, k, ef_search):
+        import faiss
 
-        distances, indices = self.index.search(np.array(query_vec).astype('float32'), k)
+        if not queries or self.index is None or self.index.ntotal == 0:
+            return [[] for _ in queries]
+
+        # 1. Normalize Queries
+        norm_queries = self.normalize_batch(queries)
         
-        # Iterate through candidates to find the first valid one
-        for i in range(k):
-            idx = indices[0][i]
-            score = distances[0][i]
-            
-            if idx == -1: continue
-            
-            # Retrieve Data using UUID
-            try:
-                uid = self.index_to_uuid[idx]
-                found_product = self.products_map[uid]
-                found_product_norm = self.normalized_map[uid]
-            except IndexError:
+        # 2. Vector Search (Fetch more than one candidate to allow for filtering)
+        query_vecs = np.array(self.model.encode(norm_queries)).astype('float32')
+        faiss.normalize_L2(query_vecs)
+
+        k = min(k or self.top_k, self.index.ntotal)
+        if hasattr(self.index, "hnsw"):
+            params = faiss.SearchParametersHNSW(efSearch=max(ef_search or self.ef_search, k))
+            distances, indices = self.index.search(query_vecs, k, params=params)
+        else:
+            distances, indices = self.index.search(query_vecs, k)
+
+        # Squared L2 distance between unit vectors -> cosine similarity
+        scores = 1.0 - distances / 2.0
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        results = []
+        for qi, user_query in enumerate(queries):
+            # Retrieve Data using the integer ids
+            ids = [int(idx) for idx in indices[qi] if 0 <= idx < len(self.products)]
+            vector_scores = [float(sc) for idx, sc in zip(indices[qi], scores[qi]) if 0 <= idx < len(self.products)]
+            candidates = [self.products[idx] for idx in ids]
+            candidates_norm = [self.normalized[idx] for idx in ids]
+            if not candidates:
+                results.append([])
                 continue
 
             # --- NEGATIVE FILTERING ---
-            if self.check_negative_filter(user_query, found_product):
-                print(f"   [Filter] Rejected '{found_product}' for query '{user_query}' (Gender Mismatch)")
-                continue # Skip this candidate
-            
+            rejected = self.check_negative_filter_batch(user_query, candidates)
+
+            # --- FUZZY SCORES (all candidates in one call) ---
+            fuzzy_scores = process.cdist([norm_queries[qi]], candidates_norm, scorer=fuzz.ratio)[0] / 100.0
+
             # --- DECISION LOGIC ---
-            
-            # CASE A: Strong Vector Match
-            if score > 0.8:
-                return found_product, True
-
-            # CASE B: Weak/Medium Vector Match -> Verify with Fuzzy Logic
-            fuzzy_score = fuzz.ratio(norm_query, found_product_norm) / 100.0
-            
-            print(f"   [Debug] Query: '{norm_query}' | Match: '{found_product_norm}'")
-            print(f"   [Debug] Vector Score: {score:.3f} | Fuzzy Score: {fuzzy_score:.3f}")
-
-            if fuzzy_score > 0.85:
-                return found_product, True
-                
-            if score > threshold:
-                 return found_product, True
-        
-        return user_query, False
+            # Accept on a good vector match (strong matches always qualify),
+            # or a weak/medium vector match verified by fuzzy logic
+            accepted = []
+            for product, score, fuzzy_score, reject in zip(candidates, vector_scores, fuzzy_scores, rejected):
+                if debug:
+                    logger.debug("Query: '%s' | Match: '%s' | Vector Score: %.3f | Fuzzy Score: %.3f%s",
+                                 norm_queries[qi], product, score, fuzzy_score,
+                                 " | Rejected (Gender Mismatch)" if reject else "")
+                if reject:
+                    continue
+                if score > threshold or fuzzy_score > fuzzy_threshold:
+                    accepted.append({"product": product, "score": score, "fuzzy_score": float(fuzzy_score)})
+            results.append(accepted)
+
+        return results
 
     def save_data(self):
+        import faiss
+
         # Save FAISS Index
-        faiss.write_index(self.index, self.index_file)
+        if self.index is not None:
+            faiss.write_index(self.index, self.index_file)
+        elif os.path.exists(self.index_file):
+            os.remove(self.index_file)
         # Save Metadata
         with open(self.metadata_file, 'wb') as f:
             pickle.dump({
-                'products_map': self.products_map, 
-                'normalized_map': self.normalized_map,
-                'index_to_uuid': self.index_to_uuid
+                'index_mode': self.index_mode,
+                'products': self.products,
+                'normalized': self.normalized
             }, f)
 
+    def _load_metadata(self):
+        if os.path.exists(self.metadata_file):
+            with open(self.metadata_file, 'rb') as f:
+                data = pickle.load(f)
+            return data.get('index_mode', 'hnsw'), data.get('products', []), data.get('normalized', [])
+
+        # Migrate v2 metadata (UUID maps) to integer ids
+        with open(self.legacy_metadata_file, 'rb') as f:
+            data = pickle.load(f)
+        uuids = data.get('index_to_uuid', [])
+        products_map = data.get('products_map', {})
+        normalized_map = data.get('normalized_map', {})
+        print(f"Migrating {len(uuids)} products from v2 metadata...")
+        return 'hnsw', [products_map[u] for u in uuids], [normalized_map[u] for u in uuids]
+
     def load_data(self):
-        if os.path.exists(self.index_file) and os.path.exists(self.metadata_file):
+        import faiss
+
+        has_metadata = os.path.exists(self.metadata_file) or os.path.exists(self.legacy_metadata_file)
+        if os.path.exists(self.index_file) and has_metadata:
             print("Loading existing index from disk...")
             try:
                 self.index = faiss.read_index(self.index_file)
-                with open(self.metadata_file, 'rb') as f:
-                    data = pickle.load(f)
-                    self.products_map = data.get('products_map', {})
-                    self.normalized_map = data.get('normalized_map', {})
-                    self.index_to_uuid = data.get('index_to_uuid', [])
+                saved_mode, products, normalized = self._load_metadata()
+                self.products = self._new_string_store(products)
+                self.normalized = self._new_string_store(normalized)
+
+                if saved_mode != self.index_mode:
+                    # Re-pack stored vectors; no re-embedding needed
+                    print(f"Converting index from '{saved_mode}' to '{self.index_mode}'...")
+                    vectors = self.index.reconstruct_n(0, self.index.ntotal)
+                    self.index = build_index(vectors, self.index_mode, self.dimension)
+                    self.save_data()
             except Exception as e:
                 print(f"Error loading data: {e}. Starting fresh.")
                 self.index = None
-                self.products_map = {}
-                self.normalized_map = {}
-                self.index_to_uuid = []
+                self.products = self._new_string_store()
+                self.normalized = self._new_string_store()
         else:
             print("No existing index found. Starting fresh.")
 
@@ -234,9 +491,8 @@ class IntelligentSearchEngine:
         
         # Reset Data Structures
         self.index = None
-        self.products_map = {}
-        self.normalized_map = {}
-        self.index_to_uuid = []
+        self.products = self._new_string_store()
+        self.normalized = self._new_string_store()
         
         # Add products (this will handle normalization, embedding, and saving)
         if all_products:
@@ -246,10 +502,63 @@ class IntelligentSearchEngine:
             self.save_data()
             print("Index cleared.")
 
+class LazyEngine:
+    """
+    Thread-safe proxy that builds the wrapped engine on first use.
+    Attribute access is forwarded, so callers keep using `engine.search(...)`.
+    """
+    def __init__(self, factory, *args, **kwargs):
+        self._factory = factory
+        self._args = args
+        self._kwargs = kwargs
+        self._instance = None
+        self._lock = threading.Lock()
+        self.state = "cold"  # cold -> loading -> ready | failed
+        self.error = None
+
+    def get(self):
+        if self._instance is not None:
+            return self._instance
+        with self._lock:
+            if self._instance is None:
+                self.state = "loading"
+                try:
+                    self._instance = self._factory(*self._args, **self._kwargs)
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    raise
+                self.state = "ready"
+                self.error = None
+        return self._instance
+
+    def warm_up(self):
+        """Loads the engine eagerly. Safe to call from a background thread."""
+        try:
+            self.get()
+        except Exception as e:
+            print(f"Search engine warm-up failed: {e}")
+        return self.state
+
+    @property
+    def is_ready(self):
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
 # --- EXECUTION ---
 
-# Initialize Engine (Global Instance)
-engine = IntelligentSearchEngine()
+# Global Instances (initialized on first use or by warm_up())
+# engine       : product names seen in scrape results
+# query_engine : queries that have cached result sets, used to serve near-duplicate queries
+engine = LazyEngine(IntelligentSearchEngine)
+query_engine = LazyEngine(IntelligentSearchEngine, folder_path=os.path.join(DEFAULT_DATA_DIR, "queries"))
+
+# A cached query is reused only on a close match; stricter than product matching
+QUERY_MATCH_THRESHOLD = float(os.environ.get("QUERY_MATCH_THRESHOLD", "0.9"))
+QUERY_FUZZY_THRESHOLD = float(os.environ.get("QUERY_FUZZY_THRESHOLD", "0.95"))
 
 if __name__ == "__main__":
     # Add Data (Only needed once, it saves automatically)
@@ -0,0 +1,128 @@
+import os
+import asyncio
+import cache_manager as cache
+import main_scraper
+from utils.rate_limiter import guard_for
+from utils.scheduler import PREFETCH, QueueFullError
+
+# Cache warming
+# Every WARM_INTERVAL seconds the most requested queries (decayed hit counts in query_stats)
+# are re-scraped at prefetch priority when their cached data is about to go stale.
+WARM_ENABLED = os.environ.get("CACHE_WARM", "1") != "0"
+WARM_TOP_N = int(os.environ.get("CACHE_WARM_TOP_N", "20"))
+WARM_INTERVAL = float(os.environ.get("CACHE_WARM_INTERVAL", "300"))
+# Refresh this many minutes before the soft TTL is reached
+WARM_LEAD_MINUTES = float(os.environ.get("CACHE_WARM_LEAD_MINUTES", "60"))
+# Queries with a lower score (roughly: requests in the last half-life) are not worth a scrape
+WARM_MIN_SCORE = float(os.environ.get("CACHE_WARM_MIN_SCORE", "2"))
+
+
+def sites_healthy():
+    """False while any marketplace is throttling us or has its circuit open."""
+    for _, module in main_scraper.SCRAPERS:
+        guard = guard_for(module.DOMAIN)
+        if guard.breaker.state != "closed" or guard.limiter.rate < guard.limiter.max_rate:
+            return False
+    return True
+
+
+class CacheWarmer:
+    """
+    Refreshes popular queries ahead of expiry using idle scrape capacity only.
+    Warms one query at a time and never queues behind user searches: it only starts
+    when the scheduler has more than one free slot, so a slot stays open for interactive requests.
+    `in_flight` is the query -> task dict shared with stale-cache refreshes, to avoid double scrapes.
+    """
+    def __init__(self, scheduler, in_flight, top_n=WARM_TOP_N, interval=WARM_INTERVAL,
+                 lead_minutes=WARM_LEAD_MINUTES, min_score=WARM_MIN_SCORE):
+        self.scheduler = scheduler
+        self.in_flight = in_flight
+        self.top_n = top_n
+        self.interval = interval
+        self.lead_minutes = lead_minutes
+        self.min_score = min_score
+        self.warmed = 0
+        self._task = None
+
+    def _has_idle_capacity(self):
+        return self.scheduler.spare_slots() > 1 and sites_healthy()
+
+    async def candidates(self):
+        """Popular queries whose cache is missing or within lead_minutes of going stale."""
+        due_at = cache.SOFT_TTL_MINUTES - self.lead_minutes
+        return [
+            query for query, score, age in await cache.get_top_queries(self.top_n)
+            if score >= self.min_score and (age is None or age >= due_at) and query not in self.in_flight
+        ]
+
+    async def warm(self, query):
+        self.in_flight[query] = asyncio.current_task()
+        try:
+            async with self.scheduler.slot(PREFETCH):
+                print(f"Warming cache for '{query}'...")
+                # Candidates are still fresh, so search_products alone would scrape nothing
+                await main_scraper.search_products(
+                    query, reuse_similar=False, force_sources=[name for name, _ in main_scraper.SCRAPERS]
+                )
+                self.warmed += 1
+                return True
+        except QueueFullError:
+            return False
+        finally:
+            self.in_flight.pop(query, None)
+
+    async def run_once(self):
+        """One warming pass; returns the number of queries refreshed."""
+        warmed = 0
+        for query in await self.candidates():
+            # Re-checked before every query: user traffic may have arrived meanwhile
+            if not self._has_idle_capacity():
+                break
+            if query in self.in_flight:
+                continue
+            if await self.warm(query):
+                warmed += 1
+        return warmed
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Cache warming failed: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+        return self._task
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def snapshot(self):
+        return {
+            "enabled": self._task is not None,
+            "top_n": self.top_n,
+            "interval_s": self.interval,
+            "lead_minutes": self.lead_minutes,
+            "warmed": self.warmed,
+            "sites_healthy": sites_healthy(),
+        }
+
+
+# Usage Example: list what the next warming pass would refresh
+async def main():
+    from utils.scheduler import ScrapeScheduler
+
+    await cache.init_table()
+    warmer = CacheWarmer(ScrapeScheduler(), {})
+    for query, score, age in await cache.get_top_queries(warmer.top_n):
+        print(f"{query!r}: score={score:.2f} age={'-' if age is None else f'{age:.0f}m'}")
+    print("Due:", await warmer.candidates())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,89 +1,207 @@
-import asyncio, time
+import asyncio, time, re
+from datetime import datetime
 import scrapeHub.Myntra as m
 import scrapeHub.Amazon as a
 import scrapeHub.Flipcart as f
 import cache_manager as cache
 from cache_manager import query_processor as nqp
+from utils.network_manager import network_manager
+from utils.rate_limiter import guard_for
+from utils.product_fields import normalize_item
+from cache_manager.dedup import signature
+from utils import metrics, profiling
 
 
 import scrapeHub.Meesho as meesho
 
-async def collect_to_queue(source_name, gen, queue):
-    async for item in gen:
-        if item:
-            await queue.put((source_name, item))
+SCRAPERS = [
+    ("Myntra", m),
+    ("Amazon", a),
+    ("Flipkart", f),
+    ("Meesho", meesho),
+]
 
-    await queue.put((source_name, None))
+# A source whose last scrape failed or came back empty is retried after this many minutes
+SOURCE_RETRY_MINUTES = 15
 
-async def collect_results(sources, query):
+async def collect_to_queue(source_name, gen, queue, errors):
+    try:
+        with metrics.stage(source_name, "total"):
+            async for item in gen:
+                if item:
+                    await queue.put((source_name, item))
+    except Exception as e:
+        print(f"{source_name} scrape failed: {e}")
+        errors[source_name] = str(e)
+    finally:
+        # Always signal completion, otherwise collect_results waits forever
+        await queue.put((source_name, None))
+
+@profiling.profile_calls("collect")
+async def collect_results(sources, query, job_id=None):
+    """
+    Streams the items of all sources into the cache as they arrive. Rows are upserted by
+    (query, source, p_index), so a re-run never duplicates them; a source's older rows are
+    pruned only once it completed with items, which keeps the previous rows of a source
+    that failed, came back empty or was interrupted.
+    """
+    started_at = datetime.utcnow().isoformat()
     queue = asyncio.Queue()
     total_done = 0
     total_sources = len(sources)
     products = []
+    errors = {}
+    counts = {name: 0 for name, _ in sources}
 
-    tasks = [asyncio.create_task(collect_to_queue(name, gen, queue)) for name, gen in sources]
+    if job_id:
+        for name, _ in sources:
+            await cache.update_job_source(job_id, name, "running")
+    tasks = [asyncio.create_task(collect_to_queue(name, gen, queue, errors)) for name, gen in sources]
 
     while total_done < total_sources:
         source, item = await queue.get()
         if item is None:
             total_done += 1
+            metrics.SCRAPE_ITEMS.inc(counts[source], source=source)
+            status = "failed" if source in errors else "ok" if counts[source] else "empty"
+            if status == "ok":
+                await cache.prune_source_rows(query, source, started_at)
+            await cache.record_source_status(query, source, status, counts[source], errors.get(source))
+            if job_id:
+                await cache.update_job_source(job_id, source, status, counts[source], errors.get(source))
             continue
 
         # Add source to item if not present
         if isinstance(item, dict):
             item['source'] = source
+            # Normalization stage: typed price / MRP / discount / rating / review count next to the display strings,
+            # plus the dedup signature used to group the same product across sources
+            item.update(normalize_item(item))
+            item["signature"] = signature(item.get("Name"))
             products.append(item)
+            counts[source] += 1
             await cache.store_query_data(query, source, item)
 
     await asyncio.gather(*tasks)
     await cache.cache_images(query)
     return products
 
-async def search_products(query: str):
+def _numbers(text):
+    return set(re.findall(r"\d+", text))
+
+async def find_similar_cached(query: str):
+    """
+    Looks for a previously scraped query close enough to `query` that still has fresh cached data.
+    Returns (matched_query, products) or (None, None).
+    """
+    loop = asyncio.get_running_loop()
+    with metrics.NLP_SECONDS.time(op="query_match"):
+        matched, is_present = await loop.run_in_executor(
+            None, lambda: nqp.query_engine.search(
+                query, threshold=nqp.QUERY_MATCH_THRESHOLD, fuzzy_threshold=nqp.QUERY_FUZZY_THRESHOLD
+            )
+        )
+
+    # Model numbers / sizes must agree exactly ("iphone 14" must not serve "iphone 15")
+    if not is_present or matched == query or _numbers(matched) != _numbers(query):
+        return None, None
+
+    # Only fresh neighbours: a stale one is refreshed under its own query, not served for this one
+    cached, state = await cache.retrieve_query_entry(matched)
+    if not cached or state != "fresh":
+        return None, None
+    return matched, cached
+
+async def sources_to_scrape(query: str):
+    """
+    Names of the sources that need a scrape for `query`: never scraped, cached rows
+    past the soft TTL, or last scrape failed / came back empty more than SOURCE_RETRY_MINUTES ago.
+    """
+    states = await cache.get_source_states(query)
+    due = []
+    for name, _ in SCRAPERS:
+        state = states.get(name)
+        if state is None:
+            due.append(name)
+        elif state["status"] == "ok":
+            if state["data_age"] is None or cache.freshness(state["data_age"]) != "fresh":
+                due.append(name)
+        elif state["attempt_age"] is None or state["attempt_age"] >= SOURCE_RETRY_MINUTES:
+            due.append(name)
+    return due
+
+async def search_products(query: str, reuse_similar: bool = True, job_id=None, force_sources=()):
     """
     Main entry point for searching products.
-    Returns a dictionary with status and data.
+    Only sources that are missing or out of date are scraped (plus `force_sources`); the others are served from the cache.
+    Returns the list of products, served from the cache of a near-duplicate query when possible.
+    With `job_id`, the state of every source is recorded on that scrape job.
     """
     await cache.init_table()
     
-    # NLP Check
-    # Use the engine instance from the module
-    q, is_present = nqp.engine.search(query)
-    
-    # Fallback if NLP returns None (should not happen with latest fix, but safe to have)
-    if not q:
-        q = query
-        
-    if is_present:
-        # For API, we might want to return cached data automatically
-        # For now, let's just return the cached data if it's a "good" match
-        # We need a way to get data from cache without printing
-        # cache.retrieve_query_data prints. We might need to refactor cache_manager too or just scrape if not strict.
-        # Let's assume we scrape for now if not exact match, or we can implement a fetch_from_cache later.
-        # For this refactor, I'll focus on the scraping part.
-        pass
+    # NLP Check: a close enough query already scraped -> skip the scrape entirely
+    if reuse_similar:
+        matched, cached = await find_similar_cached(query)
+        if cached:
+            print(f"Serving '{query}' from cached query '{matched}'")
+            return cached
 
     # No Playwright context needed anymore
+
+    # Sources whose circuit breaker is open fail fast: serve their stale cached rows instead
+    due = set(await sources_to_scrape(query)) | set(force_sources)
+    sources = []
+    cached = []
+    stale = []
+    for name, module in SCRAPERS:
+        if name not in due:
+            rows = await cache.retrieve_source_rows(query, name)
+            cached.extend(rows)
+            if job_id:
+                await cache.update_job_source(job_id, name, "cached", len(rows))
+            continue
+        if guard_for(module.DOMAIN).breaker.is_open():
+            rows = await cache.retrieve_source_rows(query, name)
+            print(f"{name} circuit open; serving {len(rows)} stale cached products")
+            stale.extend(dict(row, stale=True) for row in rows)
+            if job_id:
+                await cache.update_job_source(job_id, name, "skipped", len(rows), "circuit open")
+            continue
+        sources.append((name, module.fetch(Query=query)))
+
+    results = await collect_results(sources, query=query, job_id=job_id) if sources else []
     
-    sources = [
-        ("Myntra", m.fetch(Query=q)),
-        ("Amazon", a.fetch(Query=q)),
-        ("Flipkart", f.fetch(Query=q)),
-        ("Meesho", meesho.fetch(Query=q)),
-    ]
-
-    results = await collect_results(sources, query=query)
-    
-    # Update NLP Engine with new products
+    # Update NLP Engines with the new query and products
     if results:
-        product_names = [p.get('name') for p in results if p.get('name')]
+        product_names = [p.get('Name') or p.get('name') for p in results if p.get('Name') or p.get('name')]
         # Run in executor to avoid blocking async loop with heavy CPU work
         loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, nqp.engine.add_products, product_names)
+        with metrics.NLP_SECONDS.time(op="index_update"):
+            await loop.run_in_executor(None, nqp.query_engine.add_products, [query], True)
+            await loop.run_in_executor(None, nqp.engine.add_products, product_names)
     
+    return results + cached + stale
+
+async def run_job(job_id, query: str):
+    """
+    Runs (or resumes) a scrape job stored with cache.create_job and marks it done or failed.
+    On resume, sources the interrupted run left "running" are scraped again even when their
+    partly written rows look fresh.
+    """
+    await cache.init_table()
+    job = await cache.get_job(job_id)
+    force = [name for name, state in job["sources"].items() if state["state"] == "running"] if job else []
+    await cache.update_job(job_id, "running")
+    try:
+        results = await search_products(query, reuse_similar=False, job_id=job_id, force_sources=force)
+    except Exception as e:
+        await cache.update_job(job_id, "failed", error=str(e))
+        raise
+    await cache.update_job(job_id, "done", items=len(results))
     return results
 
 async def main():
+    network_manager.start_background_refresh()
     query = input("Search for : ").strip()
     t0 = time.time()
     
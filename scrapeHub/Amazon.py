@@ -7,51 +7,75 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from utils.network_manager import network_manager
-from utils.browser_manager import get_driver
+from utils.browser_manager import open_page, is_connection_error
+from utils import metrics, profiling, pagination, location_sessions
 import logging
+from urllib.parse import urlsplit
 
 logger = logging.getLogger(__name__)
 
+# Overridable so benchmarks can point the scraper at a local fixture server
+BASE_URL = os.environ.get("AMAZON_BASE_URL", "https://www.amazon.in").rstrip("/")
+# Rate-limit / blocking-profile key; independent of BASE_URL so fixture runs keep the site's settings
+DOMAIN = os.environ.get("AMAZON_DOMAIN", "amazon.in")
+# Location sessions hold cookies of the host actually browsed
+HOST = urlsplit(BASE_URL).hostname
+SOURCE = "Amazon"
+
 queue = None
 name_url = {}
 
 async def get_url(Qur=None, p_c=None):
     if Qur is None:
-        query = input("Enter what you wanna Search on Amazon : ").strip()
-    else:
-        query = Qur
-    if p_c is None:
-        pc = None
-    else:
-        pc = p_c
-    folder = query
+        Qur = input("Enter what you wanna Search on Amazon : ").strip()
+    # Location-aware cache keys ("<query> @<pincode>") carry the pincode
+    query, key_pincode = location_sessions.split_location_key(Qur)
+    pc = p_c if p_c is not None else key_pincode
+    folder = Qur
     query = query.replace(' ', '+')
-    url = f'https://www.amazon.in/s?k={query}'
+    url = f'{BASE_URL}/s?k={query}'
     return url, pc, folder
 
 async def download_image(session, url, folder):
     try:
-        headers = network_manager.get_headers()
-        async with session.get(url, headers=headers) as resp:
-            if resp.status == 200:
-                content = await resp.read()
-                os.makedirs(f"Amazon/{folder}", exist_ok=True)
-                name = name_url[url]
-                filename = f"Amazon/{folder}/{name}"
-                with open(filename, "wb") as f:
-                    f.write(content)
+        with metrics.stage(SOURCE, "image_download"):
+            status, content = await network_manager.fetch_bytes(session, url)
+        if status == 200:
+            os.makedirs(f"Amazon/{folder}", exist_ok=True)
+            name = name_url[url]
+            filename = f"Amazon/{folder}/{name}"
+            with open(filename, "wb") as f:
+                f.write(content)
     except Exception as e:
         logger.error(f"Failed to download image {url}: {e}")
 
-def scrape_amazon_sync(url, pc):
-    driver = get_driver(headless=True)
+def location_applied(driver, pc):
+    """True if the page header shows `pc` as the delivery location."""
+    try:
+        return pc in driver.find_element(By.ID, "glow-ingress-line2").text
+    except Exception:
+        return False
+
+@profiling.profile_calls(f"source:{SOURCE}")
+def scrape_amazon_sync(url, pc, stop=None):
+    driver = lease = None
     products_data = []
     try:
-        driver.get(url)
+        # A speculative page whose pagination already ended: do not start a browser for it
+        if stop is not None and stop.is_set():
+            return products_data
+        # A stored location session for the pincode makes the page load with the location already set
+        session = location_sessions.store.get(HOST, pc) if pc else None
+        driver, lease = open_page(url, source=SOURCE, site=DOMAIN, session=session, partition=pc)
+        timer = metrics.StageTimer(SOURCE)
         # Reduced wait time
         time.sleep(1.5)
 
-        if pc:
+        if pc and location_applied(driver, pc):
+            timer.lap("location_reused")
+        elif pc:
+            if session is not None:
+                location_sessions.store.invalidate(HOST, pc)
             try:
                 # Try to set pincode
                 try:
@@ -70,6 +94,11 @@ def scrape_amazon_sync(url, pc):
                     pass
             except Exception:
                 pass
+            if location_applied(driver, pc):
+                location_sessions.store.put(HOST, location_sessions.capture(driver, pc))
+            timer.lap("location_set")
+
+        timer.lap("wait")
 
         # Find products
         products = driver.find_elements(By.CSS_SELECTOR, "div[role='listitem']")
@@ -120,7 +149,7 @@ def scrape_amazon_sync(url, pc):
                 
                 # Ensure absolute URL
                 if product_url and not product_url.startswith('http'):
-                    product_url = "https://www.amazon.in" + product_url
+                    product_url = BASE_URL + product_url
 
                 # --- Reviews & Sold ---
                 stars = "N/A"
@@ -208,35 +237,51 @@ def scrape_amazon_sync(url, pc):
 
             except Exception:
                 continue
+        timer.lap("extract")
                 
     except Exception as e:
         print(f"Error processing Amazon content: {e}")
+        # Page-load failures are recorded by open_page; parsing errors say nothing about the proxy
+        if lease and is_connection_error(e):
+            lease.fail()
+        # Re-raised so the source is recorded as failed rather than empty
+        raise
     finally:
-        driver.quit()
+        if driver:
+            driver.quit()
+        if lease:
+            lease.release()
         
     return products_data
 
 async def process_content(Qur=None, p_c=None, context=None):
     global queue
     url, pc, folder = await get_url(Qur=Qur, p_c=p_c)
-
-    products = await asyncio.to_thread(scrape_amazon_sync, url, pc)
+    unique = pagination.UniqueProducts()
 
     async with aiohttp.ClientSession() as session:
-        for product in products:
-            img_url = product.pop("img_url", None)
-            if img_url:
-                name_url[img_url] = f"product_{product['index']}.jpg" 
-                await download_image(session, img_url, folder)
-            
-            await queue.put(product)
+        async def emit(products):
+            for product in products:
+                img_url = product.pop("img_url", None)
+                if img_url:
+                    name_url[img_url] = f"product_{product['index']}.jpg" 
+                    await download_image(session, img_url, folder)
+
+                await queue.put(product)
 
-    await queue.put(None)
+        await emit(unique.add(await asyncio.to_thread(scrape_amazon_sync, url, pc)))
+        # Amazon's grid is read through Selenium elements, so later pages need a browser too
+        pages = pagination.more_pages(lambda n, stop: asyncio.to_thread(scrape_amazon_sync, f"{url}&page={n}", pc, stop),
+                                      pagination.max_pages(SOURCE), unique)
+        async for products in pages:
+            await emit(products)
 
 async def fetch(Query=None, pincode=None, context=None):
     global queue
     queue = asyncio.Queue()
     producer_task = asyncio.create_task(process_content(Qur=Query, p_c=pincode, context=context))
+    # The end marker follows the producer however it ends; its error is re-raised below
+    producer_task.add_done_callback(lambda _, q=queue: q.put_nowait(None))
 
     while True:
         item = await queue.get()
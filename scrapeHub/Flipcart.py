@@ -7,11 +7,19 @@ from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
 import json
 from utils.network_manager import network_manager
-from utils.browser_manager import get_driver
+from utils.browser_manager import open_page, is_connection_error
+from utils import metrics, profiling, pagination, location_sessions
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Overridable so benchmarks can point the scraper at a local fixture server
+BASE_URL = os.environ.get("FLIPKART_BASE_URL", "https://www.flipkart.com").rstrip("/")
+# Rate-limit / blocking-profile key; independent of BASE_URL so fixture runs keep the site's settings
+DOMAIN = os.environ.get("FLIPKART_DOMAIN", "flipkart.com")
+SOURCE = "Flipkart"
+HTTP_PAGES = os.environ.get("FLIPKART_HTTP_PAGES", "1") != "0"
+
 queue = None  
 folder = None
 url_name = {}
@@ -23,8 +31,9 @@ def get_url(Qur=None):
     else:
         query = Qur
     folder = query
-    query = query.replace(' ', '+')
-    return f'https://www.flipkart.com/search?q={query}'
+    # Location-aware cache keys ("<query> @<pincode>"): only the query goes into the URL
+    query = location_sessions.split_location_key(query)[0].replace(' ', '+')
+    return f'{BASE_URL}/search?q={query}'
 
 def safe_eval(func):
     try:
@@ -36,121 +45,168 @@ async def download_image(session, img_url):
     if img_url == "N/A":
         return
     try:
-        headers = network_manager.get_headers()
-        async with session.get(img_url, headers=headers) as response:
-            if response.status == 200:
-                os.makedirs(f"Flipkart/{folder}", exist_ok=True)
-                name = url_name[img_url]
-                filename = f"Flipkart/{folder}/{name}"
-                with open(filename, "wb") as f:
-                    f.write(await response.read())
+        with metrics.stage(SOURCE, "image_download"):
+            status, content = await network_manager.fetch_bytes(session, img_url)
+        if status == 200:
+            os.makedirs(f"Flipkart/{folder}", exist_ok=True)
+            name = url_name[img_url]
+            filename = f"Flipkart/{folder}/{name}"
+            with open(filename, "wb") as f:
+                f.write(content)
     except Exception as e:
         logger.error(f"Failed to download image {img_url}: {e}")
 
-def scrape_flipkart_sync(url):
-    driver = get_driver(headless=True)
+def parse_products(content):
+    """Product dicts of a search results page (rendered HTML)."""
+    products_data = []
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    # Selectors for product container
+    product_list = soup.find_all('div', {'class': "slAVV4"})
+    if not product_list:
+         product_list = soup.find_all('div', {'class': "_1sdMkc LFEi7Z"}) # Fallback
+
+    for i, product in enumerate(product_list):
+        try:
+            # Try multiple selectors for the link
+            p_link = "N/A"
+            
+            # 1. Try the main container anchor (common in grid view)
+            if p_link == "N/A":
+                p_link = safe_eval(lambda: product.find('a', {'class': 'rPDeLR'})['href'])
+            
+            # 2. Try the title anchor
+            if p_link == "N/A":
+                p_link = safe_eval(lambda: product.find('a', {'class': 'WKTcLC'})['href'])
+            
+            # 3. Try the old class
+            if p_link == "N/A":
+                p_link = safe_eval(lambda: product.find('a', {'class': 'VJA3rP'})['href'])
+
+            if p_link == "N/A":
+                 # Fallback: find any 'a' tag with href
+                 p_link = safe_eval(lambda: product.find('a')['href'])
+
+            img_link = safe_eval(lambda: product.find('img', {'class': 'DByuf4'})['src'])
+            if img_link == "N/A":
+                 img_link = safe_eval(lambda: product.find('img', {'class': '_53J4C-'})['src'])
+
+            p_company = safe_eval(lambda: product.find('div', {'class': 'syl9yP'}).text)
+            p_name = safe_eval(lambda: product.find('a', {'class': 'WKTcLC'}).get_text())
+            
+            rating = safe_eval(lambda: product.find('div', {'class': 'XQDdHH'}).get_text())
+            rating_count = safe_eval(lambda: product.find('span', {'class': 'Wphh3N'}).get_text())
+
+            price = safe_eval(lambda: product.find('div', {'class': 'Nx9bqj'}).get_text())
+            o_price = safe_eval(lambda: product.find('div', {'class': 'yRaY8j'}).get_text())
+            dcount = safe_eval(lambda: product.find('div', {'class': 'UkUFwK'}).get_text())
+
+            delv = "N/A"
+            
+            stock_status = "In Stock"
+            if price == "N/A":
+                stock_status = "Out of Stock"
+
+            full_link = f"{BASE_URL}{p_link}" if p_link != "N/A" else None
+
+            info = {
+                "Name": f"{p_company} {p_name}",
+                "product_link": full_link,
+                "review" : f"Rating: {rating}, Count: {rating_count}",
+                "price": f"{price} ( {o_price} with {dcount})",
+                "delivery" : f"{delv}",
+                "stock": stock_status,
+                "specs": "N/A",
+                "index" : i,
+                "img_link": img_link
+            }
+            products_data.append(info)
+        except Exception:
+            continue
+    return products_data
+
+@profiling.profile_calls(f"source:{SOURCE}")
+def scrape_flipkart_sync(url, stop=None):
+    driver = lease = None
     products_data = []
     try:
-        driver.get(url)
+        # A speculative page whose pagination already ended: do not start a browser for it
+        if stop is not None and stop.is_set():
+            return products_data
+        driver, lease = open_page(url, source=SOURCE, site=DOMAIN)
+        timer = metrics.StageTimer(SOURCE)
         # Scroll to load more
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
         import time
         import time
         time.sleep(1.5)
         
-        content = driver.page_source
-        soup = BeautifulSoup(content, 'html.parser')
+        timer.lap("wait")
         
-        # Selectors for product container
-        product_list = soup.find_all('div', {'class': "slAVV4"})
-        if not product_list:
-             product_list = soup.find_all('div', {'class': "_1sdMkc LFEi7Z"}) # Fallback
-
-        for i, product in enumerate(product_list):
-            try:
-                # Try multiple selectors for the link
-                p_link = "N/A"
-                
-                # 1. Try the main container anchor (common in grid view)
-                if p_link == "N/A":
-                    p_link = safe_eval(lambda: product.find('a', {'class': 'rPDeLR'})['href'])
-                
-                # 2. Try the title anchor
-                if p_link == "N/A":
-                    p_link = safe_eval(lambda: product.find('a', {'class': 'WKTcLC'})['href'])
-                
-                # 3. Try the old class
-                if p_link == "N/A":
-                    p_link = safe_eval(lambda: product.find('a', {'class': 'VJA3rP'})['href'])
-
-                if p_link == "N/A":
-                     # Fallback: find any 'a' tag with href
-                     p_link = safe_eval(lambda: product.find('a')['href'])
-
-                img_link = safe_eval(lambda: product.find('img', {'class': 'DByuf4'})['src'])
-                if img_link == "N/A":
-                     img_link = safe_eval(lambda: product.find('img', {'class': '_53J4C-'})['src'])
-
-                p_company = safe_eval(lambda: product.find('div', {'class': 'syl9yP'}).text)
-                p_name = safe_eval(lambda: product.find('a', {'class': 'WKTcLC'}).get_text())
-                
-                rating = safe_eval(lambda: product.find('div', {'class': 'XQDdHH'}).get_text())
-                rating_count = safe_eval(lambda: product.find('span', {'class': 'Wphh3N'}).get_text())
-
-                price = safe_eval(lambda: product.find('div', {'class': 'Nx9bqj'}).get_text())
-                o_price = safe_eval(lambda: product.find('div', {'class': 'yRaY8j'}).get_text())
-                dcount = safe_eval(lambda: product.find('div', {'class': 'UkUFwK'}).get_text())
-
-                delv = "N/A"
-                
-                stock_status = "In Stock"
-                if price == "N/A":
-                    stock_status = "Out of Stock"
-
-                full_link = f"https://www.flipkart.com{p_link}" if p_link != "N/A" else None
-
-                info = {
-                    "Name": f"{p_company} {p_name}",
-                    "product_link": full_link,
-                    "review" : f"Rating: {rating}, Count: {rating_count}",
-                    "price": f"{price} ( {o_price} with {dcount})",
-                    "delivery" : f"{delv}",
-                    "stock": stock_status,
-                    "specs": "N/A",
-                    "index" : i,
-                    "img_link": img_link
-                }
-                products_data.append(info)
-            except Exception:
-                continue
+        content = driver.page_source
+        products_data = parse_products(content)
+        timer.lap("extract")
     except Exception as e:
         print(f"Error processing Flipkart content: {e}")
+        # Page-load failures are recorded by open_page; parsing errors say nothing about the proxy
+        if lease and is_connection_error(e):
+            lease.fail()
+        # Re-raised so the source is recorded as failed rather than empty
+        raise
     finally:
-        driver.quit()
+        if driver:
+            driver.quit()
+        if lease:
+            lease.release()
         
     return products_data
 
+async def fetch_page(session, url, stop=None):
+    """
+    One more results page. Flipkart renders the grid on the server, so a plain HTTP GET
+    is tried first (FLIPKART_HTTP_PAGES=0 disables it); a browser is the fallback.
+    `stop` is the pagination's stop event (see pagination.more_pages).
+    """
+    if HTTP_PAGES:
+        try:
+            with metrics.stage(SOURCE, "http_page"):
+                status, body = await network_manager.fetch_bytes(session, url, domain=DOMAIN)
+            html = body.decode("utf-8", "replace")
+            if status == 200 and not network_manager.detect_block(html):
+                products = await asyncio.to_thread(parse_products, html)
+                if products:
+                    return products
+            logger.info(f"HTTP fetch of {url} gave no products (status {status}); using a browser")
+        except Exception as e:
+            logger.info(f"HTTP fetch of {url} failed ({e}); using a browser")
+    return await asyncio.to_thread(scrape_flipkart_sync, url, stop)
+
 async def process_content(Qur=None, context=None):
     global queue
     url = get_url(Qur)
-    
-    products = await asyncio.to_thread(scrape_flipkart_sync, url)
+    unique = pagination.UniqueProducts()
 
     async with aiohttp.ClientSession() as session:
-        for product in products:
-            img_link = product.pop("img_link", None)
-            if img_link and img_link != "N/A":
-                url_name[img_link] = f"product_{product['index']}.jpg"
-                await download_image(session, img_link)
-            
-            await queue.put(product)
+        async def emit(products):
+            for product in products:
+                img_link = product.pop("img_link", None)
+                if img_link and img_link != "N/A":
+                    url_name[img_link] = f"product_{product['index']}.jpg"
+                    await download_image(session, img_link)
+
+                await queue.put(product)
 
-    await queue.put(None)
+        await emit(unique.add(await asyncio.to_thread(scrape_flipkart_sync, url)))
+        pages = pagination.more_pages(lambda n, stop: fetch_page(session, f"{url}&page={n}", stop), pagination.max_pages(SOURCE), unique)
+        async for products in pages:
+            await emit(products)
 
 async def fetch(Query=None, context=None):
     global queue
     queue = asyncio.Queue()
     producer_task = asyncio.create_task(process_content(Qur=Query, context=context))
+    # The end marker follows the producer however it ends; its error is re-raised below
+    producer_task.add_done_callback(lambda _, q=queue: q.put_nowait(None))
     while True:
         item = await queue.get()
         if item is None:
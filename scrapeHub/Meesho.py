@@ -1,17 +1,25 @@
 import asyncio
 import aiohttp
 import os
-import time
 import random
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from utils.network_manager import network_manager
-from utils.browser_manager import get_driver
+from utils.browser_manager import open_page, is_connection_error
+from utils import metrics, profiling, scroll, location_sessions
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Overridable so benchmarks can point the scraper at a local fixture server
+BASE_URL = os.environ.get("MEESHO_BASE_URL", "https://www.meesho.com").rstrip("/")
+# Rate-limit / blocking-profile key; independent of BASE_URL so fixture runs keep the site's settings
+DOMAIN = os.environ.get("MEESHO_DOMAIN", "meesho.com")
+SOURCE = "Meesho"
+# Milliseconds per viewport of the lazy-image sweep after scrolling
+SWEEP_MS = int(os.environ.get("MEESHO_SWEEP_MS", "60"))
+
 queue = None
 name_url = {}
 
@@ -22,50 +30,35 @@ async def get_url(Qur=None):
         query = Qur
     
     folder = query
-    query = query.replace(' ', '+')
-    url = f'https://www.meesho.com/search?q={query}'
+    # Location-aware cache keys ("<query> @<pincode>"): only the query goes into the URL
+    query = location_sessions.split_location_key(query)[0].replace(' ', '+')
+    url = f'{BASE_URL}/search?q={query}'
     return url, folder
 
 async def download_image(session, url, folder):
     try:
-        headers = network_manager.get_headers()
-        async with session.get(url, headers=headers) as resp:
-            if resp.status == 200:
-                content = await resp.read()
-                os.makedirs(f"Meesho/{folder}", exist_ok=True)
-                name = name_url[url]
-                filename = f"Meesho/{folder}/{name}"
-                with open(filename, "wb") as f:
-                    f.write(content)
+        with metrics.stage(SOURCE, "image_download"):
+            status, content = await network_manager.fetch_bytes(session, url)
+        if status == 200:
+            os.makedirs(f"Meesho/{folder}", exist_ok=True)
+            name = name_url[url]
+            filename = f"Meesho/{folder}/{name}"
+            with open(filename, "wb") as f:
+                f.write(content)
     except Exception as e:
         logger.error(f"Failed to download image {url}: {e}")
 
+@profiling.profile_calls(f"source:{SOURCE}")
 def scrape_meesho_sync(url):
-    driver = get_driver(headless=True)
+    driver = lease = None
     products_data = []
     try:
-        driver.get(url)
-        time.sleep(2)
-        
-        # More aggressive scrolling to load all products
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        scroll_attempts = 0
-        max_scrolls = 8  # Increase scroll iterations
-        
-        while scroll_attempts < max_scrolls:
-            # Scroll down
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1.5)
-            
-            # Calculate new height
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            
-            # Break if no new content loaded
-            if new_height == last_height:
-                break
-                
-            last_height = new_height
-            scroll_attempts += 1
+        driver, lease = open_page(url, source=SOURCE, site=DOMAIN)
+        timer = metrics.StageTimer(SOURCE)
+        # Jump-scroll until enough cards are rendered, then sweep once so lazy images get their src
+        scroll.scroll_for_cards(driver, "div[class*='ProductCard']", sweep_ms=SWEEP_MS)
+
+        timer.lap("wait")
 
         # Try multiple selectors for product cards
         products = []
@@ -209,7 +202,7 @@ def scrape_meesho_sync(url):
                             
                     # Ensure absolute URL
                     if link and link != "N/A" and not link.startswith('http'):
-                        link = "https://www.meesho.com" + link
+                        link = BASE_URL + link
                     
                     # If link is still N/A or empty, try to construct it from ID or other attributes if possible
                     # (Meesho usually has links, so this might not be needed if selectors are good)
@@ -234,11 +227,20 @@ def scrape_meesho_sync(url):
             except Exception as e:
                 # print(f"Error parsing product: {e}")
                 continue
+        timer.lap("extract")
                 
     except Exception as e:
         print(f"Error processing Meesho content: {e}")
+        # Page-load failures are recorded by open_page; parsing errors say nothing about the proxy
+        if lease and is_connection_error(e):
+            lease.fail()
+        # Re-raised so the source is recorded as failed rather than empty
+        raise
     finally:
-        driver.quit()
+        if driver:
+            driver.quit()
+        if lease:
+            lease.release()
         
     return products_data
 
@@ -257,12 +259,12 @@ async def process_content(Qur=None, context=None):
             
             await queue.put(product)
 
-    await queue.put(None)
-
 async def fetch(Query=None, context=None):
     global queue
     queue = asyncio.Queue()
     producer_task = asyncio.create_task(process_content(Qur=Query, context=context))
+    # The end marker follows the producer however it ends; its error is re-raised below
+    producer_task.add_done_callback(lambda _, q=queue: q.put_nowait(None))
 
     while True:
         item = await queue.get()
@@ -5,13 +5,21 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import aiohttp
 from utils.network_manager import network_manager
-from utils.browser_manager import get_driver
+from utils.browser_manager import open_page, is_connection_error
+from utils import metrics, profiling, pagination, scroll, location_sessions
 import logging
 from bs4 import BeautifulSoup
-import time
 
 logger = logging.getLogger(__name__)
 
+# Overridable so benchmarks can point the scraper at a local fixture server
+BASE_URL = os.environ.get("MYNTRA_BASE_URL", "https://www.myntra.com").rstrip("/")
+# Rate-limit / blocking-profile key; independent of BASE_URL so fixture runs keep the site's settings
+DOMAIN = os.environ.get("MYNTRA_DOMAIN", "myntra.com")
+SOURCE = "Myntra"
+# Milliseconds per viewport of the lazy-image sweep after scrolling
+SWEEP_MS = int(os.environ.get("MYNTRA_SWEEP_MS", "60"))
+
 queue = None  
 folder = None
 url_name = {}
@@ -23,19 +31,20 @@ def get_url(Query) -> str:
     else:
         query = input("Enter what you wanna Search on Myntra : ").strip()
     folder = query
-    query = query.replace(' ', '+')
-    return f'https://www.myntra.com/{query}?rawQuery={query}'
+    # Location-aware cache keys ("<query> @<pincode>"): only the query goes into the URL
+    query = location_sessions.split_location_key(query)[0].replace(' ', '+')
+    return f'{BASE_URL}/{query}?rawQuery={query}'
 
 async def download_image(session, url):
     try:
-        headers = network_manager.get_headers()
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                os.makedirs(f"Myntra/{folder}", exist_ok=True)
-                name = url_name[url]
-                filename = f"Myntra/{folder}/{name}"
-                with open(filename, "wb") as f:
-                    f.write(await response.read())
+        with metrics.stage(SOURCE, "image_download"):
+            status, content = await network_manager.fetch_bytes(session, url)
+        if status == 200:
+            os.makedirs(f"Myntra/{folder}", exist_ok=True)
+            name = url_name[url]
+            filename = f"Myntra/{folder}/{name}"
+            with open(filename, "wb") as f:
+                f.write(content)
     except Exception as e:
         logger.error(f"Failed to download image {url}: {e}")
 
@@ -64,40 +73,19 @@ def fix_myntra_url(raw_url):
     return clean_url
 
 
-def scrape_myntra_sync(url):
-    driver = get_driver(headless=True)
+@profiling.profile_calls(f"source:{SOURCE}")
+def scrape_myntra_sync(url, stop=None):
+    driver = lease = None
     products_data = []
     try:
-        driver.get(url)
-        # Scroll to load more products
-        viewport_height = driver.execute_script("return window.innerHeight;")
-
-        # Get total scroll height
-        last_height = driver.execute_script("return document.body.scrollHeight")
-        current_scroll = 0
-        while True:
-            # Scroll down by one viewport height
-            driver.execute_script(f"window.scrollBy(0, {viewport_height});")
-            
-            # Wait for images to load (lazy load trigger)
-            # 0.5s is fast, but usually enough for the request to fire
-            time.sleep(0.5) 
-            
-            # Update current scroll position
-            current_scroll += viewport_height
-            
-            # Check if we have reached the bottom
-            new_height = driver.execute_script("return document.body.scrollHeight")
-            
-            # Break if we are past the bottom or height hasn't changed (end of page)
-            if current_scroll >= new_height:
-                # One final check to see if content grew (infinite scroll)
-                if new_height == last_height:
-                    break
-                last_height = new_height
-
-        # Give one final second for the last batch to render
-        time.sleep(1)
+        # A speculative page whose pagination already ended: do not start a browser for it
+        if stop is not None and stop.is_set():
+            return products_data
+        driver, lease = open_page(url, source=SOURCE, site=DOMAIN)
+        timer = metrics.StageTimer(SOURCE)
+        # Jump-scroll until enough cards are rendered, then sweep once so lazy images get their src
+        scroll.scroll_for_cards(driver, "li.product-base", sweep_ms=SWEEP_MS)
+        timer.lap("wait")
             
         # Get static HTML
         content = driver.page_source
@@ -114,7 +102,7 @@ def scrape_myntra_sync(url):
                 if a_tag:
                     p_link = a_tag['href']
                     if p_link and not p_link.startswith("http"):
-                         p_link = "https://www.myntra.com/" + p_link
+                         p_link = BASE_URL + "/" + p_link
 
                 # Image
                 img_link = None
@@ -199,11 +187,20 @@ def scrape_myntra_sync(url):
             except Exception as e:
                 # print(f"Error parsing product: {e}")
                 continue
+        timer.lap("extract")
                 
     except Exception as e:
         print(f"Error processing Myntra content: {e}")
+        # Page-load failures are recorded by open_page; parsing errors say nothing about the proxy
+        if lease and is_connection_error(e):
+            lease.fail()
+        # Re-raised so the source is recorded as failed rather than empty
+        raise
     finally:
-        driver.quit()
+        if driver:
+            driver.quit()
+        if lease:
+            lease.release()
         
     return products_data
 
@@ -212,28 +209,33 @@ async def process_content(url=None, Query=None, context=None):
     # For compatibility with main_scraper, we keep the signature but don't use context.
     if url is None:
         url = get_url(Query)
-
-    # Run blocking Selenium code in a thread
-    products = await asyncio.to_thread(scrape_myntra_sync, url)
+    unique = pagination.UniqueProducts()
 
     async with aiohttp.ClientSession() as session:
-        for product in products:
-            img_link = product.pop("img_link", None)
-            if img_link:
-                url_name[img_link] = f"product_{product['index']}.jpg"
-                # Fire and forget download or await it? 
-                # Original awaited it inside the loop.
-                await download_image(session, img_link)
-            
-            await queue.put(product)
+        async def emit(products):
+            for product in products:
+                img_link = product.pop("img_link", None)
+                if img_link:
+                    url_name[img_link] = f"product_{product['index']}.jpg"
+                    await download_image(session, img_link)
+
+                await queue.put(product)
 
-    await queue.put(None)
+        # Run blocking Selenium code in a thread
+        await emit(unique.add(await asyncio.to_thread(scrape_myntra_sync, url)))
+        # The grid is rendered client side: later pages need a browser as well
+        pages = pagination.more_pages(lambda n, stop: asyncio.to_thread(scrape_myntra_sync, f"{url}&p={n}", stop),
+                                      pagination.max_pages(SOURCE), unique)
+        async for products in pages:
+            await emit(products)
 
 
 async def fetch(Query=None, context=None):
     global queue
     queue = asyncio.Queue()
     producer_task = asyncio.create_task(process_content(Query=Query, context=context))
+    # The end marker follows the producer however it ends; its error is re-raised below
+    producer_task.add_done_callback(lambda _, q=queue: q.put_nowait(None))
     while True:
         item = await queue.get()
         if item is None:
@@ -8,6 +8,7 @@ function checkLogin() {
         localStorage.setItem('admin_auth', 'true');
         loadStats();
         loadProducts();
+        loadProfiling();
     } else {
         document.getElementById('login-error').style.display = 'block';
     }
@@ -24,6 +25,7 @@ if (localStorage.getItem('admin_auth') === 'true') {
     document.getElementById('admin-content').style.display = 'block';
     loadStats();
     loadProducts();
+    loadProfiling();
 }
 
 async function loadStats() {
@@ -33,6 +35,10 @@ async function loadStats() {
         document.getElementById('total-items').textContent = data.total_items;
         document.getElementById('total-queries').textContent = data.total_queries;
         document.getElementById('db-size').textContent = (data.db_size_bytes / (1024 * 1024)).toFixed(2) + ' MB';
+
+        const ttl = await (await fetch('/api/admin/ttl')).json();
+        document.getElementById('soft-ttl-input').placeholder = `Soft TTL: ${ttl.soft_ttl_minutes}`;
+        document.getElementById('ttl-input').placeholder = `Hard TTL: ${ttl.hard_ttl_minutes}`;
     } catch (e) {
         console.error("Failed to load stats", e);
     }
@@ -63,16 +69,22 @@ async function loadProducts() {
 }
 
 async function updateTTL() {
-    const ttl = document.getElementById('ttl-input').value;
-    if (!ttl) return;
+    const soft = document.getElementById('soft-ttl-input').value;
+    const hard = document.getElementById('ttl-input').value;
+    if (!soft && !hard) return;
+
+    const body = {};
+    if (soft) body.soft_ttl_minutes = parseInt(soft);
+    if (hard) body.hard_ttl_minutes = parseInt(hard);
 
     try {
-        await fetch('/api/admin/ttl', {
+        const res = await fetch('/api/admin/ttl', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ ttl_minutes: parseInt(ttl) })
+            body: JSON.stringify(body)
         });
-        alert('TTL cleanup started');
+        const data = await res.json();
+        alert(res.ok ? data.message : `Failed to set TTL: ${data.detail}`);
         loadStats();
     } catch (e) {
         alert('Failed to set TTL');
@@ -103,3 +115,81 @@ async function deleteItem(id) {
         alert('Failed to delete item');
     }
 }
+
+async function loadProfiling() {
+    try {
+        const data = await (await fetch('/api/admin/profiling')).json();
+        const targets = document.getElementById('profiling-targets');
+        targets.innerHTML = '';
+        data.available_targets.forEach(t => {
+            const label = document.createElement('label');
+            label.style.cssText = 'display: flex; gap: 5px; align-items: center;';
+            const box = document.createElement('input');
+            box.type = 'checkbox';
+            box.value = t;
+            box.checked = data.targets.includes(t);
+            label.append(box, ` ${t}`);
+            targets.appendChild(label);
+        });
+        document.getElementById('profiling-mode').value = data.mode;
+        document.getElementById('profiling-threshold').placeholder = `Keep if slower than: ${data.threshold_s}s`;
+        document.getElementById('profiling-rate').placeholder = `Sample rate: ${data.sample_rate}`;
+
+        const list = document.getElementById('profile-list');
+        list.innerHTML = data.profiles.length ? '' : '<div class="list-item">No profiles yet</div>';
+        data.profiles.forEach(p => {
+            const div = document.createElement('div');
+            div.className = 'list-item';
+            const flame = p.mode === 'sample'
+                ? `<a class="btn" style="padding: 5px 10px; font-size: 0.8rem;" href="/api/admin/profiling/${encodeURIComponent(p.id)}?format=collapsed">Flame graph</a>`
+                : '';
+            div.innerHTML = `
+                <div>
+                    <div class="profile-title" style="font-weight: bold;"></div>
+                    <div style="font-size: 0.8rem; color: #aaa;">${p.duration_s.toFixed(3)}s | ${p.mode}${p.mode === 'sample' ? ` (${p.samples} samples)` : ''} | ${new Date(p.started_at * 1000).toLocaleString()}</div>
+                </div>
+                <div style="display: flex; gap: 5px;">
+                    <a class="btn btn-primary" style="padding: 5px 10px; font-size: 0.8rem;" href="/api/admin/profiling/${encodeURIComponent(p.id)}?format=text">Report</a>
+                    ${flame}
+                </div>
+            `;
+            // Target and label come from scraped queries: set as text, never as HTML
+            div.querySelector('.profile-title').textContent = `${p.target} \u2014 ${p.label}`;
+            list.appendChild(div);
+        });
+    } catch (e) {
+        console.error("Failed to load profiling", e);
+    }
+}
+
+async function updateProfiling() {
+    const body = {
+        targets: [...document.querySelectorAll('#profiling-targets input:checked')].map(i => i.value),
+        mode: document.getElementById('profiling-mode').value
+    };
+    const threshold = document.getElementById('profiling-threshold').value;
+    const rate = document.getElementById('profiling-rate').value;
+    if (threshold) body.threshold_s = parseFloat(threshold);
+    if (rate) body.sample_rate = parseFloat(rate);
+
+    try {
+        const res = await fetch('/api/admin/profiling', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(body)
+        });
+        if (!res.ok) alert(`Failed to update profiling: ${(await res.json()).detail}`);
+        loadProfiling();
+    } catch (e) {
+        alert('Failed to update profiling');
+    }
+}
+
+async function clearProfiles() {
+    try {
+        await fetch('/api/admin/profiling', { method: 'DELETE' });
+        loadProfiling();
+    } catch (e) {
+        alert('Failed to clear profiles');
+    }
+}
@@ -14,12 +14,68 @@ document.addEventListener('DOMContentLoaded', () => {
     const minPriceInput = document.getElementById('min-price');
     const maxPriceInput = document.getElementById('max-price');
     const siteCheckboxes = document.querySelectorAll('.site-filters input');
+    const mergeCheckbox = document.getElementById('merge-duplicates');
 
     // State
     let allProducts = [];
     let currentView = 'detailed';
     let lastScrollTop = 0;
 
+    // Paging: results are filtered, sorted and paginated by the server
+    const PAGE_SIZE = 24;
+    let currentQuery = '';
+    let nextCursor = null;
+    let isLoadingPage = false;
+    let shuffleSeed = 0;
+
+    function buildSearchUrl(query, { cursor = null, cacheOnly = false } = {}) {
+        const params = new URLSearchParams({ q: query, limit: PAGE_SIZE, sort: sortSelect.value, seed: shuffleSeed });
+
+        const selectedSites = Array.from(siteCheckboxes).filter(cb => cb.checked).map(cb => cb.value);
+        if (selectedSites.length < siteCheckboxes.length) params.set('sources', selectedSites.join(','));
+
+        const minPrice = parseFloat(minPriceInput.value);
+        const maxPrice = parseFloat(maxPriceInput.value);
+        if (!isNaN(minPrice)) params.set('min_price', minPrice);
+        if (!isNaN(maxPrice)) params.set('max_price', maxPrice);
+
+        if (cursor) params.set('cursor', cursor);
+        if (cacheOnly) params.set('cache_only', 'true');
+        return `/api/search?${params.toString()}`;
+    }
+
+    function showPage(result, append) {
+        nextCursor = result.next_cursor || null;
+        const items = result.data || [];
+        allProducts = append ? allProducts.concat(items) : items;
+        renderProducts(items, append);
+    }
+
+    // Merged view: one card per product with the best price and the other sites' offers
+    async function showGroups() {
+        const params = new URL(buildSearchUrl(currentQuery), window.location.origin).searchParams;
+        ['limit', 'sort', 'seed'].forEach(key => params.delete(key));
+        const response = await fetch(`/api/groups?${params.toString()}`);
+        if (!response.ok) return;
+        const result = await response.json();
+        nextCursor = null;
+        allProducts = result.groups.map(group => ({ ...group.offers[0], other_offers: group.offers.slice(1) }));
+        renderProducts(allProducts);
+    }
+
+    async function loadNextPage() {
+        if (!nextCursor || isLoadingPage || !currentQuery) return;
+        isLoadingPage = true;
+        try {
+            const response = await fetch(buildSearchUrl(currentQuery, { cursor: nextCursor }));
+            if (response.ok) showPage(await response.json(), true);
+        } catch (error) {
+            console.error('Page load error:', error);
+        } finally {
+            isLoadingPage = false;
+        }
+    }
+
     // --- Search Logic ---
     async function performSearch() {
         const query = searchInput.value.trim();
@@ -28,6 +84,9 @@ document.addEventListener('DOMContentLoaded', () => {
         // Reset
         allProducts = [];
         productGrid.innerHTML = '';
+        currentQuery = query;
+        nextCursor = null;
+        shuffleSeed = Math.floor(Math.random() * 1000000);
 
         // --- Loading Animation Logic ---
         const loadingContainer = document.createElement('div');
@@ -128,7 +187,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         try {
             // Fetch Data
-            const fetchPromise = fetch(`/api/search?q=${encodeURIComponent(query)}`);
+            const fetchPromise = fetch(buildSearchUrl(query));
 
             // Wait for both fetch and initial 1.5s
             const [response] = await Promise.all([fetchPromise, initialWaitPromise]);
@@ -137,9 +196,16 @@ document.addEventListener('DOMContentLoaded', () => {
             isResponseReceived = true;
             if (messageTimeout) clearTimeout(messageTimeout);
 
-            if (result.data && result.data.length > 0) {
-                allProducts = result.data;
-                applyFilters(); // This will render products
+            if (response.status === 429) {
+                const wait = response.headers.get('Retry-After') || 'a few';
+                productGrid.innerHTML = `<div class="empty-state"><h2>We're busy right now. Please try again in ${wait} seconds.</h2></div>`;
+                return;
+            }
+
+            if (result.total > 0 && mergeCheckbox.checked) {
+                await showGroups();
+            } else if (result.total > 0) {
+                showPage(result, false);
             } else {
                 productGrid.innerHTML = '<div class="empty-state"><h2>No products found.</h2></div>';
             }
@@ -157,45 +223,31 @@ document.addEventListener('DOMContentLoaded', () => {
     });
 
     // --- Filter & Sort Logic ---
-    function applyFilters() {
-        // 1. Filter by Site
-        const selectedSites = Array.from(siteCheckboxes)
-            .filter(cb => cb.checked)
-            .map(cb => cb.value);
-
-        let filtered = allProducts.filter(p => selectedSites.includes(p.source));
-
-        // 2. Filter by Price
-        const minPrice = parseFloat(minPriceInput.value) || 0;
-        const maxPrice = parseFloat(maxPriceInput.value) || Infinity;
-
-        filtered = filtered.filter(p => {
-            const priceVal = parsePrice(p.price).value;
-            return priceVal >= minPrice && priceVal <= maxPrice;
-        });
+    // Filters and sorting run on the server over the cached results; this re-fetches the first page
+    async function applyFilters() {
+        filterPopup.classList.add('hidden');
+        if (!currentQuery) return;
 
-        // 3. Sort
-        const sortMode = sortSelect.value;
-        if (sortMode === 'price-low') {
-            filtered.sort((a, b) => parsePrice(a.price).value - parsePrice(b.price).value);
-        } else if (sortMode === 'price-high') {
-            filtered.sort((a, b) => parsePrice(b.price).value - parsePrice(a.price).value);
-        } else if (sortMode === 'random') {
-            // Shuffle
-            filtered = shuffleArray([...filtered]);
+        nextCursor = null;
+        try {
+            if (mergeCheckbox.checked) {
+                await showGroups();
+                return;
+            }
+            const response = await fetch(buildSearchUrl(currentQuery, { cacheOnly: true }));
+            if (response.ok) showPage(await response.json(), false);
+        } catch (error) {
+            console.error('Filter error:', error);
         }
-
-        renderProducts(filtered);
-        filterPopup.classList.add('hidden');
     }
 
     applyFiltersBtn.addEventListener('click', applyFilters);
 
     // --- Rendering ---
-    function renderProducts(products) {
-        productGrid.innerHTML = '';
+    function renderProducts(products, append = false) {
+        if (!append) productGrid.innerHTML = '';
 
-        if (products.length === 0) {
+        if (products.length === 0 && !append) {
             productGrid.innerHTML = '<div class="empty-state"><h2>No products match your filters.</h2></div>';
             return;
         }
@@ -246,9 +298,11 @@ document.addEventListener('DOMContentLoaded', () => {
             // Meta
             let metaHtml = '';
             if (currentView === 'detailed') {
-                const rating = product.review && product.review.includes('Rating:')
-                    ? product.review.split(',')[0].replace('Rating:', '').trim()
-                    : null;
+                const rating = product.rating_value != null
+                    ? product.rating_value
+                    : product.review && product.review.includes('Rating:')
+                        ? product.review.split(',')[0].replace('Rating:', '').trim()
+                        : null;
 
                 if (rating && rating !== 'N/A') {
                     metaHtml += `<span>★ ${rating}</span>`;
@@ -261,6 +315,15 @@ document.addEventListener('DOMContentLoaded', () => {
                 }
             }
 
+            // Same product on other sites (merged view)
+            let offersHtml = '';
+            if (product.other_offers && product.other_offers.length > 0) {
+                const offers = product.other_offers
+                    .map(o => `<a href="${o.product_link}" target="_blank" rel="noopener noreferrer">${o.source} ${parsePrice(o.price).display}</a>`)
+                    .join(' · ');
+                offersHtml = `<div class="product-meta">Also on: ${offers}</div>`;
+            }
+
             card.innerHTML = `
                 ${imgHtml}
                 <div class="product-info">
@@ -270,6 +333,7 @@ document.addEventListener('DOMContentLoaded', () => {
                     </a>
                     ${priceHtml}
                     ${metaHtml}
+                    ${offersHtml}
                 </div>
             `;
 
@@ -301,6 +365,11 @@ document.addEventListener('DOMContentLoaded', () => {
             bottomBar.classList.remove('hidden');
         }
         lastScrollTop = st <= 0 ? 0 : st;
+
+        // Infinite scroll: fetch the next page when nearing the bottom
+        if (window.innerHeight + st >= document.body.offsetHeight - 600) {
+            loadNextPage();
+        }
     });
 
     // Filter Popup
@@ -332,8 +401,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 productGrid.classList.remove('compact-view');
             }
 
-            // Re-render without filtering if possible, or just re-apply filters
-            applyFilters();
+            // Re-render what is already loaded
+            renderProducts(allProducts);
         });
     });
 
@@ -424,11 +493,3 @@ function parsePrice(priceStr) {
         discount: discount
     };
 }
-
-function shuffleArray(array) {
-    for (let i = array.length - 1; i > 0; i--) {
-        const j = Math.floor(Math.random() * (i + 1));
-        [array[i], array[j]] = [array[j], array[i]];
-    }
-    return array;
-}
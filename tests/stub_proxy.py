@@ -0,0 +1,104 @@
+"""
+Local stand-ins for exercising the proxy pool over real HTTP:
+  Origin    : the target site, answers every GET with "origin ok"
+  StubProxy : a plain-HTTP forward proxy. It receives absolute-URI requests and, depending on
+              `mode`, forwards them to the target ("forward"), answers with `ban_status`
+              ("ban") or serves a captcha page ("captcha"), after `delay` seconds.
+Both run on their own event loop in a daemon thread (start_in_thread / stop_thread) and
+record how many requests they saw and the most they handled at once.
+"""
+import abc
+import asyncio
+import threading
+
+import aiohttp
+from aiohttp import web
+
+CAPTCHA_PAGE = "<html><body><form action='/errors/validateCaptcha'>Type the characters you see in this image</form></body></html>"
+
+
+class ThreadedServer(abc.ABC):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.port = None
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self._runner = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/"
+
+    @abc.abstractmethod
+    async def respond(self, request):
+        """The response to one request."""
+
+    async def _handle(self, request):
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            return await self.respond(request)
+        finally:
+            self.active -= 1
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start_in_thread(self):
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+
+        self._thread = threading.Thread(target=run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+
+class Origin(ThreadedServer):
+    async def respond(self, request):
+        return web.Response(text="origin ok")
+
+
+class StubProxy(ThreadedServer):
+    def __init__(self, mode="forward", ban_status=429, delay=0.0):
+        super().__init__(delay)
+        self.mode = mode
+        self.ban_status = ban_status
+
+    @property
+    def proxy(self):
+        """The pool's notation of this proxy (host:port, no scheme)."""
+        return f"127.0.0.1:{self.port}"
+
+    async def respond(self, request):
+        if self.mode == "ban":
+            return web.Response(status=self.ban_status, text="blocked")
+        if self.mode == "captcha":
+            return web.Response(text=CAPTCHA_PAGE, content_type="text/html")
+        # Absolute-URI request line: request.url is the target
+        async with aiohttp.ClientSession() as session:
+            async with session.request(request.method, str(request.url)) as resp:
+                return web.Response(status=resp.status, body=await resp.read())
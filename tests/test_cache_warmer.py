@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("selenium")
+
+import cache_manager as cache
+import cache_warmer
+import main_scraper
+from utils.scheduler import ScrapeScheduler
+
+
+class FakeEngine:
+    def search(self, query, **kwargs):
+        return query, False
+
+    def add_products(self, *args):
+        pass
+
+
+@pytest.fixture
+def scrapers(tmp_path, monkeypatch):
+    """Runs the cache on a temporary database and replaces every scraper's fetch; returns the calls."""
+    monkeypatch.setattr(cache, "DB_NAME", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(main_scraper.nqp, "engine", FakeEngine())
+    monkeypatch.setattr(main_scraper.nqp, "query_engine", FakeEngine())
+    monkeypatch.setattr(cache_warmer, "sites_healthy", lambda: True)
+    calls = []
+
+    def fake_fetch(name):
+        async def fetch(Query):
+            calls.append((name, Query))
+            yield {"Name": f"{name} product", "product_link": f"https://{name}.test/1", "price": "₹499", "index": 0}
+        return fetch
+
+    for name, module in main_scraper.SCRAPERS:
+        monkeypatch.setattr(module, "fetch", fake_fetch(name))
+    return calls
+
+
+async def _cache_query(query, age_minutes, hits):
+    await cache.init_table()
+    scraped_at = (datetime.utcnow() - timedelta(minutes=age_minutes)).isoformat()
+    for name, _ in main_scraper.SCRAPERS:
+        await cache.store_query_data(query, name, {"Name": f"{name} old", "index": 0})
+        await cache.record_source_status(query, name, "ok", 1)
+    async with cache.aiosqlite.connect(cache.DB_NAME) as db:
+        await db.execute("UPDATE product_cache SET timestamp = ? WHERE query = ?", (scraped_at, query))
+        await db.commit()
+    for _ in range(hits):
+        await cache.record_query_hit(query)
+
+
+def test_warm_scrapes_every_source_of_a_fresh_candidate(scrapers):
+    async def run():
+        # Fresh, but within the warmer's lead time of the soft TTL
+        await _cache_query("red shoes", cache.SOFT_TTL_MINUTES - 10, hits=5)
+        assert await main_scraper.sources_to_scrape("red shoes") == []
+
+        warmer = cache_warmer.CacheWarmer(ScrapeScheduler(max_concurrent=3), {}, lead_minutes=60, min_score=2)
+        assert await warmer.candidates() == ["red shoes"]
+        return await warmer.run_once(), warmer
+
+    warmed, warmer = asyncio.run(run())
+    assert warmed == 1 and warmer.warmed == 1
+    assert sorted(name for name, _ in scrapers) == sorted(name for name, _ in main_scraper.SCRAPERS)
+    assert all(query == "red shoes" for _, query in scrapers)
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("selenium")
+
+import cache_manager as cache
+import main_scraper
+import scrapeHub.Amazon as amazon
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cache, "DB_NAME", str(tmp_path / "cache.db"))
+    asyncio.run(cache.init_table())
+
+
+async def no_results():
+    return
+    yield
+
+
+def test_failing_source_is_recorded_as_failed(db, monkeypatch):
+    def browser_down(*args, **kwargs):
+        raise RuntimeError("chrome not reachable")
+
+    monkeypatch.setattr(amazon, "open_page", browser_down)
+
+    async def run():
+        products = await main_scraper.collect_results(
+            [("Amazon", amazon.fetch(Query="shoes")), ("Meesho", no_results())], "shoes"
+        )
+        return products, await cache.get_source_states("shoes")
+
+    products, states = asyncio.run(asyncio.wait_for(run(), timeout=30))
+    assert products == []
+    assert states["Amazon"]["status"] == "failed"
+    assert "chrome not reachable" in states["Amazon"]["error"]
+    assert states["Meesho"]["status"] == "empty"
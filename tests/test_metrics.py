@@ -0,0 +1,43 @@
+import importlib
+import importlib.util
+
+import pytest
+
+from utils import metrics
+
+
+@pytest.fixture
+def cleanup_registry():
+    names = []
+    yield names
+    for name in names:
+        metrics._registry.pop(name, None)
+
+
+def test_registering_same_metric_twice_replaces_it(cleanup_registry):
+    cleanup_registry.append("test_twice_gauge")
+    metrics.Gauge("test_twice_gauge", "Registered twice", callback=lambda: 1)
+    second = metrics.Gauge("test_twice_gauge", "Registered twice", callback=lambda: 2)
+
+    assert metrics._registry["test_twice_gauge"] is second
+    text = metrics.render()
+    assert text.count("# HELP test_twice_gauge ") == 1
+    assert "test_twice_gauge 2" in text
+
+
+def test_registering_name_as_different_metric_fails(cleanup_registry):
+    cleanup_registry.append("test_clash_metric")
+    metrics.Gauge("test_clash_metric", "A gauge")
+    with pytest.raises(ValueError):
+        metrics.Counter("test_clash_metric", "Now a counter")
+    with pytest.raises(ValueError):
+        metrics.Gauge("test_clash_metric", "Now with labels", ("source",))
+
+
+def test_api_module_can_be_imported_twice():
+    # `python api.py` runs the file as __main__, then uvicorn.run("api:app") imports it as `api`
+    pytest.importorskip("selenium")
+    api = importlib.import_module("api")
+    spec = importlib.util.spec_from_file_location("api_as_main", api.__file__)
+    spec.loader.exec_module(importlib.util.module_from_spec(spec))
+    assert "scrape_queue_depth" in metrics.render()
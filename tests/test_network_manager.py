@@ -0,0 +1,120 @@
+import asyncio
+import socket
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from utils import rate_limiter
+from utils.network_manager import NetworkManager
+
+
+@pytest.fixture
+def guards(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_guards", {})
+    return rate_limiter
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def expire_open_breaker(breaker):
+    breaker.state = "open"
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+
+
+async def ok(request):
+    return web.Response(text="ok")
+
+
+async def serve_ok():
+    app = web.Application()
+    app.router.add_get("/", ok)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, site._server.sockets[0].getsockname()[1]
+
+
+def test_half_open_trial_that_raises_reopens_breaker_then_recovers(guards, tmp_path):
+    nm = NetworkManager(proxy_file=str(tmp_path / "none.txt"), strict_mode=False)
+    breaker = guards.guard_for("127.0.0.1").breaker
+    timeout = aiohttp.ClientTimeout(total=5)
+
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            # Trial request against a closed port
+            expire_open_breaker(breaker)
+            with pytest.raises((aiohttp.ClientError, rate_limiter.CircuitOpenError)):
+                await nm._get(session, f"http://127.0.0.1:{closed_port()}/", {}, None, timeout)
+            assert breaker.state == "open"
+            assert not breaker.trial_in_flight
+            assert breaker.is_open()
+            reopened_for = breaker.reset_timeout
+
+            # Once the timeout passes, the next trial succeeds and closes the breaker
+            runner, port = await serve_ok()
+            try:
+                expire_open_breaker(breaker)
+                status, body = await nm._get(session, f"http://127.0.0.1:{port}/", {}, None, timeout)
+            finally:
+                await runner.cleanup()
+        return reopened_for, status, body
+
+    reopened_for, status, body = asyncio.run(run())
+    assert reopened_for == 2 * breaker.base_reset_timeout
+    assert (status, body) == (200, b"ok")
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_connection_errors_open_the_breaker(guards, tmp_path):
+    nm = NetworkManager(proxy_file=str(tmp_path / "none.txt"), strict_mode=False)
+    breaker = guards.guard_for("127.0.0.1").breaker
+    url = f"http://127.0.0.1:{closed_port()}/"
+
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            for _ in range(breaker.failure_threshold):
+                with pytest.raises((aiohttp.ClientError, rate_limiter.CircuitOpenError)):
+                    await nm._get(session, url, {}, None, aiohttp.ClientTimeout(total=5))
+
+    asyncio.run(run())
+    assert breaker.state == "open"
+    with pytest.raises(rate_limiter.CircuitOpenError):
+        guards.guard_for("127.0.0.1").check()
+
+
+def test_domain_overrides_the_guard_of_the_url_host(guards, tmp_path):
+    nm = NetworkManager(proxy_file=str(tmp_path / "none.txt"), strict_mode=False)
+    url = f"http://127.0.0.1:{closed_port()}/"
+
+    async def run():
+        async with aiohttp.ClientSession() as session:
+            with pytest.raises(aiohttp.ClientError):
+                await nm.fetch_bytes(session, url, timeout=5, domain="amazon.in")
+
+    asyncio.run(run())
+    # A fixture server on localhost still gets the real site's limits and breaker
+    site = guards.guard_for("amazon.in")
+    assert site.breaker.failures > 0
+    assert site.limiter.rate == rate_limiter.DOMAIN_LIMITS["amazon.in"][0]
+    assert "127.0.0.1" not in guards._guards
+
+
+def test_no_free_proxy_refresher_for_a_file_only_pool(tmp_path):
+    proxy_file = tmp_path / "proxies.txt"
+    proxy_file.write_text("127.0.0.1:3128\n")
+    nm = NetworkManager(proxy_file=str(proxy_file), strict_mode=True)
+
+    async def run():
+        task = nm.start_background_refresh()
+        await nm.load_user_agents()
+        return task
+
+    assert asyncio.run(run()) is None
+    assert nm.proxies == ["http://127.0.0.1:3128"]
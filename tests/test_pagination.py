@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from utils import pagination
+
+
+def test_pages_still_queued_for_a_thread_are_stopped_when_pagination_ends():
+    gate = threading.Event()   # stands in for the wait for a free worker thread / browser
+    third_queued = threading.Event()
+    opened, stopped = [], []
+
+    def scrape_sync(n, stop):
+        if n == 2:
+            third_queued.wait(5)
+        if n == 3:
+            third_queued.set()
+            gate.wait(5)
+        if stop.is_set():
+            stopped.append(n)
+            return []
+        opened.append(n)
+        return [{"product_link": f"/p/{n}/{i}"} for i in range(3)]
+
+    async def run():
+        pages = pagination.more_pages(lambda n, stop: asyncio.to_thread(scrape_sync, n, stop),
+                                      last_page=5, unique=pagination.UniqueProducts(), concurrency=2)
+        async for _ in pages:
+            break   # the consumer has enough after the first page
+        await pages.aclose()
+        gate.set()
+        # to_thread work keeps running after its task is cancelled; let it finish
+        while 3 not in opened + stopped:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(asyncio.wait_for(run(), timeout=10))
+    assert opened == [2]
+    assert stopped == [3]
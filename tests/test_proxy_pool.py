@@ -0,0 +1,156 @@
+import asyncio
+import random
+import socket
+from collections import Counter
+
+import aiohttp
+import pytest
+
+from tests.stub_proxy import Origin, StubProxy
+from utils import rate_limiter
+from utils.network_manager import NetworkManager
+from utils.proxy_pool import ProxyPool, normalize_proxy
+
+
+@pytest.fixture(autouse=True)
+def guards(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_guards", {})
+
+
+@pytest.fixture
+def servers():
+    """Starts stand-in servers in threads and stops them after the test: servers(Origin()) -> started."""
+    started = []
+
+    def start(server):
+        started.append(server.start_in_thread())
+        return server
+
+    yield start
+    for server in started:
+        server.stop_thread()
+
+
+@pytest.fixture
+def origin(servers):
+    return servers(Origin())
+
+
+def manager(tmp_path, proxies, strict_mode, **pool_args):
+    proxy_file = tmp_path / "proxies.txt"
+    proxy_file.write_text("\n".join(proxies))
+    nm = NetworkManager(proxy_file=str(proxy_file), strict_mode=strict_mode)
+    nm.pool = ProxyPool(proxies, **pool_args)
+    return nm
+
+
+async def fetch_all(nm, url, n=1):
+    async with aiohttp.ClientSession() as session:
+        return await asyncio.gather(*(nm.fetch_bytes(session, url) for _ in range(n)))
+
+
+def quarantined_for(pool, proxy):
+    return next(p["quarantined_for_s"] for p in pool.snapshot() if p["proxy"] == normalize_proxy(proxy))
+
+
+def lift_quarantine(pool, proxy):
+    pool._stats[normalize_proxy(proxy)].quarantined_until = 0.0
+
+
+def test_lease_prefers_reliable_fast_proxies():
+    pool = ProxyPool(["fast:1", "slow:1", "flaky:1"], max_in_flight=1000)
+    for i in range(20):
+        pool.release("http://fast:1", "ok", 0.2)
+        pool.release("http://slow:1", "ok", 2.0)
+        # Alternating outcomes never reach the consecutive-failure quarantine
+        pool.release("http://flaky:1", "ok" if i % 2 else "fail", 0.2)
+
+    random.seed(0)
+    picks = Counter()
+    for _ in range(3000):
+        lease = pool.lease()
+        picks[lease.proxy] += 1
+        lease.cancel()
+
+    assert picks["http://fast:1"] > picks["http://flaky:1"] > picks["http://slow:1"] > 0
+    assert picks["http://fast:1"] > 0.6 * 3000
+    assert all(p["in_flight"] == 0 for p in pool.snapshot())
+
+
+@pytest.mark.parametrize("status", [403, 429])
+def test_ban_status_quarantines_with_exponential_backoff(tmp_path, servers, origin, status):
+    proxy = servers(StubProxy(mode="ban", ban_status=status))
+    nm = manager(tmp_path, [proxy.proxy], strict_mode=True, base_backoff=30)
+
+    [(got, _)] = asyncio.run(fetch_all(nm, origin.url))
+    assert got == status
+    assert 29 <= quarantined_for(nm.pool, proxy.proxy) <= 30
+    # Strict mode has nothing left to lease while the only proxy is quarantined
+    with pytest.raises(RuntimeError):
+        nm.lease_proxy()
+
+    lift_quarantine(nm.pool, proxy.proxy)
+    asyncio.run(fetch_all(nm, origin.url))
+    assert 59 <= quarantined_for(nm.pool, proxy.proxy) <= 60
+    assert origin.requests == 0
+
+
+def test_captcha_page_quarantines_the_proxy(tmp_path, servers, origin):
+    proxy = servers(StubProxy(mode="captcha"))
+    nm = manager(tmp_path, [proxy.proxy], strict_mode=True, base_backoff=30)
+
+    async def load_page():
+        # What browser_manager.open_page does with a block page: ban the lease
+        async with aiohttp.ClientSession() as session:
+            with nm.lease_proxy() as lease:
+                async with session.get(origin.url, proxy=lease.proxy) as resp:
+                    if nm.detect_block(await resp.text()):
+                        lease.ban()
+
+    asyncio.run(load_page())
+    assert 29 <= quarantined_for(nm.pool, proxy.proxy) <= 30
+    lift_quarantine(nm.pool, proxy.proxy)
+    asyncio.run(load_page())
+    assert 59 <= quarantined_for(nm.pool, proxy.proxy) <= 60
+
+
+def test_in_flight_cap_sends_overflow_direct(tmp_path, servers, origin):
+    proxy = servers(StubProxy(delay=0.3))
+    nm = manager(tmp_path, [proxy.proxy], strict_mode=False, max_in_flight=2)
+
+    results = asyncio.run(fetch_all(nm, origin.url, n=6))
+
+    assert results == [(200, b"origin ok")] * 6
+    assert proxy.requests == 2 and proxy.max_active <= 2
+    assert origin.requests == 6
+    assert nm.pool.snapshot()[0]["in_flight"] == 0
+    assert nm.pool.snapshot()[0]["successes"] == 2
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.mark.parametrize("broken", ["ban", "dead"])
+def test_non_strict_mode_falls_back_to_direct(tmp_path, servers, origin, broken):
+    if broken == "ban":
+        proxy = servers(StubProxy(mode="ban")).proxy
+    else:
+        proxy = f"127.0.0.1:{closed_port()}"
+    nm = manager(tmp_path, [proxy], strict_mode=False)
+
+    [result] = asyncio.run(fetch_all(nm, origin.url))
+
+    assert result == (200, b"origin ok")
+    assert origin.requests == 1
+    stats = nm.pool.snapshot()[0]
+    assert stats["failures"] == 1 and stats["in_flight"] == 0
+
+
+def test_strict_mode_never_goes_direct(tmp_path, origin):
+    nm = manager(tmp_path, [f"127.0.0.1:{closed_port()}"], strict_mode=True)
+    with pytest.raises(aiohttp.ClientError):
+        asyncio.run(fetch_all(nm, origin.url))
+    assert origin.requests == 0
@@ -0,0 +1,13 @@
+import pytest
+
+from cache_manager.query_processor import tokenize, tokenize_batch
+
+
+@pytest.mark.parametrize("texts", [
+    [],
+    [""],
+    ["Nike Air-Max 270, Men's", "", "  Red\x00Shoes  "],
+    ["Jeans für Herren", "Kurta (Women) - 2 pcs"],
+])
+def test_tokenize_batch_matches_tokenize(texts):
+    assert tokenize_batch(texts) == [tokenize(t.replace("\x00", " ")) for t in texts]
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import pytest
+
+import cache_manager as cache
+from utils import metrics
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cache, "DB_NAME", str(tmp_path / "cache.db"))
+
+    async def fill():
+        await cache.init_table()
+        for i in range(10):
+            await cache.store_query_data("shoes", "Amazon", {
+                "Name": f"Shoe {i}", "price": f"₹{100 + 10 * i}", "review": "4.0", "index": i,
+            })
+
+    asyncio.run(fill())
+
+
+def pages(**kwargs):
+    async def run():
+        names, cursor = [], None
+        while True:
+            result = await cache.query_products("shoes", limit=3, cursor=cursor, **kwargs)
+            names += [item["name"] for item in result["items"]]
+            cursor = result["next_cursor"]
+            if cursor is None:
+                return names
+
+    return asyncio.run(run())
+
+
+def test_cursor_pages_through_the_listing_once(db):
+    names = pages(sort="random", seed=7)
+    assert sorted(names) == sorted(f"Shoe {i}" for i in range(10))
+    assert pages(sort="random", seed=7) == names
+
+
+@pytest.mark.parametrize("changed", [
+    {"sort": "price-high"}, {"seed": 8}, {"min_price": 120.0}, {"sources": ["Amazon"]},
+])
+def test_cursor_is_rejected_with_other_sort_or_filters(db, changed):
+    listing = {"sort": "random", "seed": 7}
+    first = asyncio.run(cache.query_products("shoes", limit=3, **listing))
+    with pytest.raises(ValueError, match="does not match"):
+        asyncio.run(cache.query_products("shoes", limit=3, cursor=first["next_cursor"], **{**listing, **changed}))
+
+
+def test_malformed_cursor_is_rejected(db):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        asyncio.run(cache.query_products("shoes", limit=3, cursor="not-a-cursor"))
+
+
+def test_grouping_is_timed_as_nlp_not_as_db(db, monkeypatch):
+    def slow_grouping(products, model=None):
+        time.sleep(0.2)
+        return [{"offers": [p]} for p in products]
+
+    monkeypatch.setattr(cache, "group_products", slow_grouping)
+    db_before = metrics.DB_SECONDS.totals().get(("grouped_products",), (0, 0.0))
+    nlp_before = metrics.NLP_SECONDS.totals().get(("group_products",), (0, 0.0))
+
+    assert len(asyncio.run(cache.get_grouped_products("shoes"))) == 10
+
+    db_count, db_sum = metrics.DB_SECONDS.totals()[("grouped_products",)]
+    nlp_count, nlp_sum = metrics.NLP_SECONDS.totals()[("group_products",)]
+    assert (db_count - db_before[0], nlp_count - nlp_before[0]) == (1, 1)
+    assert db_sum - db_before[1] < 0.2 <= nlp_sum - nlp_before[1]
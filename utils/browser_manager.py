@@ -1,19 +1,93 @@
+import os
+import atexit
+import logging
+import threading
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+from utils.network_manager import network_manager
+from utils.proxy_pool import ProxyLease
+from utils.rate_limiter import guard_for, BlockedError
+from utils import metrics, location_sessions
 
-def get_driver(headless=True):
+logger = logging.getLogger(__name__)
+
+# Resource blocking
+# Scrapers read product data and image URLs from the DOM (images are downloaded separately),
+# so most sub-resources only cost load time and bandwidth. Matching requests are cancelled by
+# Chrome via CDP Network.setBlockedURLs ('*' wildcards). Set BROWSER_RESOURCE_BLOCKING=0 to disable.
+RESOURCE_BLOCKING = os.environ.get("BROWSER_RESOURCE_BLOCKING", "1") != "0"
+BLOCK_CATEGORIES = {
+    "trackers": [
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+        "*googleadservices.com*", "*facebook.net*", "*connect.facebook.com*", "*amazon-adsystem.com*",
+        "*criteo.*", "*hotjar.com*", "*clarity.ms*", "*scorecardresearch.com*", "*branch.io*",
+        "*moengage.com*", "*nr-data.net*", "*newrelic.com*", "*sentry.io*", "*taboola.com*", "*outbrain.com*",
+    ],
+    "fonts": ["*.woff", "*.woff?*", "*.woff2", "*.woff2?*", "*.ttf", "*.otf", "*.eot"],
+    "media": ["*.mp4", "*.mp4?*", "*.webm", "*.m3u8", "*.m4s", "*.mp3", "*.ogg"],
+    "images": ["*.jpg", "*.jpg?*", "*.jpeg", "*.png", "*.png?*", "*.gif", "*.webp", "*.webp?*", "*.avif", "*.ico"],
+}
+# Per site (rate limiter domain): blocked categories, patterns exempt from them, and the
+# Selenium page-load strategy. "eager" returns at DOMContentLoaded; only used on sites whose
+# product grid is in the server-rendered HTML. Lazy-loading sites keep their images so the
+# loaders still fill in src attributes while we scroll.
+SITE_PROFILES = {
+    "amazon.in": {"block": ("trackers", "fonts", "media", "images"), "allow": (), "page_load": "eager"},
+    "flipkart.com": {"block": ("trackers", "fonts", "media", "images"), "allow": (), "page_load": "eager"},
+    "myntra.com": {"block": ("trackers", "fonts", "media"), "allow": (), "page_load": "eager"},
+    "meesho.com": {"block": ("trackers", "fonts", "media"), "allow": (), "page_load": "normal"},
+}
+DEFAULT_PROFILE = {"block": ("trackers", "fonts", "media"), "allow": (), "page_load": "normal"}
+# No blocking at all (benchmark baseline / BROWSER_RESOURCE_BLOCKING=0)
+OFF_PROFILE = {"block": (), "allow": (), "page_load": "normal"}
+
+
+def site_profile(site):
+    """Blocking profile of a site (domain as used by the rate limiter); OFF_PROFILE when disabled."""
+    if not RESOURCE_BLOCKING:
+        return OFF_PROFILE
+    return SITE_PROFILES.get(site, DEFAULT_PROFILE)
+
+
+def blocked_patterns(profile):
+    allow = set(profile["allow"])
+    return [p for category in profile["block"] for p in BLOCK_CATEGORIES[category] if p not in allow]
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+def _prepare(driver, profile):
+    """Anti-detection and resource blocking for the driver's current tab."""
+    driver.execute_cdp_cmd('Network.setUserAgentOverride', {"userAgent": USER_AGENT})
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+
+    patterns = blocked_patterns(profile)
+    if patterns:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+
+def get_driver(headless=True, proxy=None, profile=None):
+    """
+    New Chrome driver. `profile` (see SITE_PROFILES) sets the page-load strategy and the
+    URL patterns Chrome refuses to fetch; None loads everything.
+    """
+    profile = profile or OFF_PROFILE
     options = Options()
+    options.page_load_strategy = profile["page_load"]
     if headless:
         options.add_argument("--headless=new")
     options.add_argument("--disable-gpu")
     options.add_argument("--no-sandbox")
     options.add_argument("--disable-dev-shm-usage")
     options.add_argument("--window-size=1920,1080")
+    if proxy:
+        options.add_argument(f"--proxy-server={proxy}")
     
     # Set Chrome Beta binary location
-    options.binary_location = r"C:\Program Files\Google\Chrome Beta\Application\chrome.exe"
+    options.binary_location = os.environ.get("CHROME_BINARY", r"C:\Program Files\Google\Chrome Beta\Application\chrome.exe")
 
     # Anti-detection (basic)
     options.add_argument("--disable-blink-features=AutomationControlled")
@@ -24,7 +98,343 @@ def get_driver(headless=True):
     driver = webdriver.Chrome(service=service, options=options)
     
     # Additional anti-detection
-    driver.execute_cdp_cmd('Network.setUserAgentOverride', {"userAgent": 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'})
-    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    _prepare(driver, profile)
     
     return driver
+
+# Shared browser
+# BROWSER_MODE=process (default) starts one Chrome per page, i.e. four per cache miss.
+# BROWSER_MODE=tabs runs every page as a tab of one shared Chrome instead: each tab lives in
+# its own browser context (separate cookies, storage and proxy) and is driven by its own
+# chromedriver session attached to the shared browser, so the sources still load in parallel.
+# At most BROWSER_MAX_TABS tabs are in use; callers wait for a free one. Finished tabs are
+# kept per (site, proxy, partition) and reused up to BROWSER_TAB_MAX_USES times; the browser itself is
+# restarted once BROWSER_RECYCLE_AFTER tabs have been served and none is open.
+BROWSER_MODE = os.environ.get("BROWSER_MODE", "process")
+BROWSER_MAX_TABS = int(os.environ.get("BROWSER_MAX_TABS", "8"))
+TAB_MAX_USES = int(os.environ.get("BROWSER_TAB_MAX_USES", "20"))
+BROWSER_RECYCLE_AFTER = int(os.environ.get("BROWSER_RECYCLE_AFTER", "200"))
+
+
+class TabDriver(webdriver.Chrome):
+    """
+    chromedriver session attached to one tab of the SharedBrowser. quit() hands the tab
+    back for reuse; discard() closes it (use after a block page or a broken session).
+    """
+    def __init__(self, browser, key, target_id, context_id, service, options):
+        super().__init__(service=service, options=options)
+        self.browser = browser
+        self.key = key
+        self.target_id = target_id
+        self.context_id = context_id
+        self.uses = 0
+
+    def quit(self):
+        self.browser.release(self)
+
+    def discard(self):
+        self.browser.release(self, recycle=False)
+
+    def end_session(self):
+        super().quit()
+
+
+class SharedBrowser:
+    def __init__(self, max_tabs=BROWSER_MAX_TABS, max_uses=TAB_MAX_USES, recycle_after=BROWSER_RECYCLE_AFTER):
+        self.max_tabs = max_tabs
+        self.max_uses = max_uses
+        self.recycle_after = recycle_after
+        self._slots = threading.BoundedSemaphore(max_tabs)
+        # Guards the fields below and every CDP command sent through the owner driver
+        self._lock = threading.Lock()
+        self._owner = None          # driver that launched the shared Chrome; keeps it alive
+        self._owner_headless = None
+        self._address = None        # host:port of the browser's DevTools endpoint
+        self._idle = {}             # (site, proxy, headless, partition) -> [TabDriver]
+        self.in_use = 0
+        self.tabs_served = 0
+        self.tabs_opened = 0
+        self.browser_starts = 0
+        self.served_since_start = 0
+
+    @property
+    def idle(self):
+        return sum(len(tabs) for tabs in list(self._idle.values()))
+
+    def _owner_alive(self):
+        try:
+            self._owner.current_window_handle
+            return True
+        except Exception:
+            return False
+
+    def _ensure_browser(self, headless):
+        """Starts (or restarts) the shared Chrome. Call with the lock held."""
+        if self._owner is not None:
+            stale = (self._owner_headless != headless or self.served_since_start >= self.recycle_after
+                     or not self._owner_alive())
+            if not stale or self.in_use:
+                return
+            self._shutdown_locked()
+        self._owner = get_driver(headless=headless)
+        self._owner_headless = headless
+        self._address = self._owner.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        self.browser_starts += 1
+        self.served_since_start = 0
+        logger.info(f"Shared browser started at {self._address}")
+
+    def _new_target(self, proxy):
+        """New browser context + blank tab in it. Call with the lock held."""
+        params = {"disposeOnDetach": False}
+        if proxy:
+            params["proxyServer"] = proxy
+        context_id = self._owner.execute_cdp_cmd("Target.createBrowserContext", params)["browserContextId"]
+        target_id = self._owner.execute_cdp_cmd(
+            "Target.createTarget", {"url": "about:blank", "browserContextId": context_id})["targetId"]
+        self.tabs_opened += 1
+        return target_id, context_id
+
+    def _evict_idle(self):
+        """Idle tab to close so a new one fits under max_tabs, or None. Call with the lock held."""
+        if self.in_use + self.idle < self.max_tabs:
+            return None
+        for tabs in self._idle.values():
+            if tabs:
+                return tabs.pop(0)
+        return None
+
+    def _close_tab(self, tab):
+        try:
+            tab.end_session()
+        except Exception:
+            pass
+        with self._lock:
+            if self._owner is None:
+                return
+            try:
+                self._owner.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": tab.context_id})
+            except Exception as e:
+                logger.debug(f"Could not dispose browser context {tab.context_id}: {e}")
+
+    def open_tab(self, headless=True, proxy=None, profile=None, site=None, partition=None):
+        """
+        A TabDriver for `site` (rate limiter domain), waiting while max_tabs tabs are in use.
+        An idle tab of the same site, proxy and partition is reused, cookies included.
+        """
+        profile = profile or OFF_PROFILE
+        key = (site, proxy, headless, partition)
+        self._slots.acquire()
+        try:
+            with self._lock:
+                tabs = self._idle.get(key)
+                tab = tabs.pop() if tabs else None
+                evicted = None
+                if tab is None:
+                    evicted = self._evict_idle()
+                    self._ensure_browser(headless)
+                    target_id, context_id = self._new_target(proxy)
+                    address = self._address
+                self.in_use += 1
+            if evicted is not None:
+                self._close_tab(evicted)
+            if tab is None:
+                try:
+                    options = Options()
+                    options.debugger_address = address
+                    options.page_load_strategy = profile["page_load"]
+                    tab = TabDriver(self, key, target_id, context_id, Service(ChromeDriverManager().install()), options)
+                    tab.switch_to.window(target_id)
+                    _prepare(tab, profile)
+                except Exception:
+                    with self._lock:
+                        self.in_use -= 1
+                        if self._owner is not None:
+                            self._owner.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+                    if tab is not None:
+                        tab.end_session()
+                    raise
+            tab.uses += 1
+            with self._lock:
+                self.tabs_served += 1
+                self.served_since_start += 1
+            return tab
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, tab, recycle=True):
+        recycle = recycle and tab.uses < self.max_uses
+        if recycle:
+            try:
+                # Stops the page's scripts and frees its renderer memory while idle
+                tab.get("about:blank")
+            except Exception:
+                recycle = False
+        with self._lock:
+            self.in_use -= 1
+            if recycle and self._owner is not None:
+                self._idle.setdefault(tab.key, []).append(tab)
+        if not recycle:
+            self._close_tab(tab)
+        self._slots.release()
+
+    def _shutdown_locked(self):
+        idle = [tab for tabs in self._idle.values() for tab in tabs]
+        self._idle.clear()
+        for tab in idle:
+            try:
+                tab.end_session()
+            except Exception:
+                pass
+        try:
+            self._owner.quit()
+        except Exception:
+            pass
+        self._owner = None
+
+    def close(self):
+        """Closes the idle tabs and the shared browser (tabs still in use die with it)."""
+        with self._lock:
+            if self._owner is not None:
+                self._shutdown_locked()
+
+    def stats(self):
+        # No lock: it is held while the browser starts, and plain counters are safe to read
+        return {
+            "mode": BROWSER_MODE,
+            "running": self._owner is not None,
+            "tabs_in_use": self.in_use,
+            "tabs_idle": self.idle,
+            "max_tabs": self.max_tabs,
+            "tabs_served": self.tabs_served,
+            "tabs_opened": self.tabs_opened,
+            "browser_starts": self.browser_starts,
+        }
+
+
+shared_browser = SharedBrowser()
+atexit.register(shared_browser.close)
+
+
+def browser_memory_mb():
+    """
+    Proportional set size (PSS) of every process started by this one (chromedriver, Chrome
+    and its renderers), in MB. PSS splits shared pages between processes, so the sum does
+    not count Chrome's shared memory once per process. None where /proc is unavailable.
+    """
+    if not os.path.isdir("/proc"):
+        return None
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total_kb = 0
+    pending = list(children.get(os.getpid(), []))
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                total_kb += next((int(line.split()[1]) for line in f if line.startswith("Pss:")), 0)
+        except OSError:
+            continue
+    return total_kb / 1024
+
+def _load(driver, url):
+    """Loads url; returns True if the site answered with a block / captcha page."""
+    driver.get(url)
+    return network_manager.detect_block(driver.page_source)
+
+def _start_and_load(url, headless, proxy, source, profile=None, session=None, partition=None, site=None):
+    """get_driver + _load, timed as the browser_start and page_load stages. Returns (driver, blocked)."""
+    with metrics.stage(source, "browser_start"):
+        if BROWSER_MODE == "tabs":
+            driver = shared_browser.open_tab(headless=headless, proxy=proxy, profile=profile,
+                                             site=site or guard_for(url).domain, partition=partition)
+        else:
+            driver = get_driver(headless=headless, proxy=proxy, profile=profile)
+    try:
+        if session is not None:
+            location_sessions.restore(driver, session)
+        with metrics.stage(source, "page_load"):
+            return driver, _load(driver, url)
+    except Exception:
+        _discard(driver)
+        raise
+
+def _discard(driver):
+    """Quits a driver without handing a shared-browser tab back for reuse."""
+    getattr(driver, "discard", driver.quit)()
+
+def is_connection_error(exc):
+    """True for errors caused by the connection (and so the proxy) rather than the page: Chrome's net::ERR_*."""
+    return isinstance(exc, WebDriverException) and "net::ERR_" in str(exc)
+
+def open_page(url, headless=True, source=None, session=None, partition=None, site=None):
+    """
+    Starts a driver on a leased proxy and loads `url`.
+    Returns (driver, lease); the caller quits the driver and releases the lease.
+    The target domain is rate limited; while its circuit breaker is open this fails
+    fast with CircuitOpenError. Block / captcha pages ban the proxy and slow the domain
+    down. In non-strict mode a failed or banned proxied attempt is retried once
+    without a proxy; a block page on the final attempt raises BlockedError.
+    `source` labels the browser_start / page_load metrics (defaults to the domain).
+    With BROWSER_MODE=tabs the driver is a tab of the shared browser and quit() returns it.
+    `session` (a location_sessions.LocationSession) is restored before the page loads.
+    Tabs are only reused within the same `partition`, so their cookies do not leak into
+    scrapes that must not see them (e.g. another delivery location).
+    `site` keys the rate limiter and blocking profile (defaults to the domain of `url`).
+    """
+    guard = guard_for(site or url)
+    source = source or guard.domain
+    profile = site_profile(guard.domain)
+    guard.check()
+    guard.limiter.acquire_sync()
+
+    lease = network_manager.lease_proxy(for_browser=True)
+    driver = None
+    try:
+        driver, blocked = _start_and_load(url, headless, lease.proxy, source, profile, session, partition, guard.domain)
+    except Exception:
+        lease.fail()
+        if lease.proxy is None or network_manager.strict_mode:
+            lease.release()
+            guard.breaker.record_failure()
+            raise
+        blocked = None
+
+    if blocked:
+        lease.ban()
+        guard.record_throttle()
+
+    if blocked is False or lease.proxy is None or network_manager.strict_mode:
+        if blocked:
+            _discard(driver)
+            lease.release()
+            raise BlockedError(f"Blocked by {guard.domain}")
+        guard.record_success()
+        return driver, lease
+
+    # Proxied attempt failed or was blocked: fall back to a direct connection
+    lease.release()
+    if driver is not None:
+        _discard(driver)
+    guard.limiter.acquire_sync()
+    try:
+        driver, blocked = _start_and_load(url, headless, None, source, profile, session, partition, guard.domain)
+    except Exception:
+        guard.breaker.record_failure()
+        raise
+    if blocked:
+        _discard(driver)
+        guard.record_throttle()
+        raise BlockedError(f"Blocked by {guard.domain}")
+    guard.record_success()
+    return driver, ProxyLease(network_manager.pool, None)
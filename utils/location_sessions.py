@@ -0,0 +1,150 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Location-aware searches
+# A search for a pincode is cached under its own key, "<query> @<pincode>", so results for
+# different locations never mix; everything keyed by query (cache, warmer, refreshes) then
+# carries the pincode along, and scrapers split it off again to build their URLs.
+PINCODE_RE = re.compile(r"^\d{6}$")
+_KEY_RE = re.compile(r"^(.*\S) @(\d{6})$")
+
+# Location sessions
+# Setting a location on Amazon means opening the location popover, typing the pincode and
+# waiting for the page to reload. The cookies and localStorage that result are captured once
+# per (domain, pincode) and restored into later browsers before the first page load.
+# Sessions expire after LOCATION_SESSION_TTL_S and are dropped as soon as a restored one
+# no longer shows the pincode. They are persisted to LOCATION_SESSIONS_FILE.
+LOCATION_SESSION_TTL_S = float(os.environ.get("LOCATION_SESSION_TTL_S", str(12 * 3600)))
+LOCATION_SESSIONS_FILE = os.environ.get("LOCATION_SESSIONS_FILE", "location_sessions.json")
+# Cookie fields accepted by CDP Network.setCookies
+COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+
+def location_key(query, pincode=None):
+    """Cache key of `query` searched for `pincode` (the query itself without one)."""
+    return f"{query} @{pincode}" if pincode else query
+
+
+def split_location_key(key):
+    """(query, pincode or None) of a cache key made by location_key()."""
+    match = _KEY_RE.match(key)
+    return (match.group(1), match.group(2)) if match else (key, None)
+
+
+class LocationSession:
+    """Browser state (cookies + localStorage of one origin) that selects a delivery location."""
+    def __init__(self, pincode, cookies, origin=None, storage=None, captured_at=None, expires_at=None):
+        self.pincode = pincode
+        self.cookies = cookies
+        self.origin = origin
+        self.storage = storage or {}
+        self.captured_at = captured_at or time.time()
+        self.expires_at = expires_at or self.captured_at + LOCATION_SESSION_TTL_S
+
+    @property
+    def expired(self):
+        return time.time() >= self.expires_at
+
+    def to_dict(self):
+        return {
+            "pincode": self.pincode,
+            "cookies": self.cookies,
+            "origin": self.origin,
+            "storage": self.storage,
+            "captured_at": self.captured_at,
+            "expires_at": self.expires_at,
+        }
+
+
+def capture(driver, pincode):
+    """LocationSession from the driver's current page (cookies of its URL and localStorage)."""
+    cookies = driver.execute_cdp_cmd("Network.getCookies", {"urls": [driver.current_url]})["cookies"]
+    cookies = [{k: c[k] for k in COOKIE_FIELDS if k in c} for c in cookies]
+    for cookie in cookies:
+        # Session cookies report expires -1; CDP expects the field left out for them
+        if cookie.get("expires", 0) <= 0:
+            cookie.pop("expires", None)
+    origin = driver.execute_script("return window.location.origin;")
+    storage = driver.execute_script("return Object.assign({}, window.localStorage);") or {}
+    return LocationSession(pincode, cookies, origin, storage)
+
+
+def restore(driver, session):
+    """Installs a session into a driver before it loads any page of the session's site."""
+    if session.cookies:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": session.cookies})
+    if session.storage and session.origin:
+        script = (f"if (window.location.origin === {json.dumps(session.origin)}) {{"
+                  f" const items = {json.dumps(session.storage)};"
+                  f" for (const k in items) {{ if (localStorage.getItem(k) === null) localStorage.setItem(k, items[k]); }} }}")
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": script})
+
+
+class LocationSessionStore:
+    def __init__(self, path=LOCATION_SESSIONS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sessions = {}   # (domain, pincode) -> LocationSession
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                for item in json.load(f):
+                    session = LocationSession(**{k: v for k, v in item.items() if k != "domain"})
+                    if not session.expired:
+                        self._sessions[(item["domain"], session.pincode)] = session
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Could not read location sessions from {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        items = [{"domain": domain, **s.to_dict()} for (domain, _), s in self._sessions.items()]
+        try:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(items, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write location sessions to {self.path}: {e}")
+
+    def get(self, domain, pincode):
+        """Unexpired session of (domain, pincode), or None."""
+        with self._lock:
+            session = self._sessions.get((domain, pincode))
+            if session is not None and session.expired:
+                del self._sessions[(domain, pincode)]
+                self._save()
+                return None
+            return session
+
+    def put(self, domain, session):
+        with self._lock:
+            self._sessions[(domain, session.pincode)] = session
+            self._save()
+        logger.info(f"Stored location session for {domain} {session.pincode} ({len(session.cookies)} cookies)")
+
+    def invalidate(self, domain, pincode):
+        with self._lock:
+            if self._sessions.pop((domain, pincode), None) is not None:
+                self._save()
+                logger.info(f"Dropped location session for {domain} {pincode}")
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return [{"domain": domain, "pincode": pincode, "cookies": len(s.cookies),
+                     "age_s": round(now - s.captured_at), "expires_in_s": round(s.expires_at - now)}
+                    for (domain, pincode), s in self._sessions.items()]
+
+
+store = LocationSessionStore()
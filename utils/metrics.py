@@ -0,0 +1,232 @@
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+
+# Minimal Prometheus-style metrics (text exposition format 0.0.4), no extra dependency.
+# Thread-safe: scrapers record from Selenium worker threads as well as from the event loop.
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            existing = _registry.get(name)
+            if existing is not None and (existing.type != self.type or existing.labelnames != self.labelnames):
+                raise ValueError(f"Metric {name} is already registered as a different {existing.type}")
+            # Registering the same metric again replaces it: `python api.py` runs the module as
+            # __main__ and uvicorn imports it again as `api`, whose gauges must read its own state
+            _registry[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value)]"""
+        with self._lock:
+            return [("", key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Gauge set explicitly, or read at render time from `callback`, which returns
+    a number (no labels) or {label values tuple: number}.
+    """
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.callback is None:
+            return super().samples()
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [("", tuple(str(v) for v in key), (), value) for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]  # bucket counts, count, sum
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def totals(self):
+        """{label values: (count, sum)}, e.g. to diff stage timings before / after a benchmark run."""
+        with self._lock:
+            return {key: (s[1], s[2]) for key, s in self._values.items()}
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._values.items()]
+        for key, (counts, count, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                out.append(("_bucket", key, (("le", _format_value(float(bound))),), cumulative))
+            out.append(("_bucket", key, (("le", "+Inf"),), count))
+            out.append(("_count", key, (), count))
+            out.append(("_sum", key, (), total))
+        return out
+
+
+def render():
+    """All registered metrics in Prometheus text format."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Pipeline metrics ---
+
+SCRAPE_STAGE_SECONDS = Histogram(
+    "scraper_stage_seconds", "Time spent per scrape stage (browser_start, page_load, wait, extract, image_download, total)",
+    ("source", "stage"),
+)
+SCRAPE_ERRORS = Counter("scraper_errors_total", "Exceptions raised inside a scrape stage", ("source", "stage"))
+SCRAPE_ITEMS = Counter("scraper_items_total", "Products returned by each source", ("source",))
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Search requests by cache outcome (hit, stale, partial, similar, miss, rejected, page)", ("result",)
+)
+DB_SECONDS = Histogram("db_query_seconds", "Latency of cache database operations", ("op",), buckets=DB_BUCKETS)
+NLP_SECONDS = Histogram("nlp_seconds", "Latency of NLP engine calls", ("op",), buckets=DB_BUCKETS + (5.0, 10.0, 30.0))
+HTTP_SECONDS = Histogram("http_request_seconds", "API request latency", ("route", "method", "status"))
+
+
+@contextmanager
+def stage(source, name):
+    """
+    Times one stage of a scrape:  with metrics.stage("Amazon", "page_load"): ...
+    Exceptions are counted in scraper_errors_total and re-raised.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        SCRAPE_ERRORS.inc(source=source, stage=name)
+        raise
+    finally:
+        SCRAPE_STAGE_SECONDS.observe(time.perf_counter() - started, source=source, stage=name)
+
+
+class StageTimer:
+    """
+    Consecutive stages of a scrape without re-indenting them under `with` blocks:
+      timer = StageTimer("Amazon"); ...scroll...; timer.lap("wait"); ...parse...; timer.lap("extract")
+    Each lap records the time since the previous one (or since the timer was created).
+    """
+    def __init__(self, source):
+        self.source = source
+        self._last = time.perf_counter()
+
+    def lap(self, stage_name):
+        now = time.perf_counter()
+        SCRAPE_STAGE_SECONDS.observe(now - self._last, source=self.source, stage=stage_name)
+        self._last = now
+
+
+def timed_db(op):
+    """Decorator recording the latency of an async cache function in db_query_seconds."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with DB_SECONDS.time(op=op):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+if __name__ == "__main__":
+    with stage("Demo", "page_load"):
+        time.sleep(0.06)
+    CACHE_REQUESTS.inc(result="hit")
+    Gauge("demo_queue_depth", "Queue depth", ("priority",), callback=lambda: {("interactive",): 2})
+    print(render())
@@ -1,90 +1,267 @@
+import time
 import random
 import asyncio
 import logging
-from fake_useragent import UserAgent
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import threading
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
 import aiohttp
+from utils.proxy_pool import ProxyPool, looks_blocked, normalize_proxy
+from utils.rate_limiter import guard_for, CircuitOpenError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# This is a public list of free proxies
+FREE_PROXY_URL = "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt"
+PROXY_CHECK_URL = "http://httpbin.org/ip"
+
+# Used until (or if) fake_useragent finishes loading
+FALLBACK_USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+]
+
+def _is_transient(exc):
+    # A dead proxy is handled by the pool / direct fallback, not by retrying it
+    if isinstance(exc, aiohttp.ClientProxyConnectionError):
+        return False
+    return isinstance(exc, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+def _retry_after(headers):
+    try:
+        return float(headers.get("Retry-After", ""))
+    except ValueError:
+        return None
+
+class _FallbackUserAgent:
+    @property
+    def random(self):
+        return random.choice(FALLBACK_USER_AGENTS)
+
 class NetworkManager:
-    def __init__(self, proxy_file="proxies.txt", strict_mode=True):
-        self.ua = UserAgent()
+    """
+    Construction only reads the proxy file; nothing here touches the network.
+    Free proxies and the User-Agent database are loaded by refresh_proxies() /
+    load_user_agents(), normally from the background refresher.
+    """
+    def __init__(self, proxy_file="proxies.txt", strict_mode=True, refresh_interval=900):
         self.strict_mode = strict_mode  # If True, stops script rather than leaking IP
-        self.proxies = self._load_proxies(proxy_file)
-        self.current_proxy_index = 0
+        self.refresh_interval = refresh_interval
+        self._ua = None
+        self._ua_lock = threading.Lock()
+        self._refresh_task = None
+        self.file_proxies = self._load_proxies(proxy_file)
+        self.pool = ProxyPool(self.file_proxies)
+        self.last_refresh = None
+
+    @property
+    def proxies(self):
+        return self.pool.proxies
+
+    @property
+    def ua(self):
+        """fake_useragent.UserAgent, created on first use (falls back to a static list)."""
+        if self._ua is None:
+            with self._ua_lock:
+                if self._ua is None:
+                    try:
+                        from fake_useragent import UserAgent
+                        self._ua = UserAgent()
+                    except Exception as e:
+                        logger.warning(f"User-Agent database unavailable ({e}); using built-in list.")
+                        self._ua = _FallbackUserAgent()
+        return self._ua
+
+    async def load_user_agents(self):
+        """Initializes the User-Agent database off the event loop."""
+        await asyncio.to_thread(lambda: self.ua)
 
     def _load_proxies(self, proxy_file):
-        """Loads proxies from file. If empty, tries to fetch free ones from web."""
+        """Loads proxies from file. Free proxies from the web are added later by refresh_proxies()."""
         proxies = []
         try:
             with open(proxy_file, "r") as f:
-                proxies = [line.strip() for line in f if line.strip()]
+                proxies = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
         except FileNotFoundError:
             logger.warning(f"File '{proxy_file}' not found.")
 
-        # If file failed or was empty, try to fetch fresh ones
-        if not proxies:
-            logger.info("Proxy list empty. Attempting to fetch free proxies from web...")
-            proxies = self._fetch_free_proxies_sync()
-        
-        if not proxies:
-            if self.strict_mode:
-                raise RuntimeError("CRITICAL: No proxies available! Stopping to prevent IP leak.")
-            else:
-                logger.warning("Running WITHOUT proxies. Your IP is visible.")
-                return []
-        
-        logger.info(f"Loaded {len(proxies)} proxies.")
+        if proxies:
+            logger.info(f"Loaded {len(proxies)} proxies.")
+        elif self.strict_mode:
+            logger.warning("Proxy file empty. Requests will fail until refresh_proxies() finds proxies.")
+        else:
+            logger.warning("Proxy file empty. Running WITHOUT proxies until free ones are fetched. Your IP is visible.")
         return proxies
 
-    def _fetch_free_proxies_sync(self):
-        """
-        Quick hack to get free proxies (http/https) to populate the list.
-        Uses requests (blocking) for simplicity during init.
-        """
-        import requests
+    async def _fetch_free_proxies(self, session):
+        """Quick hack to get free proxies (http/https) to populate the list."""
         try:
-            # This is a public list of free proxies
-            url = "https://raw.githubusercontent.com/TheSpeedX/PROXY-List/master/http.txt"
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                return [line.strip() for line in response.text.splitlines() if line.strip()]
+            async with session.get(FREE_PROXY_URL, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+                if resp.status == 200:
+                    text = await resp.text()
+                    return [line.strip() for line in text.splitlines() if line.strip()]
         except Exception as e:
             logger.error(f"Failed to fetch free proxies: {e}")
         return []
 
+    async def _validate_proxies(self, session, proxies, concurrency=50, timeout=5):
+        """Returns the proxies that answer PROXY_CHECK_URL, fastest first."""
+        semaphore = asyncio.Semaphore(concurrency)
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+        async def check(proxy):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    async with session.get(PROXY_CHECK_URL, proxy=normalize_proxy(proxy), timeout=client_timeout) as resp:
+                        if resp.status == 200:
+                            return proxy, time.monotonic() - started
+                except Exception:
+                    pass
+                return proxy, None
+
+        results = await asyncio.gather(*(check(p) for p in proxies))
+        return [p for p, latency in sorted((r for r in results if r[1] is not None), key=lambda r: r[1])]
+
+    async def refresh_proxies(self, max_candidates=300, max_proxies=50):
+        """
+        Fetches free proxies, validates them concurrently and swaps the pool contents in one step.
+        Only used when proxies.txt gave none: file proxies are kept as they are and their health
+        is tracked by the pool.
+        """
+        if self.file_proxies:
+            return len(self.pool)
+
+        async with aiohttp.ClientSession() as session:
+            candidates = await self._fetch_free_proxies(session)
+            random.shuffle(candidates)
+            valid = await self._validate_proxies(session, candidates[:max_candidates])
+
+        self.last_refresh = time.time()
+        if valid:
+            # Atomic swap: requests in flight keep their lease, new ones see the new list
+            self.pool.replace(self.file_proxies + valid[:max_proxies])
+            logger.info(f"Proxy refresh: {len(valid)}/{min(len(candidates), max_candidates)} candidates usable.")
+        else:
+            logger.warning("Proxy refresh found no usable proxies; keeping the current pool.")
+        return len(self.pool)
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh_proxies()
+            except Exception as e:
+                logger.error(f"Proxy refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start_background_refresh(self):
+        """
+        Starts User-Agent loading and, for a pool without file proxies, the periodic free-proxy
+        refresher on the running loop. Returns the refresher task (None for a file-only pool).
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            asyncio.get_running_loop().create_task(self.load_user_agents())
+            if self.file_proxies:
+                logger.info("Using the proxies from the proxy file; free proxies are not fetched.")
+                return None
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+        return self._refresh_task
+
+    def stop_background_refresh(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
     def get_proxy(self):
-        """Returns the next proxy or raises error in strict mode."""
-        if not self.proxies:
-            if self.strict_mode:
-                raise RuntimeError("No proxies available.")
-            return None
-        
-        proxy = self.proxies[self.current_proxy_index]
-        self.current_proxy_index = (self.current_proxy_index + 1) % len(self.proxies)
-        
-        # Ensure proxy has scheme (aiohttp needs http://)
-        if not proxy.startswith("http"):
-            return f"http://{proxy}"
-        return proxy
+        """Returns a healthy proxy (weighted by success rate / latency) or raises error in strict mode."""
+        lease = self.lease_proxy()
+        lease.cancel()
+        return lease.proxy
+
+    def lease_proxy(self, for_browser=False):
+        """
+        Reserves a proxy for one request / browser session.
+        Report the outcome on the lease (ok/fail/ban/record_status) and release it when done.
+        Chrome's --proxy-server cannot carry credentials, so browsers only get auth-less proxies.
+        """
+        lease = self.pool.lease(allow_auth=not for_browser)
+        if lease.proxy is None and self.strict_mode:
+            raise RuntimeError("No healthy proxies available.")
+        return lease
+
+    def detect_block(self, html):
+        """True if a page looks like a captcha / block page."""
+        return looks_blocked(html)
 
     async def verify_ip(self):
         """Test function to see which IP is being used."""
         test_url = "http://httpbin.org/ip"
-        proxy = self.get_proxy()
         
         try:
-            async with aiohttp.ClientSession() as session:
-                logger.info(f"Testing with proxy: {proxy}")
-                async with session.get(test_url, proxy=proxy, timeout=5) as resp:
-                    data = await resp.json()
-                    logger.info(f"SUCCESS! The server sees this IP: {data['origin']}")
+            with self.lease_proxy() as lease:
+                async with aiohttp.ClientSession() as session:
+                    logger.info(f"Testing with proxy: {lease.proxy}")
+                    async with session.get(test_url, proxy=lease.proxy, timeout=5) as resp:
+                        lease.record_status(resp.status)
+                        data = await resp.json()
+                        logger.info(f"SUCCESS! The server sees this IP: {data['origin']}")
         except Exception as e:
             logger.error(f"Proxy failed: {e}")
 
+    @retry(
+        retry=retry_if_exception(_is_transient),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=0.5, max=4),
+        reraise=True,
+    )
+    async def _get(self, session, url, headers, proxy, timeout, domain=None):
+        """One rate-limited GET; transient connection errors are retried with backoff."""
+        guard = guard_for(domain or url)
+        guard.check()
+        try:
+            await guard.limiter.acquire()
+            async with session.get(url, headers=headers, proxy=proxy, timeout=timeout) as resp:
+                body = await resp.read()
+                status = resp.status
+                retry_after = _retry_after(resp.headers)
+        except asyncio.CancelledError:
+            guard.breaker.cancel_trial()
+            raise
+        except Exception:
+            # Timeouts and connection errors count against the domain too; without this a
+            # half-open trial that raised would keep the breaker waiting for it forever
+            guard.breaker.record_failure()
+            raise
+        guard.record_status(status, retry_after)
+        return status, body
+
+    async def fetch_bytes(self, session, url, headers=None, timeout=30, domain=None):
+        """
+        GET `url` through a leased proxy and return (status, body).
+        Requests are rate limited per domain and fail fast with CircuitOpenError while
+        the domain's breaker is open. In non-strict mode a failed or banned proxied
+        attempt is retried once without a proxy. `domain` overrides the rate-limit key (default: the host of `url`).
+        """
+        headers = headers or self.get_headers()
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        lease = self.lease_proxy()
+        try:
+            with lease:
+                status, body = await self._get(session, url, headers, lease.proxy, client_timeout, domain)
+                lease.record_status(status)
+            if lease.outcome != "ban" or lease.proxy is None or self.strict_mode:
+                return status, body
+        except CircuitOpenError:
+            raise
+        except Exception:
+            if lease.proxy is None or self.strict_mode:
+                raise
+        logger.info(f"Proxy {lease.proxy} failed for {url}; retrying directly.")
+        return await self._get(session, url, headers, None, client_timeout, domain)
+
     def get_headers(self):
         """Returns a random User-Agent header."""
         return {
@@ -104,6 +281,7 @@ async def main():
     # strict_mode=True ensures we crash instead of leaking IP
     # We use a local instance for testing here
     nm = NetworkManager(strict_mode=True)
+    await nm.refresh_proxies()
     
     # Verify it works
     await nm.verify_ip()
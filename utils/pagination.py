@@ -0,0 +1,90 @@
+import os
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Result depth
+# Every scraper reads search page 1 first. Sources with page URLs then fetch pages 2..N,
+# N = <SOURCE>_MAX_PAGES (e.g. AMAZON_MAX_PAGES=3; default RESULT_PAGES), PAGE_CONCURRENCY at a
+# time, and stream each page's new products into their queue as it arrives. No further pages
+# are started once TARGET_PRODUCTS unique products were collected or a page adds nothing new.
+RESULT_PAGES = int(os.environ.get("RESULT_PAGES", "1"))
+PAGE_CONCURRENCY = int(os.environ.get("PAGE_CONCURRENCY", "2"))
+TARGET_PRODUCTS = int(os.environ.get("TARGET_PRODUCTS", "60"))
+
+
+def max_pages(source):
+    return max(1, int(os.environ.get(f"{source.upper()}_MAX_PAGES", RESULT_PAGES)))
+
+
+class UniqueProducts:
+    """
+    Products of one scrape across pages, deduplicated by link (name when there is none).
+    add() renumbers `index` so image file names and p_index stay unique over all pages.
+    """
+    def __init__(self):
+        self.seen = set()
+
+    def __len__(self):
+        return len(self.seen)
+
+    @staticmethod
+    def _key(product):
+        link = product.get("product_link")
+        return link if link and link != "N/A" else product.get("Name")
+
+    def add(self, products):
+        new = []
+        for product in products:
+            key = self._key(product)
+            if key in self.seen:
+                continue
+            self.seen.add(key)
+            product["index"] = len(self.seen) - 1
+            new.append(product)
+        return new
+
+
+async def more_pages(fetch_page, last_page, unique, target=TARGET_PRODUCTS, concurrency=PAGE_CONCURRENCY):
+    """
+    Async generator over the new products of pages 2..last_page, in completion order.
+    `fetch_page(n, stop)` is a coroutine returning page n's product dicts; a failed page is skipped,
+    a page without new products ends the pagination.
+    `stop` (a threading.Event) is set when the pagination ends: cancelling a task does not stop
+    the thread it runs Selenium in, so blocking page scrapes check it before opening a page.
+    """
+    stop = threading.Event()
+    pending = set()
+    next_page = 2
+    exhausted = False
+
+    def schedule():
+        nonlocal next_page
+        while not exhausted and len(pending) < concurrency and next_page <= last_page and len(unique) < target:
+            pending.add(asyncio.create_task(fetch_page(next_page, stop)))
+            next_page += 1
+
+    schedule()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                try:
+                    products = task.result()
+                except Exception as e:
+                    logger.warning(f"Result page failed: {e}")
+                    continue
+                new = unique.add(products)
+                if not new:
+                    # Past the last page, or the site repeats page 1 for out-of-range pages
+                    exhausted = True
+                    continue
+                yield new
+            schedule()
+    finally:
+        stop.set()
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,112 @@
+import re
+
+# Numbers as scraped: "1,299", "499.50", "4.2", "1.2k"
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_PRICE_PREFIX = re.compile(r"^\s*price\s*:\s*", re.I)
+# A field runs until the next ", Label:" (counts contain commas themselves)
+_RATING = re.compile(r"Rating:\s*(.*?)(?:,\s*[A-Za-z]+:|$)", re.I)
+_COUNT = re.compile(r"Count:\s*(.*?)(?:,\s*[A-Za-z]+:|$)", re.I)
+_COUNT_SUFFIX = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(k|l|lakh|m)?\b", re.I)
+_MULTIPLIERS = {"k": 1_000, "l": 100_000, "lakh": 100_000, "m": 1_000_000}
+
+# Typed columns filled by normalize_item, in product_cache column order
+TYPED_FIELDS = ("price_value", "mrp_value", "discount_pct", "rating_value", "review_count")
+
+
+def _to_float(text):
+    try:
+        return float(text.replace(",", ""))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _amounts(price):
+    """(amounts, percents) found in a price string, in order of appearance."""
+    text = _PRICE_PREFIX.sub("", price)
+    amounts, percents = [], []
+    for match in _NUMBER.finditer(text):
+        value = _to_float(match.group())
+        if value is None:
+            continue
+        if text[match.end():].lstrip().startswith("%"):
+            percents.append(value)
+        else:
+            amounts.append(value)
+    return amounts, percents
+
+
+def parse_price(price):
+    """
+    Current price of a scraped price string, as a float (None if there is none).
+    The current price always comes first in every source's format:
+      Amazon / Meesho: "499 (MRP: 999, Off: 50%)"
+      Flipkart:        "₹12,999 ( ₹16,999 with 23% off)"
+      Myntra:          "price : Rs. 1234Rs. 5678 (60% OFF)"
+    """
+    if not price or price == "N/A":
+        return None
+    amounts, _ = _amounts(price)
+    return amounts[0] if amounts else None
+
+
+def parse_price_fields(price):
+    """(price, mrp, discount percent) of a scraped price string; missing parts are None."""
+    if not price or price == "N/A":
+        return None, None, None
+    amounts, percents = _amounts(price)
+    current = amounts[0] if amounts else None
+    # The MRP is the next amount, and never below the price
+    mrp = next((a for a in amounts[1:] if current is None or a >= current), None)
+    if percents:
+        discount = percents[0]
+    elif current and mrp:
+        discount = round((mrp - current) / mrp * 100, 1)
+    else:
+        discount = None
+    return current, mrp, discount
+
+
+def parse_count(text):
+    """Review counts like "1,234", "(1.2K)", "2.5 lakh ratings" -> int."""
+    if not text:
+        return None
+    match = _COUNT_SUFFIX.search(text)
+    if not match:
+        return None
+    value = _to_float(match.group(1))
+    if value is None:
+        return None
+    suffix = (match.group(2) or "").lower()
+    return int(value * _MULTIPLIERS.get(suffix, 1))
+
+
+def parse_review(review):
+    """(rating, review count) of a scraped "Rating: 4.2 out of 5 stars, Count: 1,234" string."""
+    if not review:
+        return None, None
+    rating = None
+    match = _RATING.search(review)
+    if match:
+        number = _NUMBER.search(match.group(1))
+        value = _to_float(number.group()) if number else None
+        rating = value if value is not None and 0 <= value <= 5 else None
+    match = _COUNT.search(review)
+    return rating, parse_count(match.group(1)) if match else None
+
+
+def normalize_item(item):
+    """Typed fields of a scraped item (see TYPED_FIELDS); the display strings are left untouched."""
+    price, mrp, discount = parse_price_fields(item.get("price"))
+    rating, count = parse_review(item.get("review"))
+    return dict(zip(TYPED_FIELDS, (price, mrp, discount, rating, count)))
+
+
+if __name__ == "__main__":
+    samples = [
+        {"price": "499 (MRP: ₹999, Off: (50% off))", "review": "Rating: 4.2 out of 5 stars, Count: (1.2K), Sold: "},
+        {"price": "₹12,999 ( ₹16,999 with 23% off)", "review": "Rating: 4.4, Count: 12,345 Ratings"},
+        {"price": "price : Rs. 1234Rs. 5678 (60% OFF)", "review": "Rating: 4.1, Count: 2.5k"},
+        {"price": "₹299 (MRP: , Off: )", "review": "Rating: N/A"},
+    ]
+    for sample in samples:
+        print(sample["price"], "->", normalize_item(sample))
@@ -0,0 +1,300 @@
+import io
+import os
+import sys
+import time
+import uuid
+import random
+import pstats
+import cProfile
+import inspect
+import logging
+import functools
+import threading
+from collections import deque, Counter
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+# Opt-in profiling
+# Nothing is profiled until an admin enables a target; disabled targets cost one set lookup.
+# Targets:
+#   request        : API requests (all, subject to sample_rate, or single ones sent with X-Profile: 1)
+#   collect        : main_scraper.collect_results
+#   nlp            : IntelligentSearchEngine.search (runs in the NLP worker threads)
+#   source:<Name>  : one marketplace's scrape_*_sync call, e.g. source:Amazon
+# Modes:
+#   sample   : built-in sampling profiler; a helper thread records the profiled thread's stack
+#              every interval_ms. Produces flame-graph data (collapsed stacks). Low overhead.
+#   cprofile : deterministic cProfile of the profiled thread; pstats text output. Slower.
+# Profiles of async targets sample the event loop thread, i.e. include whatever else runs on it.
+SOURCES = ("Amazon", "Flipkart", "Myntra", "Meesho")
+TARGETS = ("request", "collect", "nlp") + tuple(f"source:{s}" for s in SOURCES)
+MODES = ("sample", "cprofile")
+MAX_KEEP = 200
+
+
+class ProfilerConfig:
+    def __init__(self):
+        self.targets = frozenset()
+        self.mode = "sample"
+        self.interval_ms = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+        self.sample_rate = 1.0     # fraction of calls of an enabled target that are profiled
+        self.threshold_s = 0.0     # only profiles at least this slow are kept
+        self.keep = int(os.environ.get("PROFILE_KEEP", "20"))
+
+    def to_dict(self):
+        return {
+            "targets": sorted(self.targets),
+            "mode": self.mode,
+            "interval_ms": self.interval_ms,
+            "sample_rate": self.sample_rate,
+            "threshold_s": self.threshold_s,
+            "keep": self.keep,
+        }
+
+
+config = ProfilerConfig()
+_profiles = deque(maxlen=config.keep)
+_profiles_lock = threading.Lock()
+# Threads currently being profiled: a thread is never profiled twice at once
+_active = set()
+_active_lock = threading.Lock()
+
+
+def configure(targets=None, mode=None, interval_ms=None, sample_rate=None, threshold_s=None, keep=None):
+    """Updates the profiler settings; raises ValueError on invalid values."""
+    global _profiles
+    if targets is not None:
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise ValueError(f"Unknown profiling targets: {', '.join(sorted(unknown))}")
+    if mode is not None and mode not in MODES:
+        raise ValueError(f"Unknown profiling mode '{mode}'")
+    if interval_ms is not None and not 0.5 <= interval_ms <= 1000:
+        raise ValueError("interval_ms must be between 0.5 and 1000")
+    if sample_rate is not None and not 0 <= sample_rate <= 1:
+        raise ValueError("sample_rate must be between 0 and 1")
+    if threshold_s is not None and threshold_s < 0:
+        raise ValueError("threshold_s must not be negative")
+    if keep is not None and not 1 <= keep <= MAX_KEEP:
+        raise ValueError(f"keep must be between 1 and {MAX_KEEP}")
+
+    if targets is not None:
+        config.targets = frozenset(targets)
+    if mode is not None:
+        config.mode = mode
+    if interval_ms is not None:
+        config.interval_ms = interval_ms
+    if sample_rate is not None:
+        config.sample_rate = sample_rate
+    if threshold_s is not None:
+        config.threshold_s = threshold_s
+    if keep is not None and keep != config.keep:
+        config.keep = keep
+        with _profiles_lock:
+            _profiles = deque(_profiles, maxlen=keep)
+    logger.info(f"Profiling configured: {config.to_dict()}")
+    return config.to_dict()
+
+
+def is_enabled(target):
+    return target in config.targets
+
+
+class StackSampler:
+    """Samples the stack of one thread from a helper thread; counts collapsed stacks."""
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            self.stacks[self._collapse(frame)] += 1
+            del frame
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+class Profile:
+    def __init__(self, target, label, mode, duration, started_at, stacks=None, stats_text=None, interval_ms=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.target = target
+        self.label = label
+        self.mode = mode
+        self.duration = duration
+        self.started_at = started_at
+        self.stacks = stacks or Counter()
+        self.stats_text = stats_text
+        self.interval_ms = interval_ms
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "target": self.target,
+            "label": self.label,
+            "mode": self.mode,
+            "duration_s": round(self.duration, 4),
+            "started_at": self.started_at,
+            "samples": sum(self.stacks.values()),
+        }
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed stack format: flamegraph.pl / speedscope can load it directly."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def text(self, limit=40):
+        if self.stats_text is not None:
+            return self.stats_text
+        total = sum(self.stacks.values()) or 1
+        inclusive, exclusive = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            exclusive[frames[-1]] += count
+            for name in set(frames):
+                inclusive[name] += count
+        lines = [f"{self.target} {self.label}: {self.duration:.3f}s, {total} samples every {self.interval_ms}ms", "",
+                 f"{'total %':>8} {'self %':>8}  function"]
+        for name, count in inclusive.most_common(limit):
+            lines.append(f"{count / total:>8.1%} {exclusive[name] / total:>8.1%}  {name}")
+        return "\n".join(lines) + "\n"
+
+
+def _store(profile, keep_always=False):
+    if not keep_always and profile.duration < config.threshold_s:
+        return
+    with _profiles_lock:
+        _profiles.append(profile)
+    logger.info(f"Stored profile {profile.id}: {profile.target} {profile.label} ({profile.duration:.3f}s)")
+
+
+@contextmanager
+def _profile(target, label, keep_always=False):
+    thread_id = threading.get_ident()
+    with _active_lock:
+        busy = thread_id in _active
+        _active.add(thread_id)
+    if busy:
+        # Nested or concurrent profile on the same thread (e.g. two requests on the event loop)
+        yield
+        return
+
+    mode = config.mode
+    started_at = time.time()
+    started = time.perf_counter()
+    sampler = profiler = None
+    try:
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            interval_ms = config.interval_ms
+            sampler = StackSampler(thread_id, interval_ms / 1000)
+            sampler.start()
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(40)
+            _store(Profile(target, label, mode, duration, started_at, stats_text=out.getvalue()), keep_always)
+        else:
+            sampler.stop()
+            _store(Profile(target, label, mode, duration, started_at, stacks=sampler.stacks, interval_ms=interval_ms), keep_always)
+        with _active_lock:
+            _active.discard(thread_id)
+
+
+def profiled(target, label="", force=False):
+    """
+    with profiling.profiled("request", "GET /api/search"): ...
+    Profiles the block when `target` is enabled and the call is sampled. With `force` the call
+    is always profiled and kept, whatever sample_rate and threshold_s say.
+    """
+    if target not in config.targets:
+        return nullcontext()
+    if not force and config.sample_rate < 1 and random.random() >= config.sample_rate:
+        return nullcontext()
+    return _profile(target, label, keep_always=force)
+
+
+def profile_calls(target, label=None):
+    """Decorator profiling every (sampled) call of a sync or async function while `target` is enabled."""
+    def decorator(func):
+        name = label or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if target not in config.targets:
+                    return await func(*args, **kwargs)
+                with profiled(target, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if target not in config.targets:
+                return func(*args, **kwargs)
+            with profiled(target, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def list_profiles():
+    with _profiles_lock:
+        return [p.summary() for p in reversed(_profiles)]
+
+
+def get_profile(profile_id):
+    with _profiles_lock:
+        return next((p for p in _profiles if p.id == profile_id), None)
+
+
+def clear_profiles():
+    with _profiles_lock:
+        _profiles.clear()
+
+
+def snapshot():
+    return {**config.to_dict(), "available_targets": list(TARGETS), "modes": list(MODES), "profiles": list_profiles()}
+
+
+if __name__ == "__main__":
+    def busy(n):
+        return sum(i * i for i in range(n))
+
+    @profile_calls("nlp", label="demo")
+    def work():
+        for _ in range(20):
+            busy(200_000)
+
+    work()
+    print("disabled:", list_profiles())
+    configure(targets=["nlp"], interval_ms=2)
+    work()
+    profile = get_profile(list_profiles()[0]["id"])
+    print(profile.text(limit=8))
+    configure(mode="cprofile")
+    work()
+    print(get_profile(list_profiles()[0]["id"]).text()[:600])
@@ -0,0 +1,212 @@
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses that mean the target is throttling / blocking this exit IP
+BAN_STATUSES = {403, 407, 429, 503}
+
+# Page markers of captcha / block pages served by the marketplaces
+BLOCK_MARKERS = (
+    "/errors/validatecaptcha",                          # Amazon
+    "type the characters you see in this image",        # Amazon
+    "are you a human",                                  # Flipkart
+    "access denied",                                    # Akamai (Myntra / Flipkart)
+    "request blocked",
+    "unusual traffic",
+)
+
+
+def looks_blocked(html):
+    """True if a fetched page looks like a captcha / block page rather than content."""
+    if not html:
+        return False
+    head = html[:50000].lower()
+    return any(marker in head for marker in BLOCK_MARKERS)
+
+
+def normalize_proxy(proxy):
+    """Ensure proxy has scheme (aiohttp needs http://)"""
+    proxy = proxy.strip()
+    if not proxy.startswith("http"):
+        return f"http://{proxy}"
+    return proxy
+
+
+class ProxyStats:
+    """Health record of one proxy."""
+    def __init__(self, url):
+        self.url = url
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+        self.bans = 0
+        self.consecutive_failures = 0
+        self.latency = None  # EWMA, seconds
+        self.quarantined_until = 0.0
+
+    @property
+    def has_auth(self):
+        return "@" in urlsplit(self.url).netloc
+
+    @property
+    def success_rate(self):
+        # Laplace smoothing: new proxies start at 0.5 instead of 0 or 1
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def weight(self, default_latency):
+        latency = self.latency if self.latency is not None else default_latency
+        return self.success_rate ** 2 / max(latency, 0.05)
+
+    def to_dict(self, now):
+        return {
+            "proxy": self.url,
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "failures": self.failures,
+            "bans": self.bans,
+            "success_rate": round(self.success_rate, 3),
+            "latency_s": round(self.latency, 3) if self.latency is not None else None,
+            "quarantined_for_s": round(max(0.0, self.quarantined_until - now), 1),
+        }
+
+
+class ProxyLease:
+    """
+    One use of a proxy. Record the outcome with ok() / fail() / ban() / record_status(),
+    then release() (or use as a context manager; an exception counts as a failure).
+    `proxy` is None when running without proxies.
+    """
+    def __init__(self, pool, proxy):
+        self.pool = pool
+        self.proxy = proxy
+        self.started = time.monotonic()
+        self.outcome = "ok"
+        self.released = False
+
+    def ok(self):
+        self.outcome = "ok"
+
+    def fail(self):
+        if self.outcome not in ("ban", None):
+            self.outcome = "fail"
+
+    def ban(self):
+        self.outcome = "ban"
+
+    def cancel(self):
+        """Releases the slot without recording an outcome (the proxy was not used)."""
+        self.outcome = None
+        self.release()
+
+    def record_status(self, status):
+        if status in BAN_STATUSES:
+            self.ban()
+        elif status >= 500:
+            self.fail()
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        if self.proxy is not None:
+            self.pool.release(self.proxy, self.outcome, time.monotonic() - self.started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.fail()
+        self.release()
+        return False
+
+
+class ProxyPool:
+    """
+    Health-scored proxy pool.
+    - weighted random selection by success rate and latency
+    - per-proxy concurrency cap
+    - quarantine with exponential backoff on bans / repeated failures
+    Thread-safe: used both from the event loop and from Selenium worker threads.
+    """
+    def __init__(self, proxies=(), max_in_flight=4, base_backoff=30.0, max_backoff=1800.0,
+                 failure_threshold=3, default_latency=2.0):
+        self.max_in_flight = max_in_flight
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.default_latency = default_latency
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.replace(proxies)
+
+    def __len__(self):
+        return len(self._stats)
+
+    @property
+    def proxies(self):
+        return list(self._stats)
+
+    def replace(self, proxies):
+        """Swaps the pool contents; health history of proxies that stay is kept."""
+        urls = list(dict.fromkeys(normalize_proxy(p) for p in proxies if p and p.strip()))
+        with self._lock:
+            old = self._stats
+            self._stats = {url: old.get(url) or ProxyStats(url) for url in urls}
+
+    def acquire(self, allow_auth=True):
+        """Picks a healthy proxy with spare capacity and reserves a slot. None if nothing is available."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                s for s in self._stats.values()
+                if s.quarantined_until <= now and s.in_flight < self.max_in_flight
+                and (allow_auth or not s.has_auth)
+            ]
+            if not candidates:
+                return None
+            weights = [s.weight(self.default_latency) for s in candidates]
+            chosen = random.choices(candidates, weights=weights, k=1)[0]
+            chosen.in_flight += 1
+            return chosen.url
+
+    def release(self, proxy, outcome="ok", latency=None):
+        with self._lock:
+            stats = self._stats.get(proxy)
+            if stats is None:  # removed by replace() while in use
+                return
+            stats.in_flight = max(0, stats.in_flight - 1)
+
+            if outcome is None:
+                return
+            if outcome == "ok":
+                stats.successes += 1
+                stats.consecutive_failures = 0
+                if latency is not None:
+                    stats.latency = latency if stats.latency is None else 0.7 * stats.latency + 0.3 * latency
+                return
+
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if outcome == "ban":
+                stats.bans += 1
+                strikes = stats.bans
+            elif stats.consecutive_failures >= self.failure_threshold:
+                strikes = stats.consecutive_failures - self.failure_threshold + 1
+            else:
+                return
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (strikes - 1))
+            stats.quarantined_until = time.monotonic() + backoff
+            logger.warning(f"Proxy {proxy} quarantined for {backoff:.0f}s ({outcome})")
+
+    def lease(self, allow_auth=True):
+        return ProxyLease(self, self.acquire(allow_auth=allow_auth))
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return [s.to_dict(now) for s in self._stats.values()]
@@ -0,0 +1,200 @@
+import time
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# (requests per second, burst) per host. Hosts are keyed without a leading "www.".
+# Marketplace pages are expensive and closely watched; image CDNs tolerate much more.
+DOMAIN_LIMITS = {
+    "amazon.in": (0.5, 2),
+    "flipkart.com": (0.5, 2),
+    "myntra.com": (0.5, 2),
+    "meesho.com": (0.5, 2),
+}
+DEFAULT_LIMIT = (10.0, 20)
+
+# HTTP statuses that ask us to slow down
+THROTTLE_STATUSES = {429, 503}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a domain's circuit breaker is open and requests should fail fast."""
+
+
+class BlockedError(RuntimeError):
+    """Raised when a site answered with a captcha / block page."""
+
+
+def domain_of(url):
+    host = (urlsplit(url).hostname or url).lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose rate adapts to the site's signals:
+    halves on throttling (429/503/captcha), recovers additively on success.
+    Thread-safe; waits are computed under the lock and slept outside it.
+    """
+    def __init__(self, rate, burst, min_rate=None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 16
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Takes one token (possibly going into debt) and returns how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire_sync(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures.
+    open -> half-open after `reset_timeout`; one trial request decides:
+    success closes the breaker, failure re-opens it with a doubled timeout.
+    """
+    def __init__(self, failure_threshold=3, reset_timeout=60.0, max_reset_timeout=900.0):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.trial_in_flight = False
+            if self.state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def is_open(self):
+        """Non-mutating check: True while requests would be rejected."""
+        with self._lock:
+            return self.state == "open" and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def cancel_trial(self):
+        """A cancelled half-open trial proves nothing: lets the next request be the trial."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.trial_in_flight = False
+            self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open":
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            elif self.failures < self.failure_threshold:
+                return
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+            logger.warning(f"Circuit opened for {self.reset_timeout:.0f}s after {self.failures} failures")
+
+
+class DomainGuard:
+    """Rate limiter + circuit breaker for one domain."""
+    def __init__(self, domain):
+        self.domain = domain
+        rate, burst = DOMAIN_LIMITS.get(domain, DEFAULT_LIMIT)
+        self.limiter = AdaptiveTokenBucket(rate, burst)
+        self.breaker = CircuitBreaker()
+
+    def check(self):
+        """Fails fast with CircuitOpenError while the breaker is open."""
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Circuit open for {self.domain}")
+
+    def record_status(self, status, retry_after=None):
+        if status in THROTTLE_STATUSES:
+            self.record_throttle(retry_after)
+        elif status >= 500:
+            self.breaker.record_failure()
+        else:
+            self.record_success()
+
+    def record_throttle(self, retry_after=None):
+        self.limiter.on_throttle(retry_after)
+        self.breaker.record_failure()
+
+    def record_success(self):
+        self.limiter.on_success()
+        self.breaker.record_success()
+
+    def snapshot(self):
+        return {
+            "domain": self.domain,
+            "rate_per_s": round(self.limiter.rate, 3),
+            "max_rate_per_s": self.limiter.max_rate,
+            "breaker": self.breaker.state,
+            "failures": self.breaker.failures,
+        }
+
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def guard_for(url_or_domain):
+    """Returns the shared DomainGuard for a URL or domain."""
+    domain = domain_of(url_or_domain) if "/" in url_or_domain else url_or_domain.lower().removeprefix("www.")
+    with _guards_lock:
+        if domain not in _guards:
+            _guards[domain] = DomainGuard(domain)
+        return _guards[domain]
+
+
+def snapshot():
+    with _guards_lock:
+        guards = list(_guards.values())
+    return [g.snapshot() for g in guards]
@@ -0,0 +1,200 @@
+import time
+import math
+import asyncio
+import logging
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most urgent first
+INTERACTIVE = 0   # a user waiting on /api/search
+REFRESH = 1       # background re-scrape of a stale cache entry
+PREFETCH = 2      # speculative cache warming
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", REFRESH: "refresh", PREFETCH: "prefetch"}
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the scrape queue is full; `retry_after` is a wait estimate in seconds."""
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ClassStats:
+    """Counters of one priority class."""
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_avg = 0.0   # EWMA, seconds
+        self.wait_max = 0.0
+
+    def record_wait(self, wait):
+        self.admitted += 1
+        self.wait_avg = wait if self.admitted == 1 else 0.8 * self.wait_avg + 0.2 * wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+class ScrapeScheduler:
+    """
+    Concurrency gate for scrapes.
+    - strict priority between classes (interactive > refresh > prefetch)
+    - round-robin between sessions inside a class, so one client cannot monopolise the slots
+    - bounded queue: when full, callers get QueueFullError with a Retry-After estimate;
+      background classes may only fill part of it so user searches still get queued
+    Must be used from a single event loop.
+    """
+    def __init__(self, max_concurrent=3, max_queued=20, max_background_queued=None, default_duration=30.0):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.max_background_queued = max_background_queued if max_background_queued is not None else max_queued // 2
+        self.running = 0
+        self.duration_avg = default_duration  # EWMA of slot hold time, seconds
+        # priority -> session -> deque of futures; sessions rotate for fairness
+        self._waiters = {p: OrderedDict() for p in PRIORITY_NAMES}
+        self._stats = {p: ClassStats() for p in PRIORITY_NAMES}
+
+    @property
+    def queued(self):
+        return sum(len(q) for sessions in self._waiters.values() for q in sessions.values())
+
+    def queued_for(self, priority):
+        return sum(len(q) for q in self._waiters[priority].values())
+
+    def spare_slots(self):
+        """Slots free right now with nobody waiting for them."""
+        return 0 if self.queued else self.max_concurrent - self.running
+
+    def is_full(self, priority=INTERACTIVE):
+        """True if a new request of this priority would be rejected right now."""
+        if self.running < self.max_concurrent and not self.queued:
+            return False
+        return self.queued >= (self.max_queued if priority == INTERACTIVE else self.max_background_queued)
+
+    def retry_after(self):
+        """Seconds until a newly queued request would likely get a slot."""
+        rounds = (self.queued + self.running) / self.max_concurrent
+        return max(1, math.ceil(rounds * self.duration_avg))
+
+    def _next_waiter(self):
+        for priority in sorted(self._waiters):
+            sessions = self._waiters[priority]
+            while sessions:
+                session, queue = next(iter(sessions.items()))
+                future = queue.popleft()
+                # Served sessions go to the back of the line
+                del sessions[session]
+                if queue:
+                    sessions[session] = queue
+                if not future.done():
+                    return future
+        return None
+
+    def _dispatch(self):
+        while self.running < self.max_concurrent:
+            future = self._next_waiter()
+            if future is None:
+                return
+            self.running += 1
+            future.set_result(None)
+
+    def _remove(self, priority, session, future):
+        queue = self._waiters[priority].get(session)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            return
+        if not queue:
+            del self._waiters[priority][session]
+
+    async def acquire(self, priority=INTERACTIVE, session_id=None):
+        stats = self._stats[priority]
+        if self.running < self.max_concurrent and not self.queued:
+            self.running += 1
+            stats.record_wait(0.0)
+            return
+
+        if self.is_full(priority):
+            stats.rejected += 1
+            raise QueueFullError(
+                f"Scrape queue full ({self.queued} waiting)", self.retry_after()
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].setdefault(session_id, deque()).append(future)
+        started = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we were cancelled: hand it on
+                self.release()
+            else:
+                self._remove(priority, session_id, future)
+            raise
+        stats.record_wait(time.monotonic() - started)
+
+    def release(self, held_for=None):
+        self.running -= 1
+        if held_for is not None:
+            self.duration_avg = 0.8 * self.duration_avg + 0.2 * held_for
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority=INTERACTIVE, session_id=None):
+        """async with scheduler.slot(INTERACTIVE, session_id): ..."""
+        await self.acquire(priority, session_id)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def snapshot(self):
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "slot_duration_avg_s": round(self.duration_avg, 2),
+            "classes": {
+                name: {
+                    "queued": self.queued_for(p),
+                    "sessions": len(self._waiters[p]),
+                    "admitted": self._stats[p].admitted,
+                    "rejected": self._stats[p].rejected,
+                    "wait_avg_s": round(self._stats[p].wait_avg, 3),
+                    "wait_max_s": round(self._stats[p].wait_max, 3),
+                }
+                for p, name in PRIORITY_NAMES.items()
+            },
+        }
+
+
+# Usage Example
+async def main():
+    scheduler = ScrapeScheduler(max_concurrent=1, max_queued=5, default_duration=0.1)
+    order = []
+
+    async def job(name, priority, session):
+        try:
+            async with scheduler.slot(priority, session):
+                order.append(name)
+                await asyncio.sleep(0.05)
+        except QueueFullError as e:
+            order.append(f"{name} rejected (retry after {e.retry_after}s)")
+
+    # "a" floods the queue; "b" still gets the second interactive slot; prefetch goes last
+    jobs = [job("a1", INTERACTIVE, "a"), job("p1", PREFETCH, "c"), job("a2", INTERACTIVE, "a"),
+            job("a3", INTERACTIVE, "a"), job("b1", INTERACTIVE, "b"), job("r1", REFRESH, "c"),
+            job("a4", INTERACTIVE, "a")]
+    await asyncio.gather(*jobs)
+    print(order)
+    print(scheduler.snapshot())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
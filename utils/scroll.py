@@ -0,0 +1,122 @@
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Infinite-scroll engine for lazily loaded result grids (Myntra, Meesho).
+# Each step jumps SCROLL_STEP_SCREENS viewports down in one go, then waits inside the page:
+# a MutationObserver tracks DOM changes and the step ends once the DOM has been quiet for
+# SCROLL_QUIET_MS, instead of sleeping a fixed time. At the bottom of the page the step
+# waits for new cards instead, up to SCROLL_MAX_WAIT_MS.
+# Scrolling stops when the page holds SCROLL_TARGET product cards, when SCROLL_IDLE_STEPS
+# steps at the bottom brought no new cards, after SCROLL_MAX_STEPS steps or when
+# SCROLL_BUDGET_S is spent, whichever comes first, so it always terminates.
+SCROLL_TARGET = int(os.environ.get("SCROLL_TARGET", "60"))
+SCROLL_BUDGET_S = float(os.environ.get("SCROLL_BUDGET_S", "12"))
+SCROLL_STEP_SCREENS = float(os.environ.get("SCROLL_STEP_SCREENS", "3"))
+SCROLL_QUIET_MS = int(os.environ.get("SCROLL_QUIET_MS", "350"))
+SCROLL_MAX_WAIT_MS = int(os.environ.get("SCROLL_MAX_WAIT_MS", "2500"))
+SCROLL_IDLE_STEPS = int(os.environ.get("SCROLL_IDLE_STEPS", "1"))
+SCROLL_MAX_STEPS = int(os.environ.get("SCROLL_MAX_STEPS", "40"))
+
+# arguments: card selector, pixels to scroll (0: no scroll), quiet ms, max wait ms, callback
+STEP_JS = """
+const [selector, pixels, quietMs, maxWaitMs] = arguments;
+const done = arguments[arguments.length - 1];
+const started = performance.now();
+let lastChange = started;
+const observer = new MutationObserver(() => { lastChange = performance.now(); });
+observer.observe(document.body, {childList: true, subtree: true});
+const root = document.scrollingElement || document.documentElement;
+const count = () => document.querySelectorAll(selector).length;
+const atBottom = () => window.innerHeight + window.scrollY >= root.scrollHeight - 4;
+const before = count();
+if (pixels) window.scrollBy(0, pixels);
+const timer = setInterval(() => {
+    const now = performance.now();
+    // At the bottom the site fetches the next batch: wait for it rather than for a quiet DOM
+    const waiting = pixels && atBottom() && count() <= before;
+    if ((now - lastChange >= quietMs && !waiting) || now - started >= maxWaitMs) {
+        clearInterval(timer);
+        observer.disconnect();
+        done({count: count(), at_bottom: atBottom()});
+    }
+}, 25);
+"""
+
+# Scrolls back through the page one viewport at a time so lazy image loaders skipped by the
+# big jumps still fire (IntersectionObserver only needs the element to enter the viewport once).
+# arguments: ms per viewport, callback
+SWEEP_JS = """
+const [pause] = arguments;
+const done = arguments[arguments.length - 1];
+const root = document.scrollingElement || document.documentElement;
+// Fixed end: cards appended during the sweep must not keep it going
+const end = root.scrollHeight;
+let y = 0;
+window.scrollTo(0, 0);
+const timer = setInterval(() => {
+    y += window.innerHeight;
+    window.scrollTo(0, y);
+    if (y >= end) { clearInterval(timer); done(true); }
+}, pause);
+"""
+
+
+class ScrollResult:
+    def __init__(self, count, steps, reason, elapsed):
+        self.count = count
+        self.steps = steps
+        self.reason = reason      # target | bottom | steps | budget
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return f"ScrollResult(count={self.count}, steps={self.steps}, reason={self.reason!r}, elapsed={self.elapsed:.2f}s)"
+
+
+def scroll_for_cards(driver, selector, target=SCROLL_TARGET, budget_s=SCROLL_BUDGET_S, step_screens=SCROLL_STEP_SCREENS,
+                     quiet_ms=SCROLL_QUIET_MS, max_wait_ms=SCROLL_MAX_WAIT_MS, idle_steps=SCROLL_IDLE_STEPS,
+                     max_steps=SCROLL_MAX_STEPS, sweep_ms=0):
+    """
+    Scrolls until `selector` matches `target` cards (see the module settings for the other
+    stop conditions). With `sweep_ms` the page is swept once more, a viewport every
+    sweep_ms, to trigger lazy images. Returns a ScrollResult.
+    """
+    started = time.monotonic()
+    deadline = started + budget_s
+    driver.set_script_timeout(max_wait_ms / 1000 + 5)
+    step_px = int(driver.execute_script("return window.innerHeight;") * step_screens)
+
+    # Settle the initial render without scrolling
+    state = driver.execute_async_script(STEP_JS, selector, 0, quiet_ms, max_wait_ms)
+    count, steps, idle = state["count"], 0, 0
+    while True:
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        if count >= target:
+            reason = "target"
+            break
+        # An empty grid may still be rendering: give it more chances before giving up
+        if idle >= (idle_steps if count else idle_steps * 3):
+            reason = "bottom"
+            break
+        if steps >= max_steps:
+            reason = "steps"
+            break
+        if remaining_ms <= 0:
+            reason = "budget"
+            break
+        state = driver.execute_async_script(STEP_JS, selector, step_px, quiet_ms, min(max_wait_ms, max(remaining_ms, 50)))
+        steps += 1
+        # Only a step that ends at the bottom with nothing new counts towards giving up;
+        # higher up, cards may simply not have been reached yet
+        idle = idle + 1 if state["count"] <= count and state["at_bottom"] else 0
+        count = max(count, state["count"])
+
+    if sweep_ms and count:
+        driver.set_script_timeout(max(budget_s, 30))
+        driver.execute_async_script(SWEEP_JS, sweep_ms)
+
+    result = ScrollResult(count, steps, reason, time.monotonic() - started)
+    logger.debug(f"Scrolled for '{selector}': {result}")
+    return result